@@ -0,0 +1,628 @@
+"""Benchmarks for the conversion engine and the HTTP API.
+
+Every fixture (PDFs, DOCX, images, WAV/MP3, MP4s, CSV and JSON) is
+generated locally with PyMuPDF, python-docx, Pillow and ffmpeg, so the suite runs fully offline on
+one Linux machine. Run it from the backend directory:
+
+    python -m benchmark engine                        # each ConversionEngine path
+    python -m benchmark api --concurrency 8           # endpoints end to end
+    python -m benchmark all --save-baseline baseline.json
+    python -m benchmark all --baseline baseline.json  # exits 1 on a regression
+
+Engine cases call ``ConversionEngine`` directly, bypassing the result cache,
+and report latency percentiles, input throughput and the peak RSS of the
+process tree (the worker pool included). API scenarios start the app under
+uvicorn in a scratch directory (or use ``--url``), then upload, poll and
+download each job from ``--concurrency`` clients. Every API upload is made
+unique so the result cache cannot short-circuit it, unless ``--allow-cache``
+is given. The docx_to_pdf engine case only runs when LibreOffice's
+``unoserver`` is on the PATH, through the same warm office pool the workers
+use; conversions through Microsoft Word are not benchmarked.
+"""
+import argparse
+import asyncio
+import csv
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+BACKEND_DIR = Path(__file__).resolve().parent
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# Results
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    input_bytes: int = 0  # per operation
+    errors: int = 0
+    wall_time: float = 0.0
+    peak_rss: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        count = len(self.latencies)
+        busy = self.wall_time or sum(self.latencies)
+        return {
+            "count": count,
+            "errors": self.errors,
+            "p50_ms": round(percentile(self.latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(self.latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 0.99) * 1000, 2),
+            "ops_per_sec": round(count / busy, 3) if busy else 0.0,
+            "mb_per_sec": round(self.input_bytes * count / busy / 1e6, 3) if busy else 0.0,
+            "peak_rss_mb": round(self.peak_rss / 1e6, 1),
+        }
+
+# Peak memory of a process and everything it has spawned
+def process_tree_rss(root: int) -> int:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, pending = 0, [root]
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+class RssSampler:
+    """Samples the RSS of a process tree in the background and keeps the peak."""
+
+    def __init__(self, pid: Optional[int] = None, interval: float = 0.05):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+# Synthetic fixtures
+class Fixtures:
+    """Generates benchmark inputs on first use and keeps them in ``directory``."""
+
+    def __init__(self, directory: Path, ffmpeg: str):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ffmpeg = ffmpeg
+
+    def _cached(self, name: str, build: Callable[[Path], None]) -> Path:
+        path = self.directory / name
+        if not path.exists():
+            partial = path.with_name(f".{name}.partial{path.suffix}")
+            build(partial)
+            partial.rename(path)
+        return path
+
+    def pdf(self, pages: int) -> Path:
+        def build(path: Path):
+            import fitz
+            document = fitz.open()
+            for number in range(pages):
+                page = document.new_page()
+                page.insert_text((72, 72), f"Benchmark document, page {number + 1}", fontsize=18)
+                body = " ".join(f"Paragraph text {i} for layout analysis." for i in range(40))
+                page.insert_textbox(fitz.Rect(72, 100, 523, 500), body, fontsize=11)
+                for row in range(8):
+                    y = 520 + row * 24
+                    page.draw_line((72, y), (523, y))
+                    page.insert_text((80, y + 16), f"Item {row}    {row * 17.5:.2f}    {'yes' if row % 2 else 'no'}", fontsize=10)
+            document.save(path)
+            document.close()
+        return self._cached(f"document_{pages}p.pdf", build)
+
+    def docx(self, pages: int) -> Path:
+        def build(path: Path):
+            import docx
+            document = docx.Document()
+            for number in range(pages):
+                document.add_heading(f"Benchmark document, page {number + 1}", level=1)
+                for paragraph in range(6):
+                    document.add_paragraph(" ".join(f"Paragraph text {i} for layout." for i in range(paragraph, paragraph + 20)))
+                table = document.add_table(rows=8, cols=3)
+                for row in range(8):
+                    for column, value in enumerate((f"Item {row}", f"{row * 17.5:.2f}", "yes" if row % 2 else "no")):
+                        table.cell(row, column).text = value
+                document.add_page_break()
+            document.save(path)
+        return self._cached(f"document_{pages}p.docx", build)
+
+    def image(self, megapixels: int, image_format: str) -> Path:
+        def build(path: Path):
+            import numpy as np
+            from PIL import Image
+            width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+            height = megapixels * 1_000_000 // width
+            rng = np.random.default_rng(megapixels)
+            x = np.linspace(0, 255, width, dtype=np.float32)
+            y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+            xs, ys = np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))
+            noise = rng.normal(0, 12, (height, width)).astype(np.float32)
+            pixels = np.stack([xs, ys + noise, (xs + ys) / 2 + noise], axis=-1)
+            image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+            image.save(path, format="JPEG" if image_format == "jpg" else image_format.upper(), quality=90)
+        return self._cached(f"image_{megapixels}mp.{image_format}", build)
+
+    def _ffmpeg(self, path: Path, *args: str):
+        subprocess.run(
+            [self.ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error", "-y", *args, str(path)],
+            check=True
+        )
+
+    def wav(self, seconds: int) -> Path:
+        return self._cached(f"audio_{seconds}s.wav", lambda path: self._ffmpeg(
+            path, "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}:sample_rate=44100", "-ac", "2"
+        ))
+
+    def mp3(self, seconds: int) -> Path:
+        return self._cached(f"audio_{seconds}s.mp3", lambda path: self._ffmpeg(
+            path, "-i", str(self.wav(seconds)), "-c:a", "libmp3lame", "-b:a", "192k"
+        ))
+
+    def mp4(self, seconds: int) -> Path:
+        return self._cached(f"video_{seconds}s.mp4", lambda path: self._ffmpeg(
+            path,
+            "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=25:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", "-movflags", "+faststart"
+        ))
+
+    def csv(self, rows: int) -> Path:
+        def build(path: Path):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["id", "name", "amount", "active", "created"])
+                for i in range(rows):
+                    writer.writerow([i, f"customer {i}", f"{i * 1.37:.2f}", i % 3 == 0, f"2024-01-{i % 28 + 1:02d}"])
+        return self._cached(f"data_{rows}.csv", build)
+
+    def json(self, rows: int) -> Path:
+        def build(path: Path):
+            with open(path, "w") as f:
+                json.dump([
+                    {"id": i, "name": f"customer {i}", "amount": round(i * 1.37, 2), "active": i % 3 == 0}
+                    for i in range(rows)
+                ], f)
+        return self._cached(f"data_{rows}.json", build)
+
+def make_unique(data: bytes, suffix: str, nonce: str) -> bytes:
+    """Give an input a distinct hash without changing what it decodes to."""
+    if suffix == ".mp4":
+        # A top-level "free" box is skipped by every MP4 reader
+        return data + struct.pack(">I4s", 8 + len(nonce), b"free") + nonce.encode()
+    if suffix == ".mp3":
+        # ID3v1 tag
+        return data + b"TAG" + nonce.encode().ljust(125, b"\0")[:125]
+    if suffix == ".csv":
+        return data + f"{nonce},unique,0,False,2024-01-01\n".encode()
+    if suffix == ".json":
+        return data[:data.rindex(b"]")] + f', {{"id": "{nonce}", "name": "", "amount": 0, "active": false}}]'.encode()
+    if suffix == ".pdf":
+        return data + f"\n%{nonce}\n".encode()
+    # JPEG and PNG decoders stop at the end-of-image marker
+    return data + nonce.encode()
+
+# Engine benchmarks
+@dataclass
+class EngineCase:
+    name: str
+    input: Callable[[Fixtures], Path]
+    output_suffix: str
+    run: Callable[[Any, Path, Path], Any]  # (backend module, input, output) -> awaitable
+
+def engine_cases(quick: bool, office: bool = False) -> List[EngineCase]:
+    megapixels = [1] if quick else [1, 4, 12]
+    pdf_pages = [4] if quick else [10, 48]
+    rows = 10_000 if quick else 200_000
+    seconds = 5 if quick else 30
+
+    cases = []
+    for pages in pdf_pages:
+        cases.append(EngineCase(
+            f"engine.pdf_to_docx.{pages}p", lambda fx, pages=pages: fx.pdf(pages), ".docx",
+            lambda b, src, dst: b.conversion_engine.convert_pdf_to_docx(src, dst)
+        ))
+        if office:
+            cases.append(EngineCase(
+                f"engine.docx_to_pdf.{pages}p", lambda fx, pages=pages: fx.docx(pages), ".pdf",
+                lambda b, src, dst: b.conversion_engine.convert_docx_to_pdf(src, dst)
+            ))
+    for mp in megapixels:
+        cases.append(EngineCase(
+            f"engine.image.{mp}mp.jpg_to_webp", lambda fx, mp=mp: fx.image(mp, "jpg"), ".webp",
+            lambda b, src, dst: b.conversion_engine.process_image(src, dst, b.ImageProcessingOptions(width=1600))
+        ))
+        cases.append(EngineCase(
+            f"engine.image.{mp}mp.png_to_jpg", lambda fx, mp=mp: fx.image(mp, "png"), ".jpg",
+            lambda b, src, dst: b.conversion_engine.process_image(src, dst, b.ImageProcessingOptions())
+        ))
+        cases.append(EngineCase(
+            f"engine.image_variants.{mp}mp", lambda fx, mp=mp: fx.image(mp, "jpg"), ".webp",
+            lambda b, src, dst: b.conversion_engine.process_image_variants(src, [
+                (b.ImageVariant(name=name, width=width), dst.with_name(f"{dst.stem}_{name}.webp"))
+                for name, width in (("thumb", 256), ("medium", 1024), ("large", 2048))
+            ], b.ImageProcessingOptions())
+        ))
+    cases += [
+        EngineCase(
+            "engine.video_to_audio.copy", lambda fx: fx.mp4(seconds), ".m4a",
+            lambda b, src, dst: b.conversion_engine.convert_video_to_audio(src, dst, b.VideoProcessingOptions())
+        ),
+        EngineCase(
+            "engine.video_to_audio.mp3", lambda fx: fx.mp4(seconds), ".mp3",
+            lambda b, src, dst: b.conversion_engine.convert_video_to_audio(src, dst, b.VideoProcessingOptions())
+        ),
+        EngineCase(
+            "engine.audio.mp3_to_wav", lambda fx: fx.mp3(seconds), ".wav",
+            lambda b, src, dst: b.conversion_engine.process_audio(src, dst, b.AudioProcessingOptions())
+        ),
+        EngineCase(
+            "engine.audio.wav_to_mp3_normalized", lambda fx: fx.wav(seconds), ".mp3",
+            lambda b, src, dst: b.conversion_engine.process_audio(src, dst, b.AudioProcessingOptions(normalize=True))
+        ),
+        EngineCase(
+            "engine.data.csv_to_json", lambda fx: fx.csv(rows), ".json",
+            lambda b, src, dst: b.conversion_engine.convert_csv_to_json(src, dst, b.DataProcessingOptions())
+        ),
+        EngineCase(
+            "engine.data.json_to_csv", lambda fx: fx.json(rows), ".csv",
+            lambda b, src, dst: b.conversion_engine.convert_json_to_csv(src, dst, b.DataProcessingOptions())
+        ),
+    ]
+    return cases
+
+async def run_engine(backend, fixtures: Fixtures, workdir: Path, args) -> List[BenchmarkResult]:
+    await backend.execution_engine.warm_up()
+    output_dir = workdir / "engine_outputs"
+    output_dir.mkdir(exist_ok=True)
+    cases = [
+        case for case in engine_cases(args.quick, backend.office_pool.available)
+        if not args.only or args.only in case.name
+    ]
+    office = any(case.name.startswith("engine.docx_to_pdf") for case in cases)
+    if office:
+        # Started once up front, as a worker does, so start-up is not timed
+        await asyncio.to_thread(backend.office_pool.start)
+    results = []
+    try:
+        for case in cases:
+            source = case.input(fixtures)
+            result = BenchmarkResult(case.name, input_bytes=source.stat().st_size)
+            with RssSampler() as sampler:
+                for iteration in range(args.warmup + args.iterations):
+                    output = output_dir / f"{uuid.uuid4().hex}{case.output_suffix}"
+                    started = time.perf_counter()
+                    try:
+                        await case.run(backend, source, output)
+                    except Exception as e:
+                        result.errors += 1
+                        print(f"  {case.name}: {e}", file=sys.stderr)
+                        continue
+                    if iteration >= args.warmup:
+                        result.latencies.append(time.perf_counter() - started)
+            result.peak_rss = sampler.peak
+            shutil.rmtree(output_dir)
+            output_dir.mkdir()
+            print_result(result)
+            results.append(result)
+    finally:
+        if office:
+            backend.office_pool.stop()
+        backend.execution_engine.shutdown()
+    return results
+
+# API benchmarks
+@dataclass
+class ApiScenario:
+    name: str
+    path: str
+    params: Dict[str, str]
+    input: Callable[[Fixtures], Path]
+    filename: str
+    content_type: str
+    file_field: str = "file"
+    form: Dict[str, str] = field(default_factory=dict)
+
+def api_scenarios(quick: bool) -> List[ApiScenario]:
+    rows = 10_000 if quick else 100_000
+    seconds = 5 if quick else 10
+    return [
+        ApiScenario("api.pdf_to_docx", "/convert/pdf-to-docx", {}, lambda fx: fx.pdf(4 if quick else 10), "document.pdf", "application/pdf"),
+        ApiScenario("api.csv_to_json", "/convert/csv-to-json", {}, lambda fx: fx.csv(rows), "data.csv", "text/csv"),
+        ApiScenario("api.json_to_csv", "/convert/json-to-csv", {}, lambda fx: fx.json(rows), "data.json", "application/json"),
+        ApiScenario("api.video_to_audio", "/convert/video-to-audio", {"output_format": "mp3"}, lambda fx: fx.mp4(seconds), "clip.mp4", "video/mp4"),
+        ApiScenario("api.mp3_to_wav", "/convert/batch", {"conversion_type": "mp3_to_wav"}, lambda fx: fx.mp3(seconds), "track.mp3", "audio/mpeg", file_field="files"),
+        ApiScenario("api.image_process", "/image/process", {"output_format": "webp"}, lambda fx: fx.image(1 if quick else 4, "jpg"), "photo.jpg", "image/jpeg", form={"width": "1600"}),
+    ]
+
+def encode_multipart(field_name: str, filename: str, content_type: str, data: bytes, form: Dict[str, str]) -> tuple:
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in form.items()
+    ]
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+        f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+class ApiClient:
+    def __init__(self, base_url: str, timeout: float = 300):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: bytes = None, headers: Dict[str, str] = None) -> tuple:
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def run_job(self, scenario: ApiScenario, data: bytes, poll_interval: float = 0.05):
+        """Upload, wait for the job and download its output; raises on failure."""
+        # A fresh bearer token per job keeps the benchmark clear of rate limits
+        headers = {"Authorization": f"Bearer bench-{uuid.uuid4().hex}"}
+        body, content_type = encode_multipart(scenario.file_field, scenario.filename, scenario.content_type, data, scenario.form)
+        query = f"?{urlencode(scenario.params)}" if scenario.params else ""
+        status, content = self.request("POST", scenario.path + query, body, {**headers, "Content-Type": content_type})
+        if status != 200:
+            raise RuntimeError(f"upload returned {status}: {content[:200]!r}")
+        job = json.loads(content)
+        job_id = (job[0] if isinstance(job, list) else job)["job_id"]
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            status, content = self.request("GET", f"/job/{job_id}", headers=headers)
+            job = json.loads(content) if status == 200 else {}
+            if job.get("status") == "completed":
+                break
+            if job.get("status") == "failed" or status != 200:
+                raise RuntimeError(f"job {job_id} failed: {job.get('message') or status}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"job {job_id} did not finish")
+            time.sleep(poll_interval)
+
+        status, content = self.request("GET", job["download_url"], headers=headers)
+        if status != 200 or not content:
+            raise RuntimeError(f"download returned {status}")
+
+class ApiServer:
+    """Runs the app under uvicorn in a scratch directory for the benchmark."""
+
+    def __init__(self, workdir: Path):
+        self.workdir = workdir
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+
+    def __enter__(self):
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=self.workdir
+        )
+        client = ApiClient(self.url, timeout=5)
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("API server exited during start-up")
+            try:
+                if client.request("GET", "/health")[0] == 200:
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError("API server did not start")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def run_api(fixtures: Fixtures, base_url: str, server_pid: Optional[int], args) -> List[BenchmarkResult]:
+    client = ApiClient(base_url)
+    results = []
+    for scenario in api_scenarios(args.quick):
+        if args.only and args.only not in scenario.name:
+            continue
+        data = scenario.input(fixtures).read_bytes()
+        suffix = Path(scenario.filename).suffix
+        result = BenchmarkResult(f"{scenario.name}.c{args.concurrency}", input_bytes=len(data))
+
+        def one_job(_):
+            payload = data if args.allow_cache else make_unique(data, suffix, uuid.uuid4().hex)
+            started = time.perf_counter()
+            try:
+                client.run_job(scenario, payload)
+            except Exception as e:
+                print(f"  {scenario.name}: {e}", file=sys.stderr)
+                return None
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(one_job, range(args.warmup)))
+            with RssSampler(server_pid) if server_pid else _NoSampler() as sampler:
+                started = time.perf_counter()
+                latencies = list(pool.map(one_job, range(args.requests)))
+                result.wall_time = time.perf_counter() - started
+
+        result.latencies = [latency for latency in latencies if latency is not None]
+        result.errors = len(latencies) - len(result.latencies)
+        result.peak_rss = sampler.peak
+        print_result(result)
+        results.append(result)
+    return results
+
+class _NoSampler:
+    # Memory of a remote server (--url) cannot be sampled
+    peak = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+# Baselines
+REGRESSION_METRICS = {
+    # metric: True when higher is better
+    "p50_ms": False,
+    "p95_ms": False,
+    "mb_per_sec": True,
+    "peak_rss_mb": False,
+}
+
+def save_baseline(path: Path, results: List[BenchmarkResult], args):
+    baseline = {
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {"quick": args.quick, "iterations": args.iterations, "concurrency": args.concurrency},
+        "results": {result.name: result.summary() for result in results},
+    }
+    path.write_text(json.dumps(baseline, indent=2))
+    print(f"Saved baseline for {len(results)} benchmarks to {path}")
+
+def compare_baseline(path: Path, results: List[BenchmarkResult], threshold: float) -> List[str]:
+    """Regressions beyond ``threshold`` (a fraction) against a saved baseline."""
+    baseline = json.loads(path.read_text())["results"]
+    regressions = []
+    for result in results:
+        before = baseline.get(result.name)
+        if before is None:
+            continue
+        after = result.summary()
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{result.name}: errors {before['errors']} -> {after['errors']}")
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            old, new = before.get(metric), after[metric]
+            if not old or not new:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{result.name}: {metric} {old} -> {new} ({change:+.1%})")
+    return regressions
+
+def print_result(result: BenchmarkResult):
+    s = result.summary()
+    print(
+        f"{result.name:<42} n={s['count']:<4} err={s['errors']:<3} p50={s['p50_ms']:>9.1f}ms "
+        f"p95={s['p95_ms']:>9.1f}ms p99={s['p99_ms']:>9.1f}ms {s['ops_per_sec']:>8.2f} ops/s "
+        f"{s['mb_per_sec']:>8.2f} MB/s rss={s['peak_rss_mb']:>7.1f}MB",
+        flush=True
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark conversions and API endpoints offline")
+    parser.add_argument("suite", choices=["engine", "api", "all"], nargs="?", default="all")
+    parser.add_argument("--only", help="Run only benchmarks whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="Small fixtures and fewer cases, for a fast check")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed runs per engine case")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before each case")
+    parser.add_argument("--requests", type=int, default=20, help="Jobs per API scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent API clients")
+    parser.add_argument("--url", help="Benchmark a running API instead of starting one")
+    parser.add_argument("--allow-cache", action="store_true", help="Send identical API uploads so the result cache can serve them")
+    parser.add_argument("--fixtures", type=Path, default=Path(tempfile.gettempdir()) / "convertor-benchmark-fixtures",
+                        help="Where generated fixtures are kept between runs")
+    parser.add_argument("--save-baseline", type=Path, help="Write the results to this file")
+    parser.add_argument("--baseline", type=Path, help="Compare the results with this file and exit 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change counted as a regression")
+    args = parser.parse_args()
+    for name in ("fixtures", "save_baseline", "baseline"):
+        if getattr(args, name):
+            setattr(args, name, getattr(args, name).resolve())
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="convertor-benchmark-") as scratch:
+        scratch = Path(scratch)
+        # Importing the backend creates its database and converted/ in the
+        # working directory, so keep them out of the source tree
+        os.chdir(scratch)
+        sys.path.insert(0, str(BACKEND_DIR))
+        import main as backend
+
+        fixtures = Fixtures(args.fixtures, backend.ffmpeg_binary())
+        if args.suite in ("engine", "all"):
+            results += asyncio.run(run_engine(backend, fixtures, scratch, args))
+        if args.suite in ("api", "all"):
+            if args.url:
+                results += run_api(fixtures, args.url, None, args)
+            else:
+                with ApiServer(scratch / "api") as server:
+                    results += run_api(fixtures, server.url, server.process.pid, args)
+        os.chdir(BACKEND_DIR)
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, args)
+    if args.baseline:
+        regressions = compare_baseline(args.baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
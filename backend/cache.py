@@ -0,0 +1,235 @@
+"""Content-addressed cache of conversion outputs."""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import socket
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+import services
+from metrics import cache_requests, metrics
+from services import redis_client
+from uploads import file_manager
+
+@dataclass
+class ResultCache:
+    """Content-addressed cache of conversion outputs.
+
+    Entries are keyed on (input hash, conversion type, normalized options) and
+    live under ``base_path/cache``. A hit is served by hard-linking the cached
+    output to the job's output path, so it costs no conversion work and no
+    extra disk space. The LRU index lives in Redis when it is available and
+    in process memory otherwise. The files are only visible to processes
+    that share ``base_path``, so the Redis index is scoped to this host
+    unless ``RESULT_CACHE_SCOPE`` names a scope shared by every node (for
+    ``converted/`` on shared storage). Redis updates are atomic scripts, so
+    processes storing or evicting the same entry count its bytes once.
+    Lookups run on a thread, since both the index and the files block.
+    """
+    base_path: Path = file_manager.base_path / "cache"
+    max_bytes: int = 2 * 1024 * 1024 * 1024  # 2GB
+    redis_prefix: str = f"result_cache:{os.getenv('RESULT_CACHE_SCOPE') or socket.gethostname()}"
+    
+    # Add an entry unless the key is already cached; returns 1 when added
+    _PUT_SCRIPT = """
+    if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+        return 0
+    end
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+    redis.call('ZADD', KEYS[3], ARGV[4], ARGV[1])
+    redis.call('INCRBY', KEYS[4], ARGV[3])
+    return 1
+    """
+    # Remove an entry; returns its filename to whichever caller removed it
+    _DROP_SCRIPT = """
+    local filename = redis.call('HGET', KEYS[1], ARGV[1])
+    if not filename then
+        return false
+    end
+    local size = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    redis.call('DECRBY', KEYS[4], size)
+    return filename
+    """
+    
+    def __post_init__(self):
+        self.base_path.mkdir(exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (filename, size), ordered from least to most recently used
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys = [f"{self.redis_prefix}:{name}" for name in ("files", "sizes", "lru", "bytes")]
+        # Registering loads nothing into Redis until the first call
+        self._put = redis_client.register_script(self._PUT_SCRIPT)
+        self._drop = redis_client.register_script(self._DROP_SCRIPT)
+    
+    def start(self):
+        # Only known once connect_services() has checked for Redis
+        if not services.REDIS_AVAILABLE:
+            self._load_local_index()
+    
+    def _load_local_index(self):
+        # Rebuild the index from disk so a restart does not lose the cache
+        entries = []
+        for path in self.base_path.iterdir():
+            # Dot files are copies that were never moved into place
+            if path.is_file() and not path.name.startswith("."):
+                stat = path.stat()
+                entries.append((stat.st_atime, path.stem, path.name, stat.st_size))
+        for _, key, filename, size in sorted(entries):
+            self._index[key] = (filename, size)
+    
+    @staticmethod
+    def make_key(content_hash: str, conversion_type: str, options: Optional[BaseModel] = None) -> str:
+        normalized = options.model_dump(mode="json", exclude_none=True) if options is not None else {}
+        payload = json.dumps([content_hash, conversion_type, normalized], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    @property
+    def total_bytes(self) -> int:
+        if services.REDIS_AVAILABLE:
+            return int(redis_client.get(f"{self.redis_prefix}:bytes") or 0)
+        with self._lock:
+            return sum(size for _, size in self._index.values())
+    
+    def _get_entry(self, key: str) -> Optional[str]:
+        if services.REDIS_AVAILABLE:
+            filename = redis_client.hget(f"{self.redis_prefix}:files", key)
+            if filename is not None:
+                redis_client.zadd(f"{self.redis_prefix}:lru", {key: datetime.now().timestamp()})
+            return filename
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            self._index.move_to_end(key)
+            return entry[0]
+    
+    def _put_entry(self, key: str, filename: str, size: int) -> bool:
+        """Add an entry; False when the key was cached already."""
+        if services.REDIS_AVAILABLE:
+            return bool(self._put(keys=self._keys, args=[key, filename, size, datetime.now().timestamp()]))
+        with self._lock:
+            if key in self._index:
+                return False
+            self._index[key] = (filename, size)
+            return True
+    
+    def _drop_entry(self, key: str) -> Optional[str]:
+        """Remove an entry, returning its filename unless someone else removed it first."""
+        if services.REDIS_AVAILABLE:
+            return self._drop(keys=self._keys, args=[key])
+        with self._lock:
+            entry = self._index.pop(key, None)
+        return entry[0] if entry else None
+    
+    def _oldest_key(self) -> Optional[str]:
+        if services.REDIS_AVAILABLE:
+            oldest = redis_client.zrange(f"{self.redis_prefix}:lru", 0, 0)
+            return oldest[0] if oldest else None
+        with self._lock:
+            return next(iter(self._index), None)
+    
+    def _count(self, counter: str):
+        setattr(self, counter, getattr(self, counter) + 1)
+        if services.REDIS_AVAILABLE:
+            redis_client.incr(f"{self.redis_prefix}:{counter}")
+    
+    async def fetch(self, key: str, output_path: Path) -> bool:
+        """Materialize a cached result at ``output_path``. Returns False on a miss."""
+        return await asyncio.to_thread(self._fetch, key, output_path)
+    
+    def _fetch(self, key: str, output_path: Path) -> bool:
+        filename = self._get_entry(key)
+        if filename is not None:
+            try:
+                _link_or_copy(self.base_path / filename, output_path)
+                self._count("hits")
+                return True
+            except FileNotFoundError:
+                # The entry was removed from disk behind our back
+                self._drop_entry(key)
+        self._count("misses")
+        return False
+    
+    async def store(self, key: str, output_path: Path):
+        await asyncio.to_thread(self._store, key, output_path)
+    
+    def _store(self, key: str, output_path: Path):
+        if self._get_entry(key) is not None:
+            return
+        # Copied aside and moved into place, so the cached file is always
+        # complete; a concurrent store of the same key writes the same content
+        cached_path = self.base_path / f"{key}{output_path.suffix}"
+        staging_path = self.base_path / f".{uuid.uuid4().hex}{output_path.suffix}"
+        _link_or_copy(output_path, staging_path)
+        os.replace(staging_path, cached_path)
+        # rename() is a no-op when both names link the same file, as after a concurrent store
+        staging_path.unlink(missing_ok=True)
+        if self._put_entry(key, cached_path.name, cached_path.stat().st_size):
+            self._evict()
+    
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            key = self._oldest_key()
+            if key is None:
+                break
+            filename = self._drop_entry(key)
+            if filename is None:
+                # Another process evicted it first
+                continue
+            (self.base_path / filename).unlink(missing_ok=True)
+            self._count("evictions")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters, shared by every process in the scope when Redis is used; blocking."""
+        hits, misses, evictions = self.hits, self.misses, self.evictions
+        if services.REDIS_AVAILABLE:
+            hits, misses, evictions = (
+                int(count or 0) for count in redis_client.mget(
+                    [f"{self.redis_prefix}:{counter}" for counter in ("hits", "misses", "evictions")]
+                )
+            )
+            entries = redis_client.zcard(f"{self.redis_prefix}:lru")
+        else:
+            entries = len(self._index)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / lookups * 100) if lookups > 0 else 0,
+            "evictions": evictions,
+            "entries": entries,
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+def _link_or_copy(source: Path, destination: Path):
+    # Hard links make a cache hit free; fall back to a copy across filesystems
+    destination.unlink(missing_ok=True)
+    try:
+        os.link(source, destination)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(source, destination)
+
+result_cache = ResultCache()
+
+@metrics.collector
+def _collect_result_cache_metrics():
+    cache_requests.set(result_cache.hits, cache="result", result="hit")
+    cache_requests.set(result_cache.misses, cache="result", result="miss")
@@ -0,0 +1,299 @@
+"""Where conversions run: lazily imported converter libraries and the pools
+that run blocking converter functions off the event loop.
+"""
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+import services
+from metrics import (
+    metrics, backend_import_seconds, conversion_stage_seconds, current_conversion, executor_queued, executor_running,
+    executor_saturation, executor_wait_seconds
+)
+from office import office_pool
+from services import trace_span
+
+logger = logging.getLogger(__name__)
+
+class LazyModule:
+    """A converter library that is imported the first time it is used.
+
+    Importing every backend up front made each process pay for libraries its
+    jobs might never need. Attributes are cached after the first lookup, so
+    later uses cost the same as a plain module attribute.
+    """
+    
+    def __init__(self, name: str, backend: str):
+        self.__dict__.update(_name=name, _backend=backend, _module=None)
+    
+    def load(self):
+        if self._module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self._name)
+            seconds = time.perf_counter() - started
+            self.__dict__["_module"] = module
+            backend_import_seconds.set(round(seconds, 4), backend=self._backend, module=self._name)
+            logger.info(f"Loaded conversion backend {self._name} in {seconds:.3f}s")
+        return self._module
+    
+    def __getattr__(self, attr: str):
+        value = getattr(self.load(), attr)
+        self.__dict__[attr] = value
+        return value
+
+pdf2docx = LazyModule("pdf2docx", "pdf2docx")
+fitz = LazyModule("fitz", "pymupdf")
+docx2pdf = LazyModule("docx2pdf", "docx2pdf")
+Image = LazyModule("PIL.Image", "pillow")
+ImageEnhance = LazyModule("PIL.ImageEnhance", "pillow")
+ImageFilter = LazyModule("PIL.ImageFilter", "pillow")
+CONVERSION_BACKENDS = (pdf2docx, fitz, docx2pdf, Image, ImageEnhance, ImageFilter)
+
+# Backends imported while starting up instead of on first use, e.g.
+# "pillow,pymupdf"; "all" warms every backend
+WARM_BACKENDS = [name.strip() for name in os.getenv("WARM_BACKENDS", "").split(",") if name.strip()]
+
+def warm_backends(names: List[str] = WARM_BACKENDS):
+    for module in CONVERSION_BACKENDS:
+        if "all" in names or module._backend in names:
+            try:
+                module.load()
+            except ImportError as e:
+                logger.warning(f"Could not warm conversion backend {module._backend}: {e}")
+
+# Conversion execution
+_progress_queue = None
+
+def _init_conversion_worker(progress_queue=None):
+    global _progress_queue
+    _progress_queue = progress_queue
+    # Forked workers inherit the backends the parent already loaded; this
+    # covers the configured ones when workers are spawned instead
+    warm_backends()
+
+def _warm_conversion_worker() -> int:
+    return os.getpid()
+
+def report_progress(token: Optional[str], value: float):
+    """Send a progress value from a converter back to the coroutine that started it.
+
+    Works from worker processes and threads alike; ``token`` is the
+    ``progress_token`` that ``ExecutionEngine.run`` passed to the converter.
+    """
+    if token is not None and _progress_queue is not None:
+        _progress_queue.put_nowait((token, value))
+
+_stage_state = threading.local()
+
+@contextmanager
+def conversion_stage(name: str):
+    """Time one stage of a converter, such as decode, transform or encode.
+
+    ``ExecutionEngine.run`` collects the stages of each call, from worker
+    processes too, and records them against the job's conversion type.
+    Outside of it the timing is dropped.
+    """
+    started_ns = time.time_ns()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = getattr(_stage_state, "timings", None)
+        if timings is not None:
+            timings.append((name, started_ns, time.perf_counter() - started))
+
+def _run_timed(fn: Callable, *args):
+    # Runs on the pool and hands the converter's stage timings back with its result
+    _stage_state.timings = []
+    try:
+        return fn(*args), _stage_state.timings
+    finally:
+        _stage_state.timings = None
+
+def record_stage_timings(timings: List[tuple], conversion_type: str):
+    totals: Dict[str, float] = {}
+    for stage, started_ns, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+        if services.TRACING_AVAILABLE:
+            # Stages ran in another process, so their spans are recorded after the fact
+            services.tracer.start_span(stage, start_time=started_ns).end(end_time=started_ns + int(seconds * 1e9))
+    for stage, seconds in totals.items():
+        conversion_stage_seconds.observe(seconds, conversion_type=conversion_type, stage=stage)
+
+@dataclass
+class ExecutionEngine:
+    """Runs blocking converter functions off the event loop.
+
+    CPU-bound conversion kinds run on a shared pool of warm worker processes
+    so they scale across cores instead of contending for the GIL; everything
+    else uses a small thread pool. Every kind has its own concurrency limit,
+    which keeps a burst of one slow kind from occupying every worker.
+    """
+    process_workers: int = int(os.getenv("CONVERSION_PROCESS_WORKERS", os.cpu_count() or 1))
+    thread_workers: int = int(os.getenv("CONVERSION_THREAD_WORKERS", 4))
+    process_kinds: tuple = ("document", "image", "audio", "video", "data")
+    concurrency_limits: Dict[str, int] = None
+    
+    def __post_init__(self):
+        if self.concurrency_limits is None:
+            half = max(1, self.process_workers // 2)
+            self.concurrency_limits = {
+                'document': half,
+                'image': self.process_workers,
+                'audio': half,
+                'video': half,
+                'data': half,
+                # Word automation is single-threaded; the office pool runs one
+                # conversion per instance, and calls beyond the live ones wait
+                'office': office_pool.size if office_pool.available else 1,
+            }
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._progress_queue = None
+        self._progress_listeners: Dict[str, tuple] = {}
+        self._queued: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+    
+    def start(self):
+        global _progress_queue
+        if self._progress_queue is None:
+            # Converters in worker processes and threads report progress through
+            # this queue; a listener thread hands it back to the event loop
+            self._progress_queue = multiprocessing.Queue()
+            _progress_queue = self._progress_queue
+            threading.Thread(target=self._dispatch_progress, name="conversion-progress", daemon=True).start()
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                initializer=_init_conversion_worker,
+                initargs=(self._progress_queue,)
+            )
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers,
+                thread_name_prefix="conversion"
+            )
+    
+    async def warm_up(self):
+        """Spawn every worker process up front so no job pays the start-up cost."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self._process_pool, _warm_conversion_worker)
+            for _ in range(self.process_workers)
+        ])
+        logger.info(f"Conversion process pool ready (workers={self.process_workers})")
+    
+    def shutdown(self):
+        global _progress_queue
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._progress_queue is not None:
+            self._progress_queue.put(None)
+            self._progress_queue = _progress_queue = None
+    
+    def _dispatch_progress(self):
+        queue = self._progress_queue
+        while True:
+            message = queue.get()
+            if message is None:
+                return
+            token, value = message
+            listener = self._progress_listeners.get(token)
+            if listener is not None:
+                loop, callback = listener
+                loop.call_soon_threadsafe(callback, value)
+    
+    def _semaphore(self, kind: str) -> asyncio.Semaphore:
+        if kind not in self._semaphores:
+            limit = self.concurrency_limits.get(kind, self.thread_workers)
+            self._semaphores[kind] = asyncio.Semaphore(limit)
+        return self._semaphores[kind]
+    
+    @asynccontextmanager
+    async def _slot(self, kind: str):
+        # Holds one of the kind's worker slots, keeping the queue depth and
+        # saturation metrics current
+        semaphore = self._semaphore(kind)
+        queued_at = time.perf_counter()
+        self._queued[kind] = self._queued.get(kind, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._queued[kind] -= 1
+        executor_wait_seconds.observe(time.perf_counter() - queued_at, kind=kind)
+        self._running[kind] = self._running.get(kind, 0) + 1
+        try:
+            yield
+        finally:
+            self._running[kind] -= 1
+            semaphore.release()
+    
+    def collect_metrics(self):
+        for kind in set(self.concurrency_limits) | set(self._queued):
+            limit = self.concurrency_limits.get(kind, self.thread_workers)
+            running = self._running.get(kind, 0)
+            executor_queued.set(self._queued.get(kind, 0), kind=kind)
+            executor_running.set(running, kind=kind)
+            executor_saturation.set(round(running / limit, 3), kind=kind)
+    
+    async def run(self, kind: str, fn: Callable, *args, progress: Optional[Callable[[float], None]] = None):
+        """Run ``fn(*args)`` on the pool for ``kind``.
+
+        With a ``progress`` callback, ``fn`` is also given a ``progress_token``
+        keyword; every ``report_progress(progress_token, value)`` it makes is
+        delivered to the callback on the event loop. The time spent waiting
+        for a slot and every ``conversion_stage`` inside ``fn`` are recorded
+        in the metrics.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        conversion_type = current_conversion.get()
+        token = None
+        if progress is not None:
+            token = uuid.uuid4().hex
+            self._progress_listeners[token] = (loop, progress)
+            fn = partial(fn, progress_token=token)
+        try:
+            async with self._slot(kind):
+                with trace_span(f"execute {kind}", attributes={"conversion.type": conversion_type}):
+                    with conversion_stage_seconds.timer(conversion_type=conversion_type, stage="execute"):
+                        result, timings = await self._submit(kind, partial(_run_timed, fn), *args)
+                    record_stage_timings(timings, conversion_type)
+                    return result
+        finally:
+            if token is not None:
+                self._progress_listeners.pop(token, None)
+    
+    async def _submit(self, kind: str, fn: Callable, *args):
+        loop = asyncio.get_running_loop()
+        if kind not in self.process_kinds:
+            return await loop.run_in_executor(self._thread_pool, fn, *args)
+        try:
+            return await loop.run_in_executor(self._process_pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool for later jobs
+            logger.error(f"Conversion process pool broke while running a {kind} job, restarting it")
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+            self.start()
+            raise
+
+execution_engine = ExecutionEngine()
+metrics.collector(execution_engine.collect_metrics)
@@ -0,0 +1,308 @@
+"""The durable job queue and the scheduler that orders it."""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+import services
+from execution import execution_engine
+from jobs import get_job_record, job_status_cache, job_store, stats_rollups, update_job_status
+from metrics import jobs_shed, scheduler_predicted_wait
+from models import ConversionRecord, ConversionStatus
+from ratelimit import rate_limit_cost
+from services import trace_carrier
+from uploads import SavedUpload
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class JobScheduler:
+    """Picks the pending job a worker claims next, and sheds load.
+
+    A job's run time is estimated from recent completed jobs of the same
+    conversion type and input size bucket (powers of two). Without enough
+    of those, the estimate falls back to the type's throughput and then to
+    its rate limit cost. Workers claim the job with the lowest score:
+
+        expected seconds
+        - aging * seconds waited
+        + fairness * expected seconds of the user's running jobs / user weight
+
+    Short jobs therefore go first. Long jobs still run once they have
+    waited long enough. A user with a lot of work running yields to the
+    others. New jobs are refused with 503 while the predicted queue wait
+    is above ``wait_slo``.
+    """
+    window: int = int(os.getenv("SCHEDULER_WINDOW", 200))
+    aging: float = float(os.getenv("SCHEDULER_AGING", 0.25))
+    fairness: float = float(os.getenv("SCHEDULER_FAIRNESS", 1.0))
+    wait_slo: float = float(os.getenv("QUEUE_WAIT_SLO", 600))
+    # Jobs running at once across all workers (default: one embedded worker's)
+    capacity: int = int(os.getenv("SCHEDULER_CAPACITY", 0))
+    history: int = 5000
+    min_samples: int = 3
+    refresh_interval: float = 60
+    default_seconds: float = 1.0
+    user_weights: Dict[str, float] = None
+    
+    def __post_init__(self):
+        if self.user_weights is None:
+            # e.g. SCHEDULER_USER_WEIGHTS="team-a=2,batch-bot=0.5"
+            self.user_weights = {
+                user: float(weight)
+                for user, _, weight in (
+                    item.partition("=") for item in os.getenv("SCHEDULER_USER_WEIGHTS", "").split(",") if "=" in item
+                )
+            }
+        self._bucket_seconds: Dict[tuple, float] = {}
+        self._seconds_per_byte: Dict[str, float] = {}
+        self._refreshed_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._predicted_wait = (0.0, 0.0)  # (computed at, seconds)
+    
+    @staticmethod
+    def size_bucket(size: Optional[int]) -> int:
+        return max(0, int(size or 0).bit_length() - 10)
+    
+    def estimate(self, conversion_type: str, size: Optional[int]) -> float:
+        """Expected processing seconds for a job."""
+        key = (self._type_key(conversion_type), self.size_bucket(size))
+        if key in self._bucket_seconds:
+            return self._bucket_seconds[key]
+        if key[0] in self._seconds_per_byte and size:
+            return self._seconds_per_byte[key[0]] * size
+        return self.default_seconds * rate_limit_cost(conversion_type)
+    
+    @staticmethod
+    def _type_key(conversion_type: str) -> str:
+        # Output formats of the same processing share their history
+        return "image_process" if conversion_type.startswith("image_process_") else conversion_type
+    
+    def refresh(self, db: Session, force: bool = False):
+        """Reload the estimates from job history once they are older than ``refresh_interval``."""
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            rows = db.query(
+                ConversionRecord.conversion_type, ConversionRecord.input_size, ConversionRecord.processing_time
+            ).filter(
+                ConversionRecord.status == ConversionStatus.COMPLETED,
+                ConversionRecord.processing_time.isnot(None),
+                ConversionRecord.input_size > 0
+            ).order_by(ConversionRecord.created_at.desc()).limit(self.history).all()
+            
+            by_bucket: Dict[tuple, List[float]] = {}
+            by_type: Dict[str, List[float]] = {}
+            for conversion_type, size, seconds in rows:
+                key = self._type_key(conversion_type)
+                by_bucket.setdefault((key, self.size_bucket(size)), []).append(seconds)
+                by_type.setdefault(key, []).append(seconds / size)
+            # Medians, so one stuck job does not skew a bucket
+            self._bucket_seconds = {
+                key: sorted(samples)[len(samples) // 2]
+                for key, samples in by_bucket.items() if len(samples) >= self.min_samples
+            }
+            self._seconds_per_byte = {
+                key: sorted(samples)[len(samples) // 2]
+                for key, samples in by_type.items() if len(samples) >= self.min_samples
+            }
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+    
+    def order(self, candidates: List[ConversionRecord], now: datetime, db: Session) -> List[ConversionRecord]:
+        """Sort claimable jobs, best first."""
+        self.refresh(db)
+        running = db.query(
+            ConversionRecord.user_id, ConversionRecord.conversion_type, ConversionRecord.input_size
+        ).filter(
+            ConversionRecord.status == ConversionStatus.PROCESSING,
+            ConversionRecord.lease_expires_at >= now
+        ).all()
+        user_load: Dict[str, float] = {}
+        for user_id, conversion_type, size in running:
+            user_load[user_id] = user_load.get(user_id, 0.0) + self.estimate(conversion_type, size)
+        
+        def score(job: ConversionRecord) -> float:
+            waited = (now - (job.available_at or job.created_at or now)).total_seconds()
+            share = user_load.get(job.user_id, 0.0) / self.user_weights.get(job.user_id, 1.0)
+            return self.estimate(job.conversion_type, job.input_size) - self.aging * max(0.0, waited) + self.fairness * share
+        
+        return sorted(candidates, key=score)
+    
+    async def predicted_wait(self, max_age: float = 2.0) -> float:
+        """Seconds a job queued now is expected to wait before it starts."""
+        computed_at, seconds = self._predicted_wait
+        if time.monotonic() - computed_at > max_age:
+            seconds = await job_store.run(self._backlog_seconds) / (self.capacity or execution_engine.process_workers)
+            self._predicted_wait = (time.monotonic(), seconds)
+            scheduler_predicted_wait.set(round(seconds, 3))
+        return seconds
+    
+    def _backlog_seconds(self, db: Session) -> float:
+        self.refresh(db)
+        groups = db.query(
+            ConversionRecord.conversion_type, func.count(), func.avg(ConversionRecord.input_size)
+        ).filter(
+            ConversionRecord.status.in_([ConversionStatus.PENDING, ConversionStatus.PROCESSING]),
+            ConversionRecord.input_path.isnot(None)
+        ).group_by(ConversionRecord.conversion_type).all()
+        return sum(count * self.estimate(conversion_type, int(size or 0)) for conversion_type, count, size in groups)
+    
+    async def admit(self, conversion_type: str):
+        """Refuse new work with 503 and a ``Retry-After`` while the queue is over its SLO."""
+        wait = await self.predicted_wait()
+        if wait > self.wait_slo:
+            jobs_shed.inc(conversion_type=conversion_type)
+            raise HTTPException(
+                status_code=503,
+                detail="The conversion queue is full, try again later",
+                headers={"Retry-After": str(max(1, int(wait - self.wait_slo + 0.999)))}
+            )
+
+job_scheduler = JobScheduler()
+
+# Job queue
+# Failures that another attempt can get past: a worker process that died,
+# I/O and connection errors (timeouts included) and a lost database
+# connection. Anything else, such as a ValueError for an unreadable input
+# or a MemoryBudgetExceeded, fails the same way every time
+RETRYABLE_ERRORS = (BrokenProcessPool, OSError, OperationalError)
+
+class JobQueue:
+    """Durable job queue backed by the ``conversions`` table.
+
+    Endpoints only enqueue work. Workers (embedded in the API process or
+    started separately with ``python -m worker``) claim pending jobs by
+    taking a time-limited lease, renew it while the job runs and either
+    complete the job or, after an infrastructure error, hand it back for a
+    retry; errors in the input fail the job at once. A job whose worker died
+    is picked up again once its lease expires. Claims are compare-and-set
+    updates, so any number of workers can share one database.
+    """
+    
+    def __init__(self, lease_seconds: int = 60, max_attempts: int = 3, retry_backoff: int = 10):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+    
+    def queue_fields(self, upload: SavedUpload, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if services.TRACING_AVAILABLE:
+            # Lets the worker continue the trace of the request that queued the job
+            payload = {**(payload or {}), "trace": trace_carrier()}
+        return {
+            "status": ConversionStatus.PENDING,
+            "input_path": str(upload.path),
+            "input_size": upload.size,
+            "input_sha256": upload.sha256,
+            "payload": json.dumps(payload or {}),
+            "attempts": 0,
+            "available_at": datetime.now(),
+        }
+    
+    async def enqueue(self, job_id: str, upload: SavedUpload, payload: Optional[Dict[str, Any]] = None):
+        await job_store.update(job_id, **self.queue_fields(upload, payload))
+    
+    def claim(self, worker_id: str, db: Session, limit: Optional[int] = None) -> Optional[ConversionRecord]:
+        """Lease the claimable job that ``job_scheduler`` ranks first."""
+        now = datetime.now()
+        candidates = db.query(ConversionRecord).filter(
+            ConversionRecord.input_path.isnot(None),
+            or_(
+                and_(
+                    ConversionRecord.status == ConversionStatus.PENDING,
+                    or_(ConversionRecord.available_at.is_(None), ConversionRecord.available_at <= now)
+                ),
+                and_(
+                    ConversionRecord.status == ConversionStatus.PROCESSING,
+                    ConversionRecord.lease_expires_at < now
+                )
+            )
+        ).order_by(ConversionRecord.created_at).limit(limit or job_scheduler.window).all()
+        
+        for candidate in job_scheduler.order(candidates, now, db):
+            if candidate.status == ConversionStatus.PROCESSING and (candidate.attempts or 0) >= self.max_attempts:
+                # The last allowed attempt died without reporting back
+                self._finish_abandoned(candidate, db)
+                continue
+            
+            claimed = db.query(ConversionRecord).filter(
+                ConversionRecord.id == candidate.id,
+                ConversionRecord.status == candidate.status,
+                ConversionRecord.attempts == candidate.attempts
+            ).update({
+                ConversionRecord.status: ConversionStatus.PROCESSING,
+                ConversionRecord.lease_owner: worker_id,
+                ConversionRecord.lease_expires_at: now + timedelta(seconds=self.lease_seconds),
+                ConversionRecord.attempts: (candidate.attempts or 0) + 1
+            }, synchronize_session=False)
+            db.commit()
+            
+            if claimed:
+                db.refresh(candidate)
+                job_status_cache.invalidate(candidate.id, candidate.user_id)
+                return candidate
+        
+        return None
+    
+    def _finish_abandoned(self, job: ConversionRecord, db: Session):
+        finished = db.query(ConversionRecord).filter(
+            ConversionRecord.id == job.id,
+            ConversionRecord.status == ConversionStatus.PROCESSING,
+            ConversionRecord.attempts == job.attempts
+        ).update({
+            ConversionRecord.status: ConversionStatus.FAILED,
+            ConversionRecord.error: "Worker lease expired"
+        }, synchronize_session=False)
+        if finished:
+            stats_rollups.record_finished(job.id, {"status": ConversionStatus.FAILED}, db)
+        db.commit()
+        job_status_cache.invalidate(job.id, job.user_id)
+    
+    def renew_lease(self, job_id: str, worker_id: str, db: Session) -> bool:
+        renewed = db.query(ConversionRecord).filter(
+            ConversionRecord.id == job_id,
+            ConversionRecord.lease_owner == worker_id,
+            ConversionRecord.status == ConversionStatus.PROCESSING
+        ).update({
+            ConversionRecord.lease_expires_at: datetime.now() + timedelta(seconds=self.lease_seconds)
+        }, synchronize_session=False)
+        db.commit()
+        return bool(renewed)
+    
+    async def fail(self, job_id: str, error: Exception):
+        """Hand a job that hit ``RETRYABLE_ERRORS`` back for another attempt, or mark it failed for good."""
+        job = await job_store.run(get_job_record, job_id)
+        if not job:
+            return
+        
+        message = str(error) or type(error).__name__
+        attempts = job.attempts or 0
+        if isinstance(error, RETRYABLE_ERRORS) and job.input_path and attempts < self.max_attempts:
+            backoff = self.retry_backoff * 2 ** (attempts - 1)
+            logger.warning(f"Job {job_id} failed (attempt {attempts}/{self.max_attempts}), retrying in {backoff}s")
+            await update_job_status(
+                job_id,
+                ConversionStatus.PENDING,
+                error=message,
+                lease_owner=None,
+                lease_expires_at=None,
+                available_at=datetime.now() + timedelta(seconds=backoff)
+            )
+        else:
+            await update_job_status(job_id, ConversionStatus.FAILED, error=message, lease_owner=None)
+
+job_queue = JobQueue()
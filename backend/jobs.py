@@ -0,0 +1,657 @@
+"""Job records: their storage, status cache, progress events and statistics."""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import redis
+import redis.asyncio
+from sqlalchemy import or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import services
+from metrics import (
+    conversion_bytes, conversion_jobs, conversion_stage_seconds, current_conversion, db_operation_seconds
+)
+from models import (
+    DB_POOL_SIZE, ConversionRecord, ConversionResponse, ConversionStats, ConversionStatus, LatencySketchBin,
+    SessionLocal, engine
+)
+from services import redis_client
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {ConversionStatus.COMPLETED, ConversionStatus.FAILED}
+
+class ProgressBroker:
+    """Pushes job status and progress events to streaming subscribers.
+
+    Subscribers listen on ``job:<id>`` or ``user:<id>`` keys. With Redis,
+    events go through a pub/sub channel so API nodes see updates from
+    standalone workers; otherwise they are delivered in-process.
+    """
+    
+    channel = "job_events"
+    
+    def __init__(self, max_tracked_jobs: int = 10000, queue_size: int = 100):
+        self.max_tracked_jobs = max_tracked_jobs
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, set] = {}
+        self._owners: OrderedDict = OrderedDict()
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        if not services.REDIS_AVAILABLE or self._listener is not None:
+            return
+        self._redis = redis.asyncio.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+    
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+    
+    async def _listen(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                self._dispatch(json.loads(message["data"]))
+        finally:
+            await pubsub.aclose()
+    
+    def track(self, job_id: str, user_id: str):
+        """Remember a job's owner so its events also reach ``user:<id>``."""
+        self._owners[job_id] = user_id
+        self._owners.move_to_end(job_id)
+        while len(self._owners) > self.max_tracked_jobs:
+            self._owners.popitem(last=False)
+    
+    def owner(self, job_id: str) -> Optional[str]:
+        return self._owners.get(job_id)
+    
+    def publish(self, job_id: str, event: Dict[str, Any]):
+        message = {"job_id": job_id, "user_id": self._owners.get(job_id), "event": event}
+        if event.get("status") in TERMINAL_STATUSES:
+            self._owners.pop(job_id, None)
+        if self._redis is not None:
+            asyncio.ensure_future(self._redis.publish(self.channel, json.dumps(message)))
+        else:
+            self._dispatch(message)
+    
+    def _dispatch(self, message: Dict[str, Any]):
+        for key in (f"job:{message['job_id']}", f"user:{message['user_id']}"):
+            for queue in self._subscribers.get(key, ()):
+                if queue.full():
+                    # Slow consumer: drop its oldest event rather than block publishers
+                    queue.get_nowait()
+                queue.put_nowait(message["event"])
+    
+    @contextmanager
+    def subscribe(self, key: str):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[key].discard(queue)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+progress_broker = ProgressBroker()
+
+# Columns that make up a job's public status
+JOB_STATUS_FIELDS = (
+    "user_id", "status", "processing_time", "file_size", "throughput",
+    "progress", "error", "output_filename", "outputs"
+)
+
+def job_status_record(job: ConversionRecord) -> Dict[str, Any]:
+    return {field: getattr(job, field) for field in JOB_STATUS_FIELDS}
+
+def job_response(job_id: str, record: Dict[str, Any]) -> ConversionResponse:
+    """Build the ``GET /job/{id}`` response from a job's status fields."""
+    status = record.get("status", ConversionStatus.PROCESSING)
+    response = ConversionResponse(
+        job_id=job_id,
+        status=status,
+        processing_time=record.get("processing_time"),
+        file_size=record.get("file_size"),
+        throughput=record.get("throughput"),
+        progress=record.get("progress"),
+        message=record.get("error") if status == ConversionStatus.FAILED else None
+    )
+    
+    if status == ConversionStatus.COMPLETED and record.get("output_filename"):
+        response.download_url = f"/download/{record['output_filename']}"
+        if record.get("outputs"):
+            response.outputs = {
+                name: f"/download/{filename}" for name, filename in json.loads(record["outputs"]).items()
+            }
+    
+    return response
+
+def job_event(job_id: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a job write as the response that ``GET /job/{id}`` would return."""
+    return job_response(job_id, values).model_dump(mode="json", exclude_none=True)
+
+@dataclass
+class JobStatusCache:
+    """Write-through cache of job status.
+
+    ``JobStore`` applies every committed write here in the same step, so
+    status reads rarely reach the database. Entries live in a process-local
+    LRU and, when Redis is available, in a Redis hash shared by every API
+    node and worker. Finished jobs no longer change and are kept for as long
+    as the job exists; active jobs get a short TTL as a safety net.
+
+    ETags are derived from the cached content, so every node agrees on
+    them. With Redis, job lists are versioned per user instead: any write
+    to one of a user's jobs bumps the user's version.
+    """
+    max_entries: int = 10000
+    active_ttl: int = 10
+    terminal_ttl: int = 24 * 3600
+    redis_prefix: str = "job_status"
+    
+    # Merge into the Redis hash only if it exists, so a partial write never
+    # creates an incomplete entry; returns the job's owner
+    _MERGE_SCRIPT = """
+    if redis.call('exists', KEYS[1]) == 0 then return false end
+    redis.call('hset', KEYS[1], unpack(ARGV, 2))
+    redis.call('expire', KEYS[1], ARGV[1])
+    return redis.call('hget', KEYS[1], 'user_id')
+    """
+    
+    def __post_init__(self):
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # Registering loads nothing into Redis until the first call
+        self._merge = redis_client.register_script(self._MERGE_SCRIPT)
+    
+    @staticmethod
+    def etag(record: Dict[str, Any]) -> str:
+        digest = hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode()).hexdigest()
+        return f'"{digest[:20]}"'
+    
+    def _ttl(self, record: Dict[str, Any]) -> int:
+        return self.terminal_ttl if record.get("status") in TERMINAL_STATUSES else self.active_ttl
+    
+    def get_local(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                return None
+            expires, record = entry
+            if expires < time.monotonic():
+                del self._entries[job_id]
+                return None
+            self._entries.move_to_end(job_id)
+            return record
+    
+    def _set_local(self, job_id: str, record: Dict[str, Any]):
+        with self._lock:
+            self._entries[job_id] = (time.monotonic() + self._ttl(record), record)
+            self._entries.move_to_end(job_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Look a job up locally, then in Redis. Blocking; call off the event loop."""
+        record = self.get_local(job_id)
+        if record is None and services.REDIS_AVAILABLE:
+            cached = redis_client.hgetall(f"{self.redis_prefix}:{job_id}")
+            if cached:
+                record = {field: json.loads(value) for field, value in cached.items()}
+                self._set_local(job_id, record)
+        return record
+    
+    def put(self, job_id: str, record: Dict[str, Any]):
+        self._set_local(job_id, record)
+        if services.REDIS_AVAILABLE:
+            key = f"{self.redis_prefix}:{job_id}"
+            pipe = redis_client.pipeline()
+            pipe.hset(key, mapping={field: json.dumps(value, default=str) for field, value in record.items()})
+            pipe.expire(key, self._ttl(record))
+            pipe.execute()
+    
+    def apply(self, job_id: str, values: Dict[str, Any], user_id: Optional[str] = None):
+        """Merge a committed write into the cached entry, if there is one."""
+        values = {field: value for field, value in values.items() if field in JOB_STATUS_FIELDS}
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is not None:
+                record = {**entry[1], **values}
+                self._entries[job_id] = (time.monotonic() + self._ttl(record), record)
+                user_id = record.get("user_id") or user_id
+        if services.REDIS_AVAILABLE and values:
+            args = [self._ttl(values) if "status" in values else self.active_ttl]
+            for field, value in values.items():
+                args += [field, json.dumps(value, default=str)]
+            owner = self._merge(keys=[f"{self.redis_prefix}:{job_id}"], args=args)
+            if owner:
+                user_id = user_id or json.loads(owner)
+        self.bump(user_id)
+    
+    def invalidate(self, job_id: str, user_id: Optional[str] = None):
+        with self._lock:
+            self._entries.pop(job_id, None)
+        if services.REDIS_AVAILABLE:
+            redis_client.delete(f"{self.redis_prefix}:{job_id}")
+        self.bump(user_id)
+    
+    def bump(self, user_id: Optional[str]):
+        # Writes to a job whose owner is unknown change every user's list version.
+        # Without Redis there is no version other processes could bump, so
+        # job lists are tagged from their content instead
+        if services.REDIS_AVAILABLE:
+            key = f"user:{user_id}" if user_id else "all"
+            redis_client.incr(f"{self.redis_prefix}:version:{key}")
+    
+    def list_version(self, user_id: str) -> str:
+        """Version of a user's job list, shared through Redis; blocking."""
+        keys = [f"user:{user_id}", "all"]
+        versions = redis_client.mget([f"{self.redis_prefix}:version:{key}" for key in keys])
+        return ".".join(version or "0" for version in versions)
+
+job_status_cache = JobStatusCache()
+
+# Statistics rollups
+class LatencySketch:
+    """Log-bucketed latency histogram with a bounded relative error.
+
+    A value lands in bin ``ceil(log_gamma(value))``, so each bin spans a
+    fixed ratio and a quantile read back from the bins is within
+    ``relative_accuracy`` of the exact one. Sketches merge by adding their
+    bin counts, which lets rollups keep them as plain counters.
+    """
+    relative_accuracy: float = 0.02
+    gamma: float = (1 + relative_accuracy) / (1 - relative_accuracy)
+    min_seconds: float = 0.001
+    
+    @classmethod
+    def bin(cls, seconds: float) -> int:
+        return math.ceil(math.log(max(seconds, cls.min_seconds), cls.gamma))
+    
+    @classmethod
+    def value(cls, index: int) -> float:
+        # The point of the bin's range with the smallest relative error to either end
+        return 2 * cls.gamma ** index / (cls.gamma + 1)
+    
+    @classmethod
+    def quantile(cls, bins: Dict[int, int], q: float) -> Optional[float]:
+        total = sum(bins.values())
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(bins):
+            seen += bins[index]
+            if seen > rank:
+                return round(cls.value(index), 3)
+
+# Bucket of the rows that count every job since the rollups began
+STATS_ALL_TIME = datetime(1970, 1, 1)
+
+class StatsRollups:
+    """Per-user, per-conversion-type job statistics, kept up to date as jobs change status.
+
+    Counters live in hourly ``ConversionStats`` rows and a running all-time
+    row; processing times are added to ``LatencySketchBin`` counters. Every
+    change is an upsert that adds to the row, written in the same
+    transaction as the status change that caused it, so concurrent workers
+    never lose an increment and the rollups agree with the jobs. Reading a
+    user's statistics touches a bounded number of rollup rows however many
+    jobs they ran. Hourly rows are kept for ``retention``.
+    """
+    retention: timedelta = timedelta(days=int(os.getenv("STATS_RETENTION_DAYS", 7)))
+    windows: Dict[str, timedelta] = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+    counters = ("submitted", "completed", "failed", "bytes_in", "bytes_out", "processing_seconds", "timed_bytes_in")
+    
+    @staticmethod
+    def hour(moment: datetime) -> datetime:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    
+    def record_submitted(self, records: List[ConversionRecord], db: Session):
+        now = datetime.now()
+        for record in records:
+            key = {"user_id": record.user_id, "conversion_type": record.conversion_type}
+            self._add(db, ConversionStats, key, [self.hour(now), STATS_ALL_TIME], submitted=1)
+    
+    def record_finished(self, job_id: str, values: Dict[str, Any], db: Session):
+        """Count a job that just reached a terminal status with ``values``."""
+        job = db.query(
+            ConversionRecord.user_id, ConversionRecord.conversion_type, ConversionRecord.input_size
+        ).filter(ConversionRecord.id == job_id).first()
+        if job is None:
+            return
+        now = datetime.now()
+        key = {"user_id": job.user_id, "conversion_type": job.conversion_type}
+        input_size = job.input_size or 0
+        if values["status"] != ConversionStatus.COMPLETED:
+            self._add(db, ConversionStats, key, [self.hour(now), STATS_ALL_TIME], failed=1, bytes_in=input_size)
+            return
+        counts = dict(completed=1, bytes_in=input_size, bytes_out=values.get("file_size") or 0)
+        processing_time = values.get("processing_time")
+        if processing_time is not None:
+            counts.update(processing_seconds=processing_time, timed_bytes_in=input_size)
+            sketch_key = {**key, "bin": LatencySketch.bin(processing_time)}
+            self._add(db, LatencySketchBin, sketch_key, [self.hour(now)], count=1)
+        self._add(db, ConversionStats, key, [self.hour(now), STATS_ALL_TIME], **counts)
+    
+    @staticmethod
+    def _add(db: Session, model, key: Dict[str, Any], buckets: List[datetime], **counts):
+        """Add ``counts`` to the rows of ``model`` with ``key`` in each of ``buckets``."""
+        table = model.__table__
+        dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+        for bucket in buckets:
+            insert = dialect.insert(table).values(**key, bucket=bucket, **counts)
+            db.execute(insert.on_conflict_do_update(
+                index_elements=[*key, "bucket"],
+                set_={name: table.c[name] + insert.excluded[name] for name in counts}
+            ))
+    
+    def summary(self, user_id: str, db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+        now = now or datetime.now()
+        starts = {name: self.hour(now - length) for name, length in self.windows.items()}
+        oldest = min(starts.values())
+        rows = db.query(ConversionStats).filter(
+            ConversionStats.user_id == user_id,
+            or_(ConversionStats.bucket >= oldest, ConversionStats.bucket == STATS_ALL_TIME)
+        ).all()
+        bins = db.query(LatencySketchBin).filter(
+            LatencySketchBin.user_id == user_id,
+            LatencySketchBin.bucket >= oldest
+        ).all()
+        
+        totals = [row for row in rows if row.bucket == STATS_ALL_TIME]
+        submitted = sum(row.submitted or 0 for row in totals)
+        completed = sum(row.completed or 0 for row in totals)
+        return {
+            "total_jobs": submitted,
+            "completed_jobs": completed,
+            "failed_jobs": sum(row.failed or 0 for row in totals),
+            "success_rate": (completed / submitted * 100) if submitted > 0 else 0,
+            **{
+                name: self._window(
+                    [row for row in rows if row.bucket >= start],
+                    [sketch for sketch in bins if sketch.bucket >= start],
+                    start, now
+                )
+                for name, start in starts.items()
+            }
+        }
+    
+    def _window(self, rows: List[ConversionStats], bins: List[LatencySketchBin], start: datetime, now: datetime) -> Dict[str, Any]:
+        hours = max((now - start).total_seconds() / 3600, 1 / 60)
+        by_type: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            stats = by_type.setdefault(row.conversion_type, {"sketch": {}, **dict.fromkeys(self.counters, 0)})
+            for name in self.counters:
+                stats[name] += getattr(row, name) or 0
+        for sketch in bins:
+            stats = by_type.get(sketch.conversion_type)
+            if stats is not None:
+                stats["sketch"][sketch.bin] = stats["sketch"].get(sketch.bin, 0) + (sketch.count or 0)
+        
+        types = {}
+        for conversion_type, stats in sorted(by_type.items()):
+            finished = stats["completed"] + stats["failed"]
+            types[conversion_type] = {
+                "submitted": stats["submitted"],
+                "completed": stats["completed"],
+                "failed": stats["failed"],
+                "success_rate": (stats["completed"] / finished * 100) if finished > 0 else None,
+                "bytes_in": stats["bytes_in"],
+                "bytes_out": stats["bytes_out"],
+                "p50_processing_time": LatencySketch.quantile(stats["sketch"], 0.5),
+                "p95_processing_time": LatencySketch.quantile(stats["sketch"], 0.95),
+                "jobs_per_hour": round(stats["completed"] / hours, 2),
+                # Input bytes per second of processing, as reported per job
+                "throughput": (
+                    round(stats["timed_bytes_in"] / stats["processing_seconds"], 1) if stats["processing_seconds"] > 0 else None
+                ),
+            }
+        return {
+            "since": start,
+            "completed": sum(stats["completed"] for stats in types.values()),
+            "failed": sum(stats["failed"] for stats in types.values()),
+            "conversion_types": types,
+        }
+    
+    def reap(self, now: datetime, db: Session) -> int:
+        """Delete hourly rows older than ``retention``; all-time rows are kept."""
+        cutoff = self.hour(now - self.retention)
+        removed = 0
+        for model in (ConversionStats, LatencySketchBin):
+            removed += db.query(model).filter(
+                model.bucket > STATS_ALL_TIME,
+                model.bucket < cutoff
+            ).delete(synchronize_session=False)
+        db.commit()
+        return removed
+
+stats_rollups = StatsRollups()
+
+class JobStore:
+    """Job bookkeeping that is safe to call from async code.
+
+    Every query runs on a dedicated thread pool sized to the connection pool,
+    each unit of work in its own short-lived session, so the event loop never
+    waits on the database and no session outlives the work that opened it.
+    Status writes are group-committed: updates that arrive while a flush is
+    running are merged per job and written together in the next transaction.
+    If that transaction fails, each job's update is retried on its own, so
+    one bad update only fails the callers waiting on that job. Every
+    committed write is published to ``progress_broker``. Status writes to a
+    job that already finished are dropped, so its first outcome stands.
+    """
+    
+    def __init__(self, max_workers: int = DB_POOL_SIZE):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, tuple] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+    
+    async def call(self, fn: Callable, *args):
+        """Call ``fn(*args)`` on the store's thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+    
+    async def run(self, fn: Callable, *args):
+        """Call ``fn(*args, db=session)`` on the store's thread pool."""
+        def call():
+            # Records are handed back to the caller after the session closes
+            with db_operation_seconds.timer(operation="query"), SessionLocal(expire_on_commit=False) as db:
+                return fn(*args, db=db)
+        return await self.call(call)
+    
+    async def insert(self, records: List[ConversionRecord]):
+        def add_all(db: Session):
+            with db_operation_seconds.timer(operation="insert"):
+                db.add_all(records)
+                stats_rollups.record_submitted(records, db)
+                db.commit()
+            for record in records:
+                job_status_cache.put(record.id, job_status_record(record))
+                job_status_cache.bump(record.user_id)
+        await self.run(add_all)
+        for record in records:
+            progress_broker.track(record.id, record.user_id)
+            progress_broker.publish(record.id, job_event(record.id, {"status": record.status}))
+    
+    async def update(self, job_id: str, **values):
+        """Write ``values`` to a job, returning once they are committed."""
+        self._merge(job_id, values, None)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append(waiter)
+        self._schedule_flush()
+        await waiter
+    
+    def submit(self, job_id: str, only_status: Optional[ConversionStatus] = None, **values):
+        """Queue a write without waiting for it, e.g. from progress callbacks.
+
+        With ``only_status`` the write only applies while the job still has
+        that status, so a late report can't undo a transition.
+        """
+        self._merge(job_id, values, only_status)
+        self._schedule_flush()
+    
+    def _merge(self, job_id: str, values: Dict[str, Any], only_status: Optional[ConversionStatus]):
+        if job_id in self._pending:
+            pending_values, pending_status = self._pending[job_id]
+            if only_status is not None and pending_values.get("status", only_status) != only_status:
+                return
+            pending_values.update(values)
+            if only_status is None:
+                pending_status = None
+            self._pending[job_id] = (pending_values, pending_status)
+        else:
+            self._pending[job_id] = (dict(values), only_status)
+    
+    def _schedule_flush(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+    
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, {}
+            try:
+                applied, errors = await loop.run_in_executor(self._pool(), self._write, batch)
+            except Exception as e:
+                logger.error(f"Failed to write status for {len(batch)} jobs: {str(e)}")
+                applied, errors = [], dict.fromkeys(batch, e)
+            for job_id in applied:
+                progress_broker.publish(job_id, job_event(job_id, batch[job_id][0]))
+            for job_id, job_waiters in waiters.items():
+                for waiter in job_waiters:
+                    if waiter.done():
+                        continue
+                    if job_id in errors:
+                        waiter.set_exception(errors[job_id])
+                    else:
+                        waiter.set_result(None)
+    
+    @classmethod
+    def _write(cls, batch: Dict[str, tuple]) -> tuple:
+        """Write ``batch``; returns the ids of the jobs it changed and the errors of those it could not write."""
+        errors = {}
+        with db_operation_seconds.timer(operation="flush"), SessionLocal() as db:
+            try:
+                applied = [job_id for job_id, update in batch.items() if cls._apply(db, job_id, *update)]
+                db.commit()
+            except Exception as e:
+                if len(batch) == 1:
+                    raise
+                # Find the bad update: each job gets a savepoint of its own
+                logger.warning(f"Writing status for {len(batch)} jobs one at a time: {str(e)}")
+                db.rollback()
+                applied = []
+                for job_id, update in batch.items():
+                    try:
+                        with db.begin_nested():
+                            if cls._apply(db, job_id, *update):
+                                applied.append(job_id)
+                    except Exception as error:
+                        logger.error(f"Failed to write status for job {job_id}: {str(error)}")
+                        errors[job_id] = error
+                db.commit()
+        for job_id in applied:
+            job_status_cache.apply(job_id, batch[job_id][0], progress_broker.owner(job_id))
+        return applied, errors
+    
+    @staticmethod
+    def _apply(db: Session, job_id: str, values: Dict[str, Any], only_status: Optional[ConversionStatus]) -> bool:
+        query = db.query(ConversionRecord).filter(ConversionRecord.id == job_id)
+        if only_status is not None:
+            query = query.filter(ConversionRecord.status == only_status)
+        if "status" in values:
+            # A finished job's outcome is final: a late write, e.g. from
+            # a worker whose lease expired, must not replace it (or the
+            # rollups that counted it)
+            query = query.filter(ConversionRecord.status.notin_(TERMINAL_STATUSES))
+        if not query.update(values, synchronize_session=False):
+            return False
+        if values.get("status") in TERMINAL_STATUSES:
+            stats_rollups.record_finished(job_id, values, db)
+        return True
+    
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job-store")
+        return self._executor
+    
+    async def close(self):
+        """Write out queued updates and release the thread pool."""
+        if self._flusher is not None:
+            await self._flusher
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+job_store = JobStore()
+
+def new_job_record(user_id: str, input_filename: str, conversion_type: str, **values) -> ConversionRecord:
+    now = datetime.now()
+    record = dict(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        input_filename=input_filename,
+        conversion_type=conversion_type,
+        status=ConversionStatus.PENDING,
+        created_at=now,
+        expires_at=now + timedelta(hours=24)
+    )
+    record.update(values)
+    return ConversionRecord(**record)
+
+def get_job_record(job_id: str, db: Session) -> Optional[ConversionRecord]:
+    return db.query(ConversionRecord).filter(ConversionRecord.id == job_id).first()
+
+async def create_conversion_job(user_id: str, input_filename: str, conversion_type: str) -> str:
+    # Label the rest of this request's metrics, such as the upload, with the type
+    current_conversion.set(conversion_type)
+    job = new_job_record(user_id, input_filename, conversion_type)
+    await job_store.insert([job])
+    return job.id
+
+async def update_job_status(job_id: str, status: ConversionStatus, **kwargs):
+    conversion_type = current_conversion.get()
+    with conversion_stage_seconds.timer(conversion_type=conversion_type, stage="db_update"):
+        await job_store.update(job_id, status=status, **kwargs)
+    if status in TERMINAL_STATUSES:
+        conversion_jobs.inc(conversion_type=conversion_type, status=status)
+    if status == ConversionStatus.COMPLETED and kwargs.get("file_size"):
+        conversion_bytes.inc(kwargs["file_size"], conversion_type=conversion_type, direction="out")
+
+def job_progress_reporter(job_id: str, interval: float = 1.0) -> Callable[[float], None]:
+    """Progress callback that records a running job's percentage at most once per ``interval``."""
+    last_write = 0.0
+    
+    def report(percent: float):
+        nonlocal last_write
+        now = time.monotonic()
+        if now - last_write < interval and percent < 100:
+            return
+        last_write = now
+        job_store.submit(job_id, only_status=ConversionStatus.PROCESSING, progress=round(percent, 1))
+    
+    return report
@@ -1,212 +1,212 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends, Query
-from fastapi.responses import FileResponse, JSONResponse
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import IO, Optional, List, Dict, Any, Callable, Awaitable
 import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+import base64
 import hashlib
 import mimetypes
+from email.utils import formatdate
 from contextlib import asynccontextmanager
+from functools import lru_cache, partial
 import aiofiles
 import aiofiles.os
-from pathlib import Path
+import aiofiles.ospath
+from pathlib import Path, PurePosixPath
 import shutil
 
-# Third-party conversion libraries
-from pdf2docx import Converter
-from docx2pdf import convert
-from moviepy.video.io.VideoFileClip import VideoFileClip
-from PIL import Image, ImageEnhance, ImageFilter
-from pydub import AudioSegment
 import csv
+import io
+import itertools
 import json
+import re
 import uuid
 import os
 import zipfile
 import tempfile
 import subprocess
+import socket
+import struct
+import multiprocessing
+import heapq
+import math
 from dataclasses import dataclass
-from enum import Enum
-import redis
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, Boolean, Float
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.sql import func
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+import services
+from services import REDIS_CONNECT_TIMEOUT, connect_redis, trace_span
+from metrics import (
+    metrics, current_conversion, conversion_stage_seconds, cache_requests, http_request_seconds, memory_budget_bytes,
+    memory_reserved_bytes, memory_rss_bytes, memory_rejections, startup_seconds
+)
+from models import (
+    AUDIO_OUTPUT_FORMATS, DB_CONNECT_TIMEOUT, IMAGE_OUTPUT_FORMATS, AudioProcessingOptions, ConversionRecord,
+    ConversionResponse, ConversionStatus, DataProcessingOptions, DocumentProcessingOptions, ImageProcessingOptions,
+    ImageVariant, SessionLocal, UploadSession, VideoProcessingOptions, migrate_schema, parse_page_ranges
+)
+from office import OFFICE_FORMATS, WORD_AVAILABLE, office_pool
+from execution import (
+    WARM_BACKENDS, Image, ImageEnhance, ImageFilter, docx2pdf, fitz, pdf2docx, conversion_stage, execution_engine,
+    report_progress, warm_backends
+)
+from jobs import (
+    TERMINAL_STATUSES, create_conversion_job, get_job_record, job_event, job_progress_reporter, job_response,
+    job_status_cache, job_status_record, job_store, new_job_record, progress_broker, stats_rollups, update_job_status
+)
+from uploads import FileManager, JobInput, ResumableUploads, SavedUpload, file_manager, resumable_uploads, store_input
+from cache import result_cache
+from ratelimit import rate_limit_check, rate_limit_cost
+from jobqueue import job_queue, job_scheduler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./conversions.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Redis setup for caching and rate limiting
-try:
-    redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-    redis_client.ping()
-    REDIS_AVAILABLE = True
-except:
-    REDIS_AVAILABLE = False
-    logger.warning("Redis not available. Caching and rate limiting disabled.")
-
-# Models
-class ConversionRecord(Base):
-    __tablename__ = "conversions"
-    
-    id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, index=True)
-    input_filename = Column(String)
-    output_filename = Column(String)
-    conversion_type = Column(String)
-    file_size = Column(Integer)
-    processing_time = Column(Float)
-    status = Column(String)
-    created_at = Column(DateTime, default=func.now())
-    expires_at = Column(DateTime)
-
-Base.metadata.create_all(bind=engine)
-
-# Pydantic models
-class ConversionStatus(str, Enum):
-    PENDING = "pending"
-    PROCESSING = "processing"
-    COMPLETED = "completed"
-    FAILED = "failed"
-
-class ConversionResponse(BaseModel):
-    job_id: str
-    status: ConversionStatus
-    download_url: Optional[str] = None
-    message: Optional[str] = None
-    processing_time: Optional[float] = None
-    file_size: Optional[int] = None
-
-class ConversionJob(BaseModel):
-    id: str
-    status: ConversionStatus
-    input_filename: str
-    output_filename: Optional[str] = None
-    conversion_type: str
-    created_at: datetime
-    expires_at: datetime
-    progress: Optional[float] = None
-
-class ImageProcessingOptions(BaseModel):
-    width: Optional[int] = None
-    height: Optional[int] = None
-    quality: Optional[int] = 85
-    brightness: Optional[float] = None
-    contrast: Optional[float] = None
-    blur: Optional[float] = None
-    sharpen: Optional[bool] = False
-    grayscale: Optional[bool] = False
-
-class VideoProcessingOptions(BaseModel):
-    start_time: Optional[float] = None
-    end_time: Optional[float] = None
-    fps: Optional[int] = None
-    bitrate: Optional[str] = None
-    resolution: Optional[str] = None
-
-class AudioProcessingOptions(BaseModel):
-    bitrate: Optional[str] = None
-    sample_rate: Optional[int] = None
-    channels: Optional[int] = None
-    normalize: Optional[bool] = False
-
 # Security
 security = HTTPBearer(auto_error=False)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     if credentials:
         # In production, validate JWT token here
         return credentials.credentials
     return "anonymous"
 
-# Rate limiting
-async def rate_limit_check(user_id: str, limit: int = 100, window: int = 3600):
-    if not REDIS_AVAILABLE:
-        return True
+# Downloads can be handed off to a reverse proxy, which sends the file with
+# sendfile() and answers Range requests itself: "x-accel-redirect" for nginx
+# (an internal location at DOWNLOAD_OFFLOAD_PREFIX aliased to converted/) or
+# "x-sendfile" for Apache and lighttpd. Unset, the API streams files itself.
+DOWNLOAD_OFFLOAD = os.getenv("DOWNLOAD_OFFLOAD", "").lower()
+DOWNLOAD_OFFLOAD_PREFIX = os.getenv("DOWNLOAD_OFFLOAD_PREFIX", "/internal/converted/")
+ARCHIVE_MAX_JOBS = 200
+
+class DownloadResponse(FileResponse):
+    # Starlette reads 64KB at a time; large media goes out in far fewer
+    # round trips through the event loop with 1MB reads
+    chunk_size = FileManager.chunk_size
+
+# Background task for cleanup
+@dataclass
+class ExpiryReaper:
+    """Deletes expired jobs and resumable upload sessions together with their files.
+
+    Expired jobs are found through the ``expires_at`` index, oldest first, in
+    bounded batches on the job store's threads, so a sweep costs the same
+    however many files are stored and never blocks the event loop. Files go
+    before the record, which makes an interrupted sweep safe: the next one
+    finds the same rows and finishes them.
+    """
+    batch_size: int = int(os.getenv("EXPIRY_BATCH_SIZE", 500))
+    interval: float = float(os.getenv("EXPIRY_INTERVAL", 60))
     
-    key = f"rate_limit:{user_id}"
-    current = redis_client.get(key)
+    async def run(self):
+        while True:
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logger.info(f"Removed {removed} expired jobs and uploads")
+            except Exception as e:
+                logger.error(f"Expiry sweep failed: {e}")
+            await asyncio.sleep(self.interval)
     
-    if current is None:
-        redis_client.setex(key, window, 1)
-        return True
-    elif int(current) < limit:
-        redis_client.incr(key)
-        return True
-    else:
-        return False
+    async def sweep(self, now: Optional[datetime] = None) -> int:
+        """Remove every finished job and upload session that expired before ``now``.
 
-# File management
-@dataclass
-class FileManager:
-    base_path: Path = Path("converted")
-    max_file_size: int = 100 * 1024 * 1024  # 100MB
-    allowed_extensions: Dict[str, List[str]] = None
+        Hourly statistics past their retention are pruned too.
+        """
+        now = now or datetime.now()
+        removed = 0
+        for reap_batch in (self._reap_batch, self._reap_uploads):
+            while True:
+                count = await job_store.run(reap_batch, now)
+                removed += count
+                if count < self.batch_size:
+                    break
+        await job_store.run(stats_rollups.reap, now)
+        return removed
     
-    def __post_init__(self):
-        self.base_path.mkdir(exist_ok=True)
-        if self.allowed_extensions is None:
-            self.allowed_extensions = {
-                'document': ['.pdf', '.docx', '.doc', '.txt', '.rtf'],
-                'image': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff'],
-                'video': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm'],
-                'audio': ['.mp3', '.wav', '.flac', '.aac', '.ogg'],
-                'data': ['.csv', '.json', '.xml', '.xlsx']
-            }
-    
-    async def save_file(self, file: UploadFile, filename: str) -> Path:
-        file_path = self.base_path / filename
-        
-        # Check file size
-        content = await file.read()
-        if len(content) > self.max_file_size:
-            raise HTTPException(status_code=413, detail="File too large")
-        
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(content)
-        
-        return file_path
-    
-    async def cleanup_old_files(self, days: int = 1):
-        cutoff_time = datetime.now() - timedelta(days=days)
-        for file_path in self.base_path.iterdir():
-            if file_path.is_file():
-                file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-                if file_time < cutoff_time:
-                    await aiofiles.os.remove(file_path)
-
-file_manager = FileManager()
+    def _reap_batch(self, now: datetime, db: Session) -> int:
+        jobs = db.query(
+            ConversionRecord.id, ConversionRecord.user_id, ConversionRecord.input_path,
+            ConversionRecord.output_filename, ConversionRecord.outputs
+        ).filter(
+            ConversionRecord.expires_at < now,
+            ConversionRecord.status.in_(TERMINAL_STATUSES)
+        ).order_by(ConversionRecord.expires_at).limit(self.batch_size).all()
+        if not jobs:
+            return 0
+        
+        for job in jobs:
+            _remove_job_files(job)
+        db.query(ConversionRecord).filter(
+            ConversionRecord.id.in_([job.id for job in jobs])
+        ).delete(synchronize_session=False)
+        db.commit()
+        for job in jobs:
+            job_status_cache.invalidate(job.id, job.user_id)
+        return len(jobs)
 
-# Background task for cleanup
-async def cleanup_task():
-    while True:
-        await file_manager.cleanup_old_files()
-        await asyncio.sleep(3600)  # Run every hour
+    def _reap_uploads(self, now: datetime, db: Session) -> int:
+        return resumable_uploads.reap_batch(now, self.batch_size, db)
+
+expiry_reaper = ExpiryReaper()
+
+# Set to 0 on API nodes when conversions run in standalone workers (python -m worker)
+RUN_EMBEDDED_WORKER = os.getenv("RUN_EMBEDDED_WORKER", "1") == "1"
+
+async def connect_services():
+    """Connect to Redis and the database; run before serving or working jobs.
+
+    Nothing connects at import time, so importing the module stays cheap and
+    an unreachable Redis or database fails the start-up within a timeout
+    instead of hanging it.
+    """
+    await asyncio.wait_for(asyncio.to_thread(connect_redis), REDIS_CONNECT_TIMEOUT + 1)
+    await asyncio.wait_for(asyncio.to_thread(migrate_schema), DB_CONNECT_TIMEOUT + 5)
+    result_cache.start()
+    if WARM_BACKENDS:
+        await asyncio.to_thread(warm_backends)
+
+def report_startup(phase: str) -> float:
+    seconds = time.perf_counter() - _import_started
+    startup_seconds.set(round(seconds, 4), phase=phase)
+    logger.info(f"Start-up: {phase} after {seconds:.3f}s")
+    return seconds
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Start cleanup task
-    cleanup_task_handle = asyncio.create_task(cleanup_task())
+    await connect_services()
+    # Start cleanup task and, unless conversions run elsewhere, a job worker
+    cleanup_task_handle = asyncio.create_task(expiry_reaper.run())
+    await progress_broker.start()
+    worker = None
+    office_handle = None
+    if RUN_EMBEDDED_WORKER:
+        await execution_engine.warm_up()
+        if office_pool.available:
+            office_handle = asyncio.create_task(office_pool.run())
+        worker = JobWorker()
+        worker_handle = asyncio.create_task(worker.run())
+    report_startup("ready")
     yield
     # Cleanup on shutdown
     cleanup_task_handle.cancel()
+    if worker is not None:
+        worker.stop()
+        await worker_handle
+        execution_engine.shutdown()
+    if office_handle is not None:
+        office_handle.cancel()
+        office_pool.stop()
+    await job_store.close()
+    await progress_broker.stop()
 
 # FastAPI app
 app = FastAPI(
@@ -216,190 +216,1835 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+class RequestMetricsMiddleware:
+    """Times every HTTP request per route and opens its tracing span."""
+    
+    def __init__(self, app):
+        self.app = app
+        self.served_first = False
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        started = time.perf_counter()
+        recorded = False
+        
+        def record(status: int):
+            nonlocal recorded
+            recorded = True
+            if not self.served_first:
+                self.served_first = True
+                report_startup("first_request")
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=getattr(route, "path", "unmatched"), status=status
+            )
+        
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                record(message["status"])
+            await send(message)
+        
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        with trace_span(f"{scope['method']} {scope['path']}", carrier=headers, attributes={"http.method": scope["method"]}):
+            try:
+                await self.app(scope, receive, send_timed)
+            finally:
+                if not recorded:
+                    record(500)
+
+app.add_middleware(RequestMetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Configure appropriately for production
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by resumable upload clients
+    expose_headers=["Location", "Tus-Resumable", "Upload-Offset", "Upload-Length", "Upload-Expires"],
 )
 
+# Media probing
+@dataclass
+class MediaInfo:
+    duration: Optional[float] = None
+    audio_codec: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    video_codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+# Audio codecs that each output container can hold without re-encoding
+AUDIO_COPY_CODECS = {
+    '.mp3': {'mp3'},
+    '.m4a': {'aac', 'alac'},
+    '.aac': {'aac'},
+    '.ogg': {'vorbis', 'opus', 'flac'},
+    '.opus': {'opus'},
+    '.flac': {'flac'},
+    '.wav': {'pcm_s16le', 'pcm_s24le', 'pcm_s32le', 'pcm_f32le', 'pcm_u8'},
+}
+
+AUDIO_ENCODERS = {
+    '.mp3': 'libmp3lame',
+    '.m4a': 'aac',
+    '.aac': 'aac',
+    '.ogg': 'libvorbis',
+    '.opus': 'libopus',
+    '.flac': 'flac',
+    '.wav': 'pcm_s16le',
+}
+
+# EBU R128 target for loudness normalization: integrated loudness (LUFS),
+# true peak (dBTP) and loudness range (LU)
+LOUDNESS_TARGET = "I=-16:TP=-1.5:LRA=11"
+_LOUDNORM_STATS_PATTERN = re.compile(r'\{[^{}]*"input_i"[^{}]*\}')
+
+_DURATION_PATTERN = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+_AUDIO_STREAM_PATTERN = re.compile(r'Stream #\d+:\d+.*?: Audio: (\w+)[^,]*(?:, (\d+) Hz)?(?:, ([^,]+))?')
+_VIDEO_STREAM_PATTERN = re.compile(r'Stream #\d+:\d+.*?: Video: (\w+).*?, (\d{2,5})x(\d{2,5})')
+_CHANNEL_LAYOUTS = {'mono': 1, 'stereo': 2, '2.1': 3, 'quad': 4, '5.0': 5, '5.1': 6, '7.1': 8}
+
+@lru_cache(maxsize=1)
+def ffmpeg_binary() -> str:
+    # Prefer a system ffmpeg, fall back to the binary bundled with imageio-ffmpeg
+    configured = os.getenv("FFMPEG_BINARY") or shutil.which("ffmpeg")
+    if configured:
+        return configured
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+def probe_media(path: Path) -> MediaInfo:
+    """Read container metadata from ffmpeg's stream summary without decoding."""
+    result = subprocess.run(
+        [ffmpeg_binary(), '-hide_banner', '-nostdin', '-i', str(path)],
+        capture_output=True, text=True, errors='replace'
+    )
+    info = MediaInfo()
+    
+    duration = _DURATION_PATTERN.search(result.stderr)
+    if duration:
+        hours, minutes, seconds = duration.groups()
+        info.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
+    audio = _AUDIO_STREAM_PATTERN.search(result.stderr)
+    if audio:
+        codec, sample_rate, layout = audio.groups()
+        info.audio_codec = codec
+        info.sample_rate = int(sample_rate) if sample_rate else None
+        if layout:
+            layout = layout.strip().split('(')[0]
+            info.channels = _CHANNEL_LAYOUTS.get(layout) or (int(layout.split()[0]) if layout.split()[0].isdigit() else None)
+    
+    video = _VIDEO_STREAM_PATTERN.search(result.stderr)
+    if video:
+        info.video_codec = video.group(1)
+        info.width, info.height = int(video.group(2)), int(video.group(3))
+    
+    return info
+
+def run_ffmpeg(
+    args: List[str],
+    duration: Optional[float] = None,
+    progress_token: Optional[str] = None,
+    progress_span: tuple = (0, 100)
+) -> str:
+    """Run ffmpeg and return its log output.
+
+    Progress against ``duration`` seconds of output is reported scaled into
+    ``progress_span``, so several passes can share one progress bar.
+    """
+    command = [ffmpeg_binary(), '-hide_banner', '-nostdin', '-y']
+    if progress_token is None or not duration:
+        result = subprocess.run(
+            command + args,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace'
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+        return result.stderr
+    
+    start, end = progress_span
+    # -progress writes key=value blocks to stdout as encoding advances; stderr
+    # goes to a file so a chatty ffmpeg can't fill the pipe and stall
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            command + ['-progress', 'pipe:1', '-nostats', *args],
+            stdout=subprocess.PIPE, stderr=stderr, text=True, errors='replace'
+        )
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            if key == 'out_time_us' and value.isdigit():
+                report_progress(progress_token, start + min(int(value) / 1e6 / duration, 1.0) * (end - start))
+        process.wait()
+        stderr.seek(0)
+        log = stderr.read().decode(errors='replace')
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {log.strip()[-500:]}")
+    report_progress(progress_token, end)
+    return log
+
+# Streaming data helpers
+# Numbers as JSON spells them: a leading zero marks a code (zip, ID) that
+# has to stay text, and nan/inf have no JSON form
+_INT_PATTERN = re.compile(r'^[+-]?(0|[1-9]\d*)$')
+_FLOAT_PATTERN = re.compile(r'^[+-]?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$')
+# DictReader key for cells beyond the header, which are dropped
+_EXTRA_CELLS = object()
+
+def _infer_column_casts(fieldnames: List[str], sample: List[Dict[str, str]]) -> Dict[str, Callable[[str], Any]]:
+    """Pick the narrowest JSON type that fits every sampled value of each column."""
+    def to_bool(value: str) -> Optional[bool]:
+        return None if value == '' else value.lower() == 'true'
+    
+    def to_int(value: str) -> Optional[int]:
+        if value == '':
+            return None
+        if not _INT_PATTERN.match(value):
+            raise ValueError(f"Not an integer: {value!r}")
+        return int(value)
+    
+    def to_float(value: str) -> Optional[float]:
+        if value == '':
+            return None
+        number = float(value) if _FLOAT_PATTERN.match(value) else math.nan
+        if not math.isfinite(number):
+            # Also catches exponents too large for a double
+            raise ValueError(f"Not a finite number: {value!r}")
+        return number
+    
+    def fits(cast: Callable[[str], Any], values: List[str]) -> bool:
+        try:
+            for value in values:
+                cast(value)
+        except (ValueError, TypeError):
+            return False
+        return True
+    
+    casts = {}
+    for name in fieldnames:
+        values = [row[name] for row in sample if row.get(name) not in (None, '')]
+        if not values:
+            continue
+        if fits(to_int, values):
+            casts[name] = _lenient(to_int)
+        elif fits(to_float, values):
+            casts[name] = _lenient(to_float)
+        elif all(value.lower() in ('true', 'false') for value in values):
+            casts[name] = _lenient(to_bool)
+    return casts
+
+def _lenient(cast: Callable[[str], Any]) -> Callable[[str], Any]:
+    # Rows past the sampled prefix may not fit the inferred type; keep them as text
+    def apply(value):
+        try:
+            return cast(value)
+        except (ValueError, TypeError, AttributeError):
+            return value
+    return apply
+
+def _csv_cell(value: Any) -> Any:
+    # Keep JSON spellings for values CSV has no native form for
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def _iter_json_records(stream, ndjson: Optional[bool] = None, chunk_size: int = 64 * 1024):
+    """Yield records from a JSON array or NDJSON stream without loading it whole.
+
+    When ``ndjson`` is None the format is detected from the first character.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size)
+    pos = 0
+    while pos < len(buffer) and buffer[pos].isspace():
+        pos += 1
+    
+    if ndjson is None:
+        ndjson = not buffer[pos:pos + 1] == '['
+    
+    if ndjson:
+        for line in itertools.chain(io.StringIO(buffer[pos:]), stream):
+            # A line read from the initial buffer may be cut at the chunk edge
+            while not line.endswith('\n'):
+                rest = stream.readline()
+                if not rest:
+                    break
+                line += rest
+            if line.strip():
+                yield json.loads(line)
+        return
+    
+    pos += 1  # skip '['
+    eof = False
+    while True:
+        # Skip separators between array elements
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','):
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        
+        if pos >= len(buffer) and eof:
+            raise ValueError("Unterminated JSON array")
+        
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+            # A value ending exactly at the buffer edge (e.g. a number) may be truncated
+            if end < len(buffer) or eof:
+                yield record
+                pos = end
+                continue
+        except json.JSONDecodeError:
+            if eof:
+                raise
+        
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Write-only sink that lets ZipFile stream an archive chunk by chunk.
+
+    It is not seekable, so ZipFile writes data descriptors after each entry
+    instead of seeking back, and ``drain()`` hands out whatever has been
+    written since the last call.
+    """
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._offset
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
 # Conversion utilities
 class ConversionEngine:
+    # PDFs with at least this many selected pages are parsed in parallel chunks
+    pdf_parallel_min_pages: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 24))
+    pdf_chunk_pages: int = int(os.getenv("PDF_CHUNK_PAGES", 8))
+    
+    @staticmethod
+    async def convert_pdf_to_docx(
+        input_path: Path,
+        output_path: Path,
+        options: DocumentProcessingOptions = None,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> None:
+        options = options or DocumentProcessingOptions()
+        page_count = await execution_engine.run("probe", ConversionEngine._pdf_page_count, input_path)
+        page_indexes = options.page_indexes(page_count)
+        if not page_indexes:
+            raise ValueError("The PDF has no pages")
+        
+        parallel = options.parallel
+        if parallel is None:
+            parallel = len(page_indexes) >= ConversionEngine.pdf_parallel_min_pages
+        
+        # Pages parsed per chunk, summed into a percentage for ``progress``
+        chunk_size = ConversionEngine.pdf_chunk_pages if parallel else len(page_indexes)
+        chunks = [page_indexes[i:i + chunk_size] for i in range(0, len(page_indexes), chunk_size)]
+        parsed = [0] * len(chunks)
+        
+        def chunk_progress(chunk: int):
+            def report(pages_done: float):
+                parsed[chunk] = pages_done
+                if progress is not None:
+                    # Leave the last 10% for writing the DOCX
+                    progress(sum(parsed) / len(page_indexes) * 90)
+            return report
+        
+        if len(chunks) == 1:
+            await execution_engine.run(
+                "document", ConversionEngine._pdf_to_docx_sync, input_path, output_path, page_indexes,
+                progress=chunk_progress(0)
+            )
+        else:
+            # Parse chunks on separate worker processes, then lay the parsed
+            # pages out in document order and write a single DOCX
+            results = await asyncio.gather(*[
+                execution_engine.run(
+                    "document", ConversionEngine._parse_pdf_pages_sync, input_path, chunk,
+                    progress=chunk_progress(n)
+                )
+                for n, chunk in enumerate(chunks)
+            ], return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            await execution_engine.run("document", ConversionEngine._merge_pdf_pages_sync, input_path, output_path, results)
+        
+        if progress is not None:
+            progress(100.0)
+    
+    @staticmethod
+    def _pdf_page_count(input_path: Path) -> int:
+        cv = pdf2docx.Converter(str(input_path))
+        try:
+            return len(cv.fitz_doc)
+        finally:
+            cv.close()
+    
+    @staticmethod
+    def _pdf_settings(cv: "pdf2docx.Converter") -> Dict[str, Any]:
+        settings = cv.default_settings
+        settings.update(multi_processing=False)
+        return settings
+    
     @staticmethod
-    async def convert_pdf_to_docx(input_path: Path, output_path: Path) -> None:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, ConversionEngine._pdf_to_docx_sync, input_path, output_path)
+    def _parse_pdf_pages(cv: "pdf2docx.Converter", page_indexes: List[int], settings: Dict[str, Any], progress_token: Optional[str]):
+        # Same steps as Converter.parse, but reports each page as it finishes
+        with conversion_stage("decode"):
+            cv.load_pages(pages=page_indexes)
+            cv.parse_document(**settings)
+        pages = [page for page in cv.pages if not page.skip_parsing]
+        for done, page in enumerate(pages, start=1):
+            try:
+                with conversion_stage("transform"):
+                    page.parse(**settings)
+            except Exception as e:
+                if settings['debug'] or not settings['ignore_page_error']:
+                    raise
+                logger.error(f"Skipping page {page.id + 1} that failed to parse: {str(e)}")
+            report_progress(progress_token, done)
     
     @staticmethod
-    def _pdf_to_docx_sync(input_path: Path, output_path: Path):
-        cv = Converter(str(input_path))
-        cv.convert(str(output_path))
-        cv.close()
+    def _pdf_to_docx_sync(input_path: Path, output_path: Path, page_indexes: List[int], progress_token: Optional[str] = None):
+        cv = pdf2docx.Converter(str(input_path))
+        try:
+            settings = ConversionEngine._pdf_settings(cv)
+            ConversionEngine._parse_pdf_pages(cv, page_indexes, settings, progress_token)
+            with conversion_stage("encode"):
+                cv.make_docx(str(output_path), **settings)
+        finally:
+            cv.close()
+    
+    @staticmethod
+    def _parse_pdf_pages_sync(input_path: Path, page_indexes: List[int], progress_token: Optional[str] = None) -> Dict[str, Any]:
+        cv = pdf2docx.Converter(str(input_path))
+        try:
+            ConversionEngine._parse_pdf_pages(cv, page_indexes, ConversionEngine._pdf_settings(cv), progress_token)
+            return cv.store()
+        finally:
+            cv.close()
+    
+    @staticmethod
+    def _merge_pdf_pages_sync(input_path: Path, output_path: Path, parsed_chunks: List[Dict[str, Any]]):
+        cv = pdf2docx.Converter(str(input_path))
+        try:
+            for parsed in parsed_chunks:
+                cv.restore(parsed)
+            with conversion_stage("encode"):
+                cv.make_docx(str(output_path), **ConversionEngine._pdf_settings(cv))
+        finally:
+            cv.close()
     
     @staticmethod
     async def convert_docx_to_pdf(input_path: Path, output_path: Path) -> None:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, convert, str(input_path), str(output_path))
+        # Office conversions run on threads: the pool is shared by this process
+        # and Word's COM automation has to stay in-process
+        await execution_engine.run("office", ConversionEngine._docx_to_pdf_sync, input_path, output_path)
+    
+    @staticmethod
+    def _docx_to_pdf_sync(input_path: Path, output_path: Path):
+        output_path.write_bytes(ConversionEngine._office_to_pdf_bytes(input_path.read_bytes()))
     
     @staticmethod
-    async def convert_video_to_audio(input_path: Path, output_path: Path, options: VideoProcessingOptions = None) -> None:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, ConversionEngine._video_to_audio_sync, input_path, output_path, options)
+    async def convert_video_to_audio(
+        input_path: Path,
+        output_path: Path,
+        options: VideoProcessingOptions = None,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> None:
+        await execution_engine.run(
+            "video", ConversionEngine._video_to_audio_sync, input_path, output_path, options,
+            progress=progress
+        )
     
     @staticmethod
-    def _video_to_audio_sync(input_path: Path, output_path: Path, options: VideoProcessingOptions):
-        video = VideoFileClip(str(input_path))
+    def _video_to_audio_sync(
+        input_path: Path,
+        output_path: Path,
+        options: VideoProcessingOptions,
+        progress_token: Optional[str] = None
+    ):
+        """Extract the audio track, copying it as-is whenever the container allows.
+
+        Trimming seeks on the input side, so a clip from the end of a long
+        recording does not decode everything before it.
+        """
+        options = options or VideoProcessingOptions()
+        with conversion_stage("probe"):
+            info = probe_media(input_path)
+        if info.audio_codec is None:
+            raise ValueError("The video has no audio track")
+        # An empty range makes ffmpeg write an empty or broken file
+        start = options.start_time or 0
+        if start < 0:
+            raise ValueError("start_time must not be negative")
+        if options.end_time is not None and options.end_time <= start:
+            raise ValueError("end_time must be after start_time")
+        if info.duration and start >= info.duration:
+            raise ValueError(f"start_time is past the end of the video ({info.duration:.2f}s)")
+        
+        suffix = output_path.suffix.lower()
+        args = []
+        if options.start_time:
+            args += ['-ss', str(options.start_time)]
+        args += ['-i', str(input_path), '-map', '0:a:0', '-vn', '-sn', '-dn']
+        if options.start_time or options.end_time is not None:
+            # The input-side seek lands on the nearest video keyframe; keeping
+            # the source timestamps lets the output-side cut land on the exact
+            # audio packet without decoding anything before the keyframe
+            args += ['-copyts', '-avoid_negative_ts', 'make_zero']
+            if options.start_time:
+                args += ['-ss', str(options.start_time)]
+            if options.end_time is not None:
+                args += ['-to', str(options.end_time)]
+        
+        duration = None
+        if info.duration:
+            duration = min(options.end_time or info.duration, info.duration) - (options.start_time or 0)
         
-        if options:
-            if options.start_time is not None or options.end_time is not None:
-                video = video.subclip(options.start_time, options.end_time)
+        stream_copy = info.audio_codec in AUDIO_COPY_CODECS.get(suffix, set()) and not options.bitrate
+        if stream_copy:
+            args += ['-c:a', 'copy']
+        else:
+            args += ['-c:a', AUDIO_ENCODERS.get(suffix, 'libmp3lame')]
+            if options.bitrate:
+                args += ['-b:a', options.bitrate]
         
-        audio = video.audio
-        audio.write_audiofile(str(output_path), verbose=False, logger=None)
-        video.close()
+        # ffmpeg decodes and encodes in one pass, so this is a single stage
+        with conversion_stage("transcode"):
+            try:
+                run_ffmpeg(args + [str(output_path)], duration, progress_token)
+            except RuntimeError:
+                if not stream_copy:
+                    raise
+                # Some streams cannot be remuxed cleanly (e.g. broken timestamps); re-encode instead
+                logger.warning(f"Stream copy of {input_path.name} failed, transcoding instead")
+                args[args.index('copy')] = AUDIO_ENCODERS.get(suffix, 'libmp3lame')
+                run_ffmpeg(args + [str(output_path)], duration, progress_token)
     
     @staticmethod
     async def process_image(input_path: Path, output_path: Path, options: ImageProcessingOptions) -> None:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, ConversionEngine._process_image_sync, input_path, output_path, options)
+        await execution_engine.run("image", ConversionEngine._process_image_sync, input_path, output_path, options)
     
     @staticmethod
     def _process_image_sync(input_path: Path, output_path: Path, options: ImageProcessingOptions):
-        image = Image.open(input_path)
+        with ConversionEngine._open_image(input_path) as source:
+            image = ConversionEngine._render_image(source, options)
+            with conversion_stage("encode"):
+                ConversionEngine._save_image(image, output_path, options.quality)
+    
+    @staticmethod
+    def _process_bulk_batch_sync(
+        source_path: Path,
+        entry_names: List[Optional[str]],
+        options: ImageProcessingOptions,
+        output_format: str
+    ) -> List[tuple]:
+        """Process bulk items that share a source into (encoded bytes, error) pairs.
+
+        The items are entries of one uploaded ZIP, or the uploaded file
+        itself when the entry name is None. An archive's central directory
+        is read once per batch, and the archive is closed before returning,
+        so no pool worker keeps a finished request's upload open.
+        """
+        results = []
+        archive = zipfile.ZipFile(source_path) if entry_names[0] is not None else None
+        try:
+            for entry_name in entry_names:
+                try:
+                    data = archive.read(entry_name) if archive is not None else source_path.read_bytes()
+                    results.append((ConversionEngine._process_bulk_image(data, options, output_format), None))
+                except Exception as e:
+                    results.append((None, str(e) or type(e).__name__))
+        finally:
+            if archive is not None:
+                archive.close()
+        return results
+    
+    @staticmethod
+    def _open_image(source) -> "Image.Image":
+        # Pillow reports an unreadable input as an OSError, which the job
+        # queue would retry; it fails the same way every time
+        try:
+            return Image.open(source)
+        except Image.UnidentifiedImageError:
+            raise ValueError("Not a recognized image file")
+    
+    @staticmethod
+    def _process_bulk_image(data: bytes, options: ImageProcessingOptions, output_format: str) -> bytes:
+        with ConversionEngine._open_image(io.BytesIO(data)) as source:
+            image = ConversionEngine._render_image(source, options)
+            output = io.BytesIO()
+            image_format = Image.registered_extensions()[f".{output_format}"]
+            with conversion_stage("encode"):
+                ConversionEngine._save_image(image, output, options.quality, image_format)
+            return output.getvalue()
+    
+    @staticmethod
+    def _render_image(source: "Image.Image", options: ImageProcessingOptions) -> "Image.Image":
+        size = None
+        if options.width or options.height:
+            size = (options.width or source.width, options.height or source.height)
+        
+        with conversion_stage("decode"):
+            image = ConversionEngine._decode_image(source, size, options.grayscale)
+        with conversion_stage("transform"):
+            if size:
+                image = ConversionEngine._resize_image(image, size)
+            image = ConversionEngine._apply_color_adjustments(image, options)
+            return ConversionEngine._apply_spatial_filters(image, options)
+    
+    @staticmethod
+    async def process_image_variants(
+        input_path: Path,
+        outputs: List[tuple],
+        options: ImageProcessingOptions
+    ) -> None:
+        await execution_engine.run("image", ConversionEngine._process_image_variants_sync, input_path, outputs, options)
+    
+    @staticmethod
+    def _process_image_variants_sync(input_path: Path, outputs: List[tuple], options: ImageProcessingOptions):
+        """Write several (variant, output_path) renditions from a single decode.
+
+        Color adjustments are applied once to the decoded image; resizing and
+        the spatial filters (whose radius is in output pixels) run per variant.
+        """
+        with ConversionEngine._open_image(input_path) as source:
+            sizes = [
+                ConversionEngine._fit_size(source.size, variant.width, variant.height)
+                for variant, _ in outputs
+            ]
+            largest = max(sizes, key=lambda size: size[0] * size[1])
+            
+            with conversion_stage("decode"):
+                image = ConversionEngine._decode_image(source, largest, options.grayscale)
+            with conversion_stage("transform"):
+                image = ConversionEngine._apply_color_adjustments(image, options)
+            
+            for (variant, output_path), size in zip(outputs, sizes):
+                with conversion_stage("transform"):
+                    rendition = ConversionEngine._resize_image(image, size) if size != image.size else image
+                    rendition = ConversionEngine._apply_spatial_filters(rendition, options)
+                with conversion_stage("encode"):
+                    ConversionEngine._save_image(rendition, output_path, variant.quality or options.quality)
+    
+    @staticmethod
+    def _fit_size(source_size: tuple, width: Optional[int], height: Optional[int]) -> tuple:
+        # Fit inside the (width, height) box, keeping the aspect ratio and never upscaling
+        source_width, source_height = source_size
+        scales = [1.0]
+        if width:
+            scales.append(width / source_width)
+        if height:
+            scales.append(height / source_height)
+        scale = min(scales)
+        return (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+    
+    @staticmethod
+    def _decode_image(source: "Image.Image", target_size: Optional[tuple], grayscale: bool) -> "Image.Image":
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale (and straight to grayscale),
+        # which skips most of the IDCT work when the target is much smaller
+        if source.format == 'JPEG':
+            mode = 'L' if grayscale and source.mode in ('RGB', 'L') else source.mode
+            source.draft(mode, target_size or source.size)
         
-        # Apply transformations
-        if options.grayscale:
+        image = source
+        image.load()
+        if grayscale and image.mode != 'L':
             image = image.convert('L')
+        return image
+    
+    @staticmethod
+    def _resize_image(image: "Image.Image", size: tuple) -> "Image.Image":
+        # reducing_gap lets Pillow box-reduce by an integer factor before the
+        # LANCZOS pass, so large downscales do not filter at full resolution
+        return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    
+    @staticmethod
+    def _apply_color_adjustments(image: "Image.Image", options: ImageProcessingOptions) -> "Image.Image":
+        """Apply brightness and contrast as one lookup-table pass.
+
+        Equivalent to ImageEnhance.Brightness followed by ImageEnhance.Contrast,
+        without materializing an intermediate image per enhancement.
+        """
+        if not options.brightness and not options.contrast:
+            return image
         
-        if options.width or options.height:
-            size = (options.width or image.width, options.height or image.height)
-            image = image.resize(size, Image.Resampling.LANCZOS)
+        if image.mode == 'P':
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        
+        if image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+            if options.brightness:
+                image = ImageEnhance.Brightness(image).enhance(options.brightness)
+            if options.contrast:
+                image = ImageEnhance.Contrast(image).enhance(options.contrast)
+            return image
         
-        if options.brightness:
-            enhancer = ImageEnhance.Brightness(image)
-            image = enhancer.enhance(options.brightness)
+        brightness = options.brightness or 1.0
+        levels = [min(255.0, value * brightness) for value in range(256)]
         
         if options.contrast:
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(options.contrast)
+            # Contrast pivots around the mean luminance of the brightened image,
+            # which follows from the per-band histograms without a grayscale copy
+            histogram = image.histogram()
+            pixels = image.width * image.height
+            band_means = [
+                sum(levels[value] * count for value, count in enumerate(histogram[band * 256:(band + 1) * 256])) / pixels
+                for band in range(len(image.getbands()))
+            ]
+            if image.mode in ('RGB', 'RGBA'):
+                mean = band_means[0] * 0.299 + band_means[1] * 0.587 + band_means[2] * 0.114
+            else:
+                mean = band_means[0]
+            mean = int(mean + 0.5)
+            levels = [mean + (value - mean) * options.contrast for value in levels]
         
+        lut = [max(0, min(255, int(value + 0.5))) for value in levels]
+        identity = list(range(256))
+        color_bands = 1 if image.mode in ('L', 'LA') else 3
+        alpha_bands = len(image.getbands()) - color_bands
+        return image.point(lut * color_bands + identity * alpha_bands)
+    
+    @staticmethod
+    def _apply_spatial_filters(image: "Image.Image", options: ImageProcessingOptions) -> "Image.Image":
         if options.blur:
             image = image.filter(ImageFilter.GaussianBlur(radius=options.blur))
         
         if options.sharpen:
             image = image.filter(ImageFilter.SHARPEN)
         
+        return image
+    
+    @staticmethod
+    def _save_image(image: "Image.Image", output, quality: Optional[int], image_format: Optional[str] = None):
         # Save with quality setting
         save_kwargs = {}
-        if output_path.suffix.lower() in ['.jpg', '.jpeg']:
-            save_kwargs['quality'] = options.quality
+        if image_format is None:
+            image_format = Image.registered_extensions().get(output.suffix.lower())
+        else:
+            save_kwargs['format'] = image_format
+        if image_format == 'JPEG':
+            if image.mode not in ('RGB', 'L', 'CMYK'):
+                image = image.convert('RGB')
+            save_kwargs['quality'] = quality
             save_kwargs['optimize'] = True
+        elif image_format == 'WEBP':
+            save_kwargs['quality'] = quality
         
-        image.save(output_path, **save_kwargs)
+        image.save(output, **save_kwargs)
     
     @staticmethod
-    async def process_audio(input_path: Path, output_path: Path, options: AudioProcessingOptions) -> None:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, ConversionEngine._process_audio_sync, input_path, output_path, options)
+    async def process_audio(
+        input_path: Path,
+        output_path: Path,
+        options: AudioProcessingOptions,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> None:
+        await execution_engine.run(
+            "audio", ConversionEngine._process_audio_sync, input_path, output_path, options,
+            progress=progress
+        )
     
     @staticmethod
-    def _process_audio_sync(input_path: Path, output_path: Path, options: AudioProcessingOptions):
-        audio = AudioSegment.from_file(input_path)
-        
-        if options.sample_rate:
-            audio = audio.set_frame_rate(options.sample_rate)
+    def _process_audio_sync(
+        input_path: Path,
+        output_path: Path,
+        options: AudioProcessingOptions,
+        progress_token: Optional[str] = None
+    ):
+        """Transcode audio in one streaming ffmpeg pass, so memory stays flat at any length.
+
+        A pure container change copies the stream when the output can hold
+        its codec. Normalization is two-pass EBU R128 loudnorm: the first pass
+        only measures, the second applies a linear gain from the measurements.
+        """
+        with conversion_stage("probe"):
+            info = probe_media(input_path)
+        if info.audio_codec is None:
+            raise ValueError("The file has no audio stream")
         
-        if options.channels:
-            audio = audio.set_channels(options.channels)
+        suffix = output_path.suffix.lower()
+        resample = (
+            (options.sample_rate and options.sample_rate != info.sample_rate)
+            or (options.channels and options.channels != info.channels)
+        )
         
+        filters = []
+        progress_span = (0, 100)
         if options.normalize:
-            audio = audio.normalize()
+            with conversion_stage("analyze"):
+                stats = ConversionEngine._measure_loudness(input_path, info.duration, progress_token)
+            if stats is not None:
+                filters.append(
+                    f"loudnorm={LOUDNESS_TARGET}:measured_I={stats['input_i']}:measured_TP={stats['input_tp']}"
+                    f":measured_LRA={stats['input_lra']}:measured_thresh={stats['input_thresh']}"
+                    f":offset={stats['target_offset']}:linear=true"
+                )
+            progress_span = (50, 100)
+        
+        args = ['-i', str(input_path), '-map', '0:a:0', '-vn', '-sn', '-dn']
+        stream_copy = (
+            not filters and not resample and not options.bitrate
+            and info.audio_codec in AUDIO_COPY_CODECS.get(suffix, set())
+        )
+        if stream_copy:
+            args += ['-c:a', 'copy']
+        else:
+            args += ['-c:a', AUDIO_ENCODERS.get(suffix, 'libmp3lame')]
+            if filters:
+                args += ['-af', ','.join(filters)]
+            if options.bitrate:
+                args += ['-b:a', options.bitrate]
+            # loudnorm works at 192kHz internally, so the rate is always pinned
+            sample_rate = options.sample_rate or info.sample_rate
+            if sample_rate:
+                args += ['-ar', str(sample_rate)]
+            if options.channels:
+                args += ['-ac', str(options.channels)]
+        
+        with conversion_stage("transcode"):
+            try:
+                run_ffmpeg(args + [str(output_path)], info.duration, progress_token, progress_span)
+            except RuntimeError:
+                if not stream_copy:
+                    raise
+                logger.warning(f"Stream copy of {input_path.name} failed, transcoding instead")
+                args[args.index('copy')] = AUDIO_ENCODERS.get(suffix, 'libmp3lame')
+                run_ffmpeg(args + [str(output_path)], info.duration, progress_token, progress_span)
+    
+    @staticmethod
+    def _measure_loudness(input_path: Path, duration: Optional[float], progress_token: Optional[str]) -> Optional[Dict[str, str]]:
+        # First loudnorm pass: decode and measure only, nothing is written
+        log = run_ffmpeg(
+            ['-i', str(input_path), '-map', '0:a:0', '-af', f"loudnorm={LOUDNESS_TARGET}:print_format=json", '-f', 'null', '-'],
+            duration, progress_token, (0, 50)
+        )
+        matches = _LOUDNORM_STATS_PATTERN.findall(log)
+        if not matches:
+            raise RuntimeError("ffmpeg did not report loudness measurements")
+        stats = json.loads(matches[-1])
+        # Silence measures as -inf, and there is nothing to normalize
+        if any(stats[key] in ("-inf", "inf", "nan") for key in ("input_i", "input_tp", "input_lra", "input_thresh")):
+            return None
+        return stats
+
+    @staticmethod
+    async def convert_csv_to_json(input_path: Path, output_path: Path, options: DataProcessingOptions) -> int:
+        return await execution_engine.run("data", ConversionEngine._csv_to_json_sync, input_path, output_path, options)
+    
+    @staticmethod
+    def _csv_to_json_sync(input_path: Path, output_path: Path, options: DataProcessingOptions) -> int:
+        with open(input_path, newline='', encoding='utf-8-sig') as src, open(output_path, 'w', encoding='utf-8') as dst:
+            return ConversionEngine._csv_to_json_stream(src, dst, options)
+    
+    @staticmethod
+    def _csv_to_json_stream(src, dst, options: DataProcessingOptions) -> int:
+        rows = 0
+        ragged_rows = 0
+        # Parsing and writing are interleaved row by row, so the pass is one stage
+        with conversion_stage("transform"):
+            reader = csv.DictReader(src, delimiter=options.delimiter, restkey=_EXTRA_CELLS)
+            
+            # Types are inferred from a bounded prefix, then the rest streams through
+            sample = list(itertools.islice(reader, options.sample_rows))
+            casts = _infer_column_casts(reader.fieldnames or [], sample) if options.infer_types else {}
+            
+            if not options.ndjson:
+                dst.write('[')
+            for row in itertools.chain(sample, reader):
+                if row.pop(_EXTRA_CELLS, None):
+                    ragged_rows += 1
+                record = {key: casts[key](value) if key in casts else value for key, value in row.items()}
+                if options.ndjson:
+                    dst.write(json.dumps(record, ensure_ascii=False))
+                    dst.write('\n')
+                else:
+                    dst.write(',\n' if rows else '\n')
+                    dst.write(json.dumps(record, ensure_ascii=False))
+                rows += 1
+            if not options.ndjson:
+                dst.write('\n]\n')
+        
+        if ragged_rows:
+            logger.warning(f"Dropped cells beyond the header in {ragged_rows} rows")
+        return rows
+    
+    @staticmethod
+    async def convert_json_to_csv(input_path: Path, output_path: Path, options: DataProcessingOptions) -> int:
+        return await execution_engine.run("data", ConversionEngine._json_to_csv_sync, input_path, output_path, options)
+    
+    @staticmethod
+    def _json_to_csv_sync(input_path: Path, output_path: Path, options: DataProcessingOptions) -> int:
+        with open(input_path, encoding='utf-8-sig') as src, open(output_path, 'w', newline='', encoding='utf-8') as dst:
+            return ConversionEngine._json_to_csv_stream(src, dst, options)
+    
+    @staticmethod
+    def _json_to_csv_stream(src, dst, options: DataProcessingOptions) -> int:
+        rows = 0
+        dropped_keys = set()
+        with conversion_stage("transform"):
+            records = _iter_json_records(src, options.ndjson)
+            
+            # The header is the union of keys seen in a bounded prefix
+            sample = list(itertools.islice(records, options.sample_rows))
+            fieldnames = list(dict.fromkeys(key for record in sample for key in record))
+            known = set(fieldnames)
+            
+            writer = csv.DictWriter(dst, fieldnames=fieldnames, delimiter=options.delimiter, extrasaction='ignore')
+            writer.writeheader()
+            for record in itertools.chain(sample, records):
+                dropped_keys.update(key for key in record if key not in known)
+                writer.writerow({key: _csv_cell(value) for key, value in record.items()})
+                rows += 1
+        
+        if dropped_keys:
+            logger.warning(f"Dropped keys not present in the first {options.sample_rows} records: {sorted(dropped_keys)}")
+        return rows
+    
+    # Single hops of planned conversions. Each takes the source document as
+    # bytes and returns the target as bytes, so chained hops hand their
+    # intermediates over in memory.
+    
+    @staticmethod
+    def _transcode_image_bytes(data: bytes, target: str) -> bytes:
+        with ConversionEngine._open_image(io.BytesIO(data)) as source:
+            with conversion_stage("decode"):
+                source.load()
+                image = source if source.mode in ('RGB', 'RGBA', 'L', 'LA', 'P') else source.convert('RGB')
+            return ConversionEngine._encode_image_bytes(image, target)
+    
+    @staticmethod
+    def _encode_image_bytes(image: "Image.Image", target: str) -> bytes:
+        image_format = Image.registered_extensions()[f".{target}"]
+        if image_format == 'PDF' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        with conversion_stage("encode"):
+            ConversionEngine._save_image(image, output, ImageProcessingOptions().quality, image_format)
+        return output.getvalue()
+    
+    @staticmethod
+    def _render_pdf_page_bytes(data: bytes, target: str, dpi: int = 150) -> bytes:
+        # Renders the first page; the pixmap goes straight to the encoder
+        with conversion_stage("decode"), fitz.open(stream=data, filetype="pdf") as document:
+            if not len(document):
+                raise ValueError("The PDF has no pages")
+            pixmap = document[0].get_pixmap(dpi=dpi, alpha=False)
+        with conversion_stage("transform"):
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        return ConversionEngine._encode_image_bytes(image, target)
+    
+    @staticmethod
+    def _pdf_to_docx_bytes(data: bytes) -> bytes:
+        cv = pdf2docx.Converter(stream=data)
+        try:
+            settings = ConversionEngine._pdf_settings(cv)
+            ConversionEngine._parse_pdf_pages(cv, list(range(len(cv.fitz_doc))), settings, None)
+            output = io.BytesIO()
+            with conversion_stage("encode"):
+                cv.make_docx(output, **settings)
+            return output.getvalue()
+        finally:
+            cv.close()
+    
+    @staticmethod
+    def _office_to_pdf_bytes(data: bytes) -> bytes:
+        if office_pool.available:
+            with conversion_stage("transform"):
+                return office_pool.convert(data, "pdf")
+        # Without LibreOffice, fall back to Word (Windows and macOS only),
+        # which only opens files, so this needs a scratch directory
+        with tempfile.TemporaryDirectory() as scratch:
+            input_path = Path(scratch) / "input.docx"
+            output_path = Path(scratch) / "output.pdf"
+            input_path.write_bytes(data)
+            with conversion_stage("transform"):
+                docx2pdf.convert(str(input_path), str(output_path))
+            return output_path.read_bytes()
+    
+    @staticmethod
+    def _csv_to_json_bytes(data: bytes) -> bytes:
+        src = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', newline='')
+        dst = io.StringIO()
+        ConversionEngine._csv_to_json_stream(src, dst, DataProcessingOptions())
+        return dst.getvalue().encode('utf-8')
+    
+    @staticmethod
+    def _json_to_csv_bytes(data: bytes) -> bytes:
+        src = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig')
+        dst = io.StringIO(newline='')
+        ConversionEngine._json_to_csv_stream(src, dst, DataProcessingOptions())
+        return dst.getvalue().encode('utf-8')
+    
+    @staticmethod
+    async def convert_planned(
+        input_path: Path,
+        output_path: Path,
+        plan: List["FormatConverter"],
+        progress: Optional[Callable[[float], None]] = None
+    ) -> None:
+        # The whole chain runs in one call, on the pool of its heaviest hop
+        # (or the office thread, which Word automation has to stay on)
+        kinds = {hop.kind for hop in plan}
+        kind = "office" if "office" in kinds else max(plan, key=lambda hop: hop.cost).kind
+        await execution_engine.run(
+            kind, ConversionEngine._convert_planned_sync, input_path, output_path,
+            [(hop.source, hop.target) for hop in plan],
+            progress=progress
+        )
+    
+    @staticmethod
+    def _convert_planned_sync(input_path: Path, output_path: Path, steps: List[tuple], progress_token: Optional[str] = None):
+        # The input is read once and the result written once; every
+        # intermediate stays in this worker's memory
+        data = input_path.read_bytes()
+        for done, (source, target) in enumerate(steps, start=1):
+            data = converter_registry.get(source, target).fn(data)
+            report_progress(progress_token, done / len(steps) * 100)
+        output_path.write_bytes(data)
+
+conversion_engine = ConversionEngine()
+
+# Converter registry
+# Alternative spellings of a format, mapped to the name converters use
+FORMAT_ALIASES = {"jpeg": "jpg", "tif": "tiff"}
+
+def normalize_format(name: str) -> str:
+    name = name.lower().lstrip(".")
+    return FORMAT_ALIASES.get(name, name)
+
+@dataclass(frozen=True)
+class FormatConverter:
+    """One hop between two formats.
+
+    ``fn`` turns the source document's bytes into the target's bytes.
+    ``cost`` is a relative weight (roughly CPU-seconds for a typical input)
+    that the planner minimizes over a chain, and ``kind`` is the
+    ``ExecutionEngine`` pool the hop runs on.
+    """
+    source: str
+    target: str
+    cost: float
+    kind: str
+    fn: Callable[[bytes], bytes]
+
+class ConverterRegistry:
+    """Converters keyed by their source and target formats.
+
+    ``plan`` finds the cheapest chain of registered hops between two
+    formats, so e.g. DOCX to PNG runs as DOCX -> PDF -> PNG without a
+    dedicated converter.
+    """
+    
+    def __init__(self):
+        self._converters: Dict[str, Dict[str, FormatConverter]] = {}
+        self._plans: Dict[tuple, Optional[List[FormatConverter]]] = {}
+    
+    def add(self, source: str, target: str, cost: float, kind: str, fn: Callable[[bytes], bytes]):
+        converter = FormatConverter(normalize_format(source), normalize_format(target), cost, kind, fn)
+        self._converters.setdefault(converter.source, {})[converter.target] = converter
+        self._plans.clear()
+    
+    def get(self, source: str, target: str) -> Optional[FormatConverter]:
+        return self._converters.get(normalize_format(source), {}).get(normalize_format(target))
+    
+    def formats(self) -> Dict[str, List[str]]:
+        """Every source format with the targets it can be converted to."""
+        return {
+            source: sorted(target for target in self._reachable(source) if target != source)
+            for source in sorted(self._converters)
+        }
+    
+    def _reachable(self, source: str) -> set:
+        seen, pending = {source}, [source]
+        while pending:
+            for target in self._converters.get(pending.pop(), {}):
+                if target not in seen:
+                    seen.add(target)
+                    pending.append(target)
+        return seen
+    
+    def plan(self, source: str, target: str) -> Optional[List[FormatConverter]]:
+        """Cheapest chain of converters from ``source`` to ``target``, or None."""
+        key = (normalize_format(source), normalize_format(target))
+        if key not in self._plans:
+            self._plans[key] = self._cheapest_chain(*key)
+        return self._plans[key]
+    
+    def _cheapest_chain(self, source: str, target: str) -> Optional[List[FormatConverter]]:
+        if source == target:
+            return None
+        # Dijkstra over formats; the counter breaks ties without comparing hops
+        tie = itertools.count()
+        frontier = [(0.0, next(tie), source, [])]
+        settled = set()
+        while frontier:
+            cost, _, current, chain = heapq.heappop(frontier)
+            if current == target:
+                return chain
+            if current in settled:
+                continue
+            settled.add(current)
+            for converter in self._converters.get(current, {}).values():
+                if converter.target not in settled:
+                    heapq.heappush(frontier, (cost + converter.cost, next(tie), converter.target, chain + [converter]))
+        return None
+
+converter_registry = ConverterRegistry()
+
+RASTER_FORMATS = ("png", "jpg", "webp", "bmp", "gif", "tiff")
+
+for _source in RASTER_FORMATS:
+    for _target in RASTER_FORMATS + ("pdf",):
+        if _source != _target:
+            converter_registry.add(_source, _target, 1, "image", partial(ConversionEngine._transcode_image_bytes, target=_target))
+    converter_registry.add("pdf", _source, 2, "image", partial(ConversionEngine._render_pdf_page_bytes, target=_source))
+converter_registry.add("pdf", "docx", 10, "document", ConversionEngine._pdf_to_docx_bytes)
+# Office hops are only offered where something can run them
+if office_pool.available:
+    for _source in OFFICE_FORMATS:
+        converter_registry.add(_source, "pdf", 3, "office", ConversionEngine._office_to_pdf_bytes)
+elif WORD_AVAILABLE:
+    converter_registry.add("docx", "pdf", 8, "office", ConversionEngine._office_to_pdf_bytes)
+converter_registry.add("csv", "json", 1, "data", ConversionEngine._csv_to_json_bytes)
+converter_registry.add("json", "csv", 1, "data", ConversionEngine._json_to_csv_bytes)
+
+# Memory admission
+MB = 1024 * 1024
+# Peak memory of converters whose footprint does not grow with the input:
+# ffmpeg and the data converters stream, and office documents are
+# converted in the LibreOffice pool's own processes
+FFMPEG_MEMORY = 128 * MB
+STREAMING_DATA_MEMORY = 64 * MB
+OFFICE_MEMORY = 32 * MB
+DEFAULT_JOB_MEMORY = 256 * MB
+# pdf2docx: one parser process, plus the layout it keeps for every page
+PDF_PROCESS_MEMORY = 160 * MB
+PDF_PAGE_MEMORY = 12 * MB
+# Working memory of a planned conversion hop, on top of the bytes it holds
+HOP_MEMORY = {"image": 64 * MB, "document": PDF_PROCESS_MEMORY, "office": OFFICE_MEMORY, "data": STREAMING_DATA_MEMORY}
+
+class MemoryBudgetExceeded(ValueError):
+    pass
+
+def _system_memory() -> int:
+    total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    # Containers see the host's memory; their cgroup limit is the real one
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        if limit.isdigit():
+            total = min(total, int(limit))
+    except OSError:
+        pass
+    return total
+
+def process_tree_rss() -> int:
+    """Resident memory of this process and its conversion worker processes (Linux only, else 0)."""
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in [os.getpid()] + [child.pid for child in multiprocessing.active_children()]:
+        try:
+            total += int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+def read_image_header(stream: IO[bytes]) -> Optional[tuple]:
+    """``(format, width, height)`` of an image, read from its header without decoding it.
+
+    Reads the header fields itself rather than through Pillow, so estimating
+    memory imports no converter. Returns None for anything it does not
+    recognize. ``stream`` has to be seekable for JPEG and TIFF.
+    """
+    head = stream.read(32)
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+        return ("PNG", *struct.unpack(">II", head[16:24]))
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ("GIF", *struct.unpack("<HH", head[6:10]))
+    if head[:2] == b"BM" and len(head) >= 26:
+        # Rows are stored top-down when the height is negative
+        width, height = struct.unpack("<ii", head[18:26])
+        return ("BMP", abs(width), abs(height))
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+        chunk = head[12:16]
+        if chunk == b"VP8X":
+            return ("WEBP", 1 + int.from_bytes(head[24:27], "little"), 1 + int.from_bytes(head[27:30], "little"))
+        if chunk == b"VP8L":
+            bits = int.from_bytes(head[21:25], "little")
+            return ("WEBP", 1 + (bits & 0x3FFF), 1 + (bits >> 14 & 0x3FFF))
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", head[26:30])
+            return ("WEBP", width & 0x3FFF, height & 0x3FFF)
+    if head[:2] == b"\xff\xd8":
+        return _read_jpeg_header(stream)
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return _read_tiff_header(stream, "<" if head[:2] == b"II" else ">", head)
+    return None
+
+def _read_jpeg_header(stream: IO[bytes]) -> Optional[tuple]:
+    # Walk the segments up to the start of frame, which holds the dimensions
+    stream.seek(2)
+    while True:
+        marker = stream.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        while code == 0xFF:
+            # Fill bytes before the marker code
+            fill = stream.read(1)
+            if not fill:
+                return None
+            code = fill[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            # Markers without a payload
+            continue
+        length = stream.read(2)
+        if len(length) < 2:
+            return None
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            frame = stream.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">xHH", frame)
+            return ("JPEG", width, height)
+        stream.seek(struct.unpack(">H", length)[0] - 2, io.SEEK_CUR)
+
+def _read_tiff_header(stream: IO[bytes], order: str, head: bytes) -> Optional[tuple]:
+    # Image width and length are tags 256 and 257 of the first directory
+    stream.seek(struct.unpack(order + "I", head[4:8])[0])
+    count = stream.read(2)
+    if len(count) < 2:
+        return None
+    size = {}
+    for _ in range(struct.unpack(order + "H", count)[0]):
+        entry = stream.read(12)
+        if len(entry) < 12:
+            break
+        tag, field_type = struct.unpack(order + "HH", entry[:4])
+        if tag in (256, 257):
+            # SHORT or LONG, left-aligned in the value field
+            size[tag] = struct.unpack(order + ("H" if field_type == 3 else "I"), entry[8:10] if field_type == 3 else entry[8:12])[0]
+    if 256 not in size or 257 not in size:
+        return None
+    return ("TIFF", size[256], size[257])
+
+def _image_memory(header: tuple, target: Optional[tuple]) -> int:
+    image_format, width, height = header
+    # JPEG decodes at 1/2, 1/4 or 1/8 scale when the target is that much smaller
+    reduce = 1
+    if image_format == 'JPEG' and target:
+        while reduce < 8 and width // (reduce * 2) >= target[0] and height // (reduce * 2) >= target[1]:
+            reduce *= 2
+    decoded = (width // reduce) * (height // reduce) * 4
+    output = target[0] * target[1] * 4 if target else decoded
+    # The decoded image and a converted copy, then the output and its encoder buffer
+    return HOP_MEMORY["image"] + 2 * decoded + 2 * output
+
+def _required_image_header(stream: IO[bytes]) -> tuple:
+    header = read_image_header(stream)
+    if header is None:
+        raise ValueError("Not a recognized image file")
+    return header
+
+def _estimate_image_memory(path: Path, payload: Dict[str, Any]) -> int:
+    options = ImageProcessingOptions(**payload.get("options", {}))
+    with open(path, "rb") as stream:
+        header = _required_image_header(stream)
+    _, width, height = header
+    if payload.get("variants"):
+        targets = [
+            ConversionEngine._fit_size((width, height), variant.get("width"), variant.get("height"))
+            for variant in payload["variants"]
+        ]
+        target = max(targets, key=lambda size: size[0] * size[1])
+    elif options.width or options.height:
+        target = (options.width or width, options.height or height)
+    else:
+        target = None
+    return _image_memory(header, target)
+
+def estimate_bulk_image_memory(source: IO[bytes], size: int, options: ImageProcessingOptions) -> int:
+    """Peak memory of one bulk image of ``size`` encoded bytes, judged from its header."""
+    header = _required_image_header(source)
+    _, width, height = header
+    target = None
+    if options.width or options.height:
+        target = (options.width or width, options.height or height)
+    # Bulk items are read and encoded in memory, on top of the image work
+    return 2 * size + _image_memory(header, target)
+
+def _estimate_pdf_memory(path: Path, payload: Dict[str, Any], parallel: Optional[bool]) -> int:
+    options = DocumentProcessingOptions(**payload.get("options", {}))
+    pages = len(options.page_indexes(ConversionEngine._pdf_page_count(path)))
+    if parallel is None:
+        parallel = pages >= ConversionEngine.pdf_parallel_min_pages
+    sequential = PDF_PROCESS_MEMORY + pages * PDF_PAGE_MEMORY
+    if not parallel:
+        return sequential
+    # Chunks are parsed side by side, then every page is restored for the merge
+    chunks = -(-pages // ConversionEngine.pdf_chunk_pages)
+    side_by_side = min(chunks, execution_engine.concurrency_limits["document"])
+    return max(side_by_side * (PDF_PROCESS_MEMORY + ConversionEngine.pdf_chunk_pages * PDF_PAGE_MEMORY), sequential)
+
+def _estimate_plan_memory(path: Path, plan: List[FormatConverter]) -> int:
+    # Every intermediate is held in memory, at roughly the input's size
+    total = path.stat().st_size * (len(plan) + 1)
+    if plan[0].source in RASTER_FORMATS:
+        with open(path, "rb") as stream:
+            _, width, height = _required_image_header(stream)
+        total += 2 * width * height * 4
+    return total + max(HOP_MEMORY.get(hop.kind, DEFAULT_JOB_MEMORY) for hop in plan)
+
+def estimate_job_memory(conversion_type: str, path: Path, payload: Dict[str, Any]) -> int:
+    """Roughly the peak memory a job needs, in bytes, judged from its input's headers."""
+    if conversion_type.startswith("image_process_") or conversion_type in ("png_to_jpg", "jpg_to_png"):
+        return _estimate_image_memory(path, payload)
+    if conversion_type == "pdf_to_docx":
+        parallel = payload.get("options", {}).get("parallel")
+        return _estimate_pdf_memory(path, payload, parallel)
+    if conversion_type in ("video_to_audio", "mp4_to_mp3", "mp3_to_wav", "wav_to_mp3"):
+        # ffmpeg streams, whatever the duration or resolution
+        return FFMPEG_MEMORY
+    if conversion_type in ("csv_to_json", "json_to_csv"):
+        return STREAMING_DATA_MEMORY
+    source_format, _, output_format = conversion_type.rpartition("_to_")
+    plan = converter_registry.plan(source_format, output_format) if source_format else None
+    if plan:
+        return _estimate_plan_memory(path, plan)
+    return DEFAULT_JOB_MEMORY
+
+@dataclass
+class MemoryGovernor:
+    """Keeps a worker process tree's conversions within a memory budget.
+
+    A worker estimates every job's peak footprint from its input's headers
+    when it picks the job up: image dimensions (after JPEG's reduced-scale
+    decoding), PDF page counts, and the size of in-memory intermediates.
+    Estimating in the worker keeps the parsing, and the converter imports
+    that PDFs need, off the API's request path. A job that could not fit
+    fails straight away. PDF to DOCX is switched to sequential parsing when
+    only that fits. The worker then starts the job only once its estimate
+    fits next to the running jobs' reservations and the measured RSS. A job
+    still starts when nothing else is running.
+    """
+    budget: int = int(os.getenv("MEMORY_BUDGET_MB", 0)) * MB or int(_system_memory() * 0.75)
+    # Largest share of the budget one job may need
+    max_job_share: float = float(os.getenv("MEMORY_MAX_JOB_SHARE", 0.8))
+    poll_interval: float = 0.5
+    
+    def __post_init__(self):
+        self._reserved = 0
+        self._baseline = 0
+        self._condition: Optional[asyncio.Condition] = None
+    
+    @property
+    def max_job_bytes(self) -> int:
+        return int(self.budget * self.max_job_share)
+    
+    async def check(self, conversion_type: str, upload: SavedUpload, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Estimate a job's memory; returns its payload with the estimate (and any fallback) applied.
+
+        Raises ``MemoryBudgetExceeded`` when the job could never fit.
+        """
+        estimate = await execution_engine.run("probe", self._estimate, conversion_type, upload.path, payload)
+        if estimate > self.max_job_bytes and conversion_type == "pdf_to_docx":
+            # Parsing one page at a time is slower but holds a single parser
+            sequential = await execution_engine.run("probe", _estimate_pdf_memory, upload.path, payload, False)
+            if sequential <= self.max_job_bytes:
+                payload = {**payload, "options": {**payload.get("options", {}), "parallel": False}}
+                estimate = sequential
+        self._require_fits(conversion_type, estimate)
+        return {**payload, "memory_estimate": estimate}
+    
+    def check_bulk_image(self, source: Callable[[], IO[bytes]], size: int, options: ImageProcessingOptions) -> int:
+        """Estimate one bulk image opened by ``source``; blocking.
+
+        Raises ``MemoryBudgetExceeded`` when the image could never fit.
+        """
+        try:
+            with source() as stream:
+                estimate = estimate_bulk_image_memory(stream, size, options)
+        except Exception:
+            # Not an image, which the conversion reports for the item
+            return min(DEFAULT_JOB_MEMORY, self.max_job_bytes)
+        self._require_fits("image_bulk", estimate)
+        return estimate
+    
+    def _require_fits(self, conversion_type: str, estimate: int):
+        if estimate > self.max_job_bytes:
+            memory_rejections.inc(conversion_type=conversion_type)
+            raise MemoryBudgetExceeded(
+                f"Input too large to convert: needs about {estimate // MB} MB, "
+                f"the limit per job is {self.max_job_bytes // MB} MB"
+            )
+    
+    def _estimate(self, conversion_type: str, path: Path, payload: Dict[str, Any]) -> int:
+        try:
+            return estimate_job_memory(conversion_type, path, payload)
+        except Exception as e:
+            # Unreadable headers are the converter's to report, so admit the job
+            logger.warning(f"Could not estimate memory for a {conversion_type} job: {e}")
+            return min(DEFAULT_JOB_MEMORY, self.max_job_bytes)
+    
+    def _fits(self, estimate: int) -> bool:
+        if self._reserved == 0:
+            self._baseline = process_tree_rss()
+            return True
+        used = max(process_tree_rss(), self._baseline + self._reserved)
+        return used + estimate <= self.budget
+    
+    @asynccontextmanager
+    async def reserve(self, estimate: int):
+        """Wait until ``estimate`` bytes fit in the budget and hold them while the job runs."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        started = time.perf_counter()
+        async with self._condition:
+            while not self._fits(estimate):
+                try:
+                    # Released reservations wake us; RSS is re-measured meanwhile
+                    await asyncio.wait_for(self._condition.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._reserved += estimate
+        conversion_stage_seconds.observe(time.perf_counter() - started, conversion_type=current_conversion.get(), stage="memory_wait")
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._reserved -= estimate
+                self._condition.notify_all()
+    
+    def collect_metrics(self):
+        memory_budget_bytes.set(self.budget)
+        memory_reserved_bytes.set(self._reserved)
+        memory_rss_bytes.set(process_tree_rss())
+
+memory_governor = MemoryGovernor()
+metrics.collector(memory_governor.collect_metrics)
+
+# Job inputs and cached results
+async def convert_with_cache(
+    upload: SavedUpload,
+    conversion_type: str,
+    output_path: Path,
+    convert_fn: Callable[[], Awaitable[None]],
+    options: Optional[BaseModel] = None
+) -> bool:
+    """Run ``convert_fn`` unless an identical conversion is already cached.
+
+    Returns True when the output was served from the cache.
+    """
+    cache_key = result_cache.make_key(upload.sha256, f"{conversion_type}{output_path.suffix}", options)
+    if await result_cache.fetch(cache_key, output_path):
+        return True
+    
+    await convert_fn()
+    await result_cache.store(cache_key, output_path)
+    return False
+
+async def save_job_input(job_id: str, file: "JobInput", filename: str) -> SavedUpload:
+    # The upload is closed once the response has been sent, so the input has
+    # to be persisted before the job is handed to a worker.
+    try:
+        return await store_input(file, filename)
+    except Exception:
+        await update_job_status(job_id, ConversionStatus.FAILED)
+        raise
+
+async def job_input(
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Query(None, description="A finished resumable upload (see POST /uploads) to convert instead of a file"),
+    user_id: str = Depends(get_current_user)
+) -> JobInput:
+    if (file is None) == (upload_id is None):
+        raise HTTPException(status_code=400, detail="Send either a file or an upload_id")
+    if file is not None:
+        return file
+    return await resumable_uploads.finished(upload_id, user_id)
+
+async def job_inputs(
+    files: Optional[List[UploadFile]] = File(None),
+    upload_ids: List[str] = Query([], description="Finished resumable uploads (see POST /uploads) to convert as well"),
+    user_id: str = Depends(get_current_user)
+) -> List[JobInput]:
+    sources: List[JobInput] = list(files or [])
+    for upload_id in upload_ids:
+        sources.append(await resumable_uploads.finished(upload_id, user_id))
+    if not sources:
+        raise HTTPException(status_code=400, detail="Send files or upload_ids")
+    return sources
+
+
+# Routes
+@app.get("/")
+async def root():
+    return {
+        "message": "Advanced File Conversion API",
+        "version": "2.0.0",
+        "features": [
+            "Asynchronous processing",
+            "Job tracking",
+            "Rate limiting",
+            "File caching",
+            "Batch processing",
+            "Advanced image/video/audio processing"
+        ]
+    }
+
+@app.get("/health")
+async def health_check():
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "redis_available": services.REDIS_AVAILABLE
+    }
+
+# Resumable uploads follow the tus core protocol (https://tus.io), except that
+# PATCH accepts any offset so chunks can be sent in parallel
+TUS_VERSION = "1.0.0"
+
+def _upload_headers(session: UploadSession, ranges: Optional[List[List[int]]] = None) -> Dict[str, str]:
+    headers = {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Length": str(session.size),
+        "Upload-Expires": formatdate(session.expires_at.timestamp(), usegmt=True),
+        "Cache-Control": "no-store"
+    }
+    if ranges is not None:
+        headers["Upload-Offset"] = str(ResumableUploads.offset(ranges))
+    return headers
+
+def _parse_upload_metadata(value: Optional[str]) -> Dict[str, str]:
+    # "key base64value,key base64value"
+    metadata = {}
+    for pair in (value or "").split(","):
+        key, _, encoded = pair.strip().partition(" ")
+        if key:
+            try:
+                metadata[key] = base64.b64decode(encoded).decode("utf-8")
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid Upload-Metadata value for {key}")
+    return metadata
+
+@app.post("/uploads", status_code=201)
+async def create_upload(
+    upload_length: int = Header(..., gt=0, description="Size of the whole file in bytes"),
+    upload_metadata: Optional[str] = Header(None, description="tus metadata; filename and filetype are used"),
+    user_id: str = Depends(get_current_user)
+):
+    """Start a resumable upload.
+
+    Send the file with PATCH requests to the returned location, each carrying
+    ``Upload-Offset`` and optionally ``Upload-Checksum: sha256 <base64>``.
+    Chunks may be sent in any order and in parallel. Once every byte has
+    arrived, pass the ``upload_id`` to a conversion endpoint in place of a file.
+    """
+    await rate_limit_check(user_id)
+    metadata = _parse_upload_metadata(upload_metadata)
+    session = await resumable_uploads.create(
+        user_id, Path(metadata.get("filename", "upload")).name, metadata.get("filetype"), upload_length
+    )
+    location = f"/uploads/{session.id}"
+    return JSONResponse(
+        status_code=201,
+        content={"upload_id": session.id, "location": location, "expires_at": session.expires_at.isoformat()},
+        headers={**_upload_headers(session), "Location": location}
+    )
+
+@app.head("/uploads/{upload_id}")
+async def get_upload_offset(upload_id: str, user_id: str = Depends(get_current_user)):
+    session = await resumable_uploads.get(upload_id, user_id)
+    ranges = await resumable_uploads.received(upload_id)
+    return Response(status_code=200, headers=_upload_headers(session, ranges))
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str, user_id: str = Depends(get_current_user)):
+    """Upload progress, including every received range for parallel clients."""
+    session = await resumable_uploads.get(upload_id, user_id)
+    ranges = await resumable_uploads.received(upload_id)
+    return JSONResponse(
+        {
+            "upload_id": session.id,
+            "filename": session.filename,
+            "size": session.size,
+            "status": session.status,
+            "offset": ResumableUploads.offset(ranges),
+            "received": ranges,
+            "expires_at": session.expires_at.isoformat() if session.expires_at else None
+        },
+        headers=_upload_headers(session, ranges)
+    )
+
+@app.patch("/uploads/{upload_id}", status_code=204)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., ge=0),
+    upload_checksum: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user)
+):
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    session = await resumable_uploads.get(upload_id, user_id)
+    ranges = await resumable_uploads.write_chunk(session, upload_offset, request.stream(), upload_checksum)
+    return Response(status_code=204, headers=_upload_headers(session, ranges))
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str, user_id: str = Depends(get_current_user)):
+    await resumable_uploads.get(upload_id, user_id)
+    await resumable_uploads.delete(upload_id)
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
+
+@app.post("/convert/pdf-to-docx", response_model=ConversionResponse)
+async def convert_pdf_to_docx(
+    file: JobInput = Depends(job_input),
+    pages: Optional[str] = Query(None, pattern=r"^\d+(-\d+)?(,\d+(-\d+)?)*$", description="Pages to convert, e.g. 1-5,8 (default: all)"),
+    parallel: Optional[bool] = Query(None, description="Parse page chunks in parallel (default: only for long documents)"),
+    user_id: str = Depends(get_current_user)
+):
+    await job_scheduler.admit("pdf_to_docx")
+    await rate_limit_check(user_id, cost=rate_limit_cost("pdf_to_docx"))
+    
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF file.")
+    
+    try:
+        options = DocumentProcessingOptions(pages=parse_page_ranges(pages) if pages else None, parallel=parallel)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    job_id = await create_conversion_job(user_id, file.filename, "pdf_to_docx")
+    upload = await save_job_input(job_id, file, f"{job_id}.pdf")
+    await job_queue.enqueue(job_id, upload, {"options": options.model_dump(exclude_none=True)})
+    
+    return ConversionResponse(
+        job_id=job_id,
+        status=ConversionStatus.PENDING,
+        message="Conversion job started"
+    )
+
+async def process_pdf_to_docx_conversion(job_id: str, upload: SavedUpload, payload: Dict[str, Any]):
+    start_time = datetime.now()
+    
+    try:
+        options = DocumentProcessingOptions(**payload.get("options", {}))
+        await update_job_status(job_id, ConversionStatus.PROCESSING, progress=0.0)
+        
+        output_filename = f"{job_id}.docx"
+        
+        input_path = upload.path
+        output_path = await file_manager.prepare_path(output_filename)
+        
+        # Convert (or reuse a cached result for identical input)
+        await convert_with_cache(
+            upload, "pdf_to_docx", output_path,
+            lambda: conversion_engine.convert_pdf_to_docx(
+                input_path, output_path, options, progress=job_progress_reporter(job_id)
+            ),
+            options
+        )
+        
+        # Update job
+        processing_time = (datetime.now() - start_time).total_seconds()
+        file_size = output_path.stat().st_size
+        
+        await update_job_status(
+            job_id, 
+            ConversionStatus.COMPLETED, 
+            output_filename=output_filename,
+            processing_time=processing_time,
+            file_size=file_size
+        )
         
-        export_kwargs = {}
-        if options.bitrate:
-            export_kwargs['bitrate'] = options.bitrate
+        # Cleanup input file
+        await aiofiles.os.remove(input_path)
         
-        audio.export(output_path, format=output_path.suffix[1:], **export_kwargs)
+    except Exception as e:
+        logger.error(f"Conversion failed for job {job_id}: {str(e)}")
+        await job_queue.fail(job_id, e)
 
-conversion_engine = ConversionEngine()
+@app.post("/convert/docx-to-pdf", response_model=ConversionResponse)
+async def convert_docx_to_pdf(
+    file: JobInput = Depends(job_input),
+    user_id: str = Depends(get_current_user)
+):
+    await job_scheduler.admit("docx_to_pdf")
+    await rate_limit_check(user_id, cost=rate_limit_cost("docx_to_pdf"))
+    
+    # DOC, RTF and ODT need the LibreOffice pool; Word only handles DOCX here
+    accepted = [source for source in OFFICE_FORMATS if converter_registry.get(source, "pdf")]
+    if not accepted:
+        raise HTTPException(status_code=501, detail="Office document conversion needs LibreOffice (unoserver) on this server")
+    source_format = normalize_format(Path(file.filename).suffix)
+    if source_format not in accepted:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Please upload a {', '.join(ext.upper() for ext in accepted)} file."
+        )
+    
+    job_id = await create_conversion_job(user_id, file.filename, f"{source_format}_to_pdf")
+    upload = await save_job_input(job_id, file, f"{job_id}_input.{source_format}")
+    await job_queue.enqueue(job_id, upload, {"source_format": source_format, "output_format": "pdf"})
+    
+    return ConversionResponse(
+        job_id=job_id,
+        status=ConversionStatus.PENDING,
+        message="Conversion job started"
+    )
 
-# Job management
-async def create_conversion_job(
-    user_id: str, 
-    input_filename: str, 
-    conversion_type: str,
-    db: Session
-) -> str:
-    job_id = str(uuid.uuid4())
-    expires_at = datetime.now() + timedelta(hours=24)
-    
-    job = ConversionRecord(
-        id=job_id,
-        user_id=user_id,
-        input_filename=input_filename,
-        conversion_type=conversion_type,
+@app.post("/convert/csv-to-json", response_model=ConversionResponse)
+async def convert_csv_to_json(
+    file: JobInput = Depends(job_input),
+    ndjson: bool = Query(False, description="Write newline-delimited JSON instead of a JSON array"),
+    infer_types: bool = Query(True, description="Infer numbers and booleans from a sample of rows"),
+    delimiter: str = Query(",", min_length=1, max_length=1),
+    user_id: str = Depends(get_current_user)
+):
+    await job_scheduler.admit("csv_to_json")
+    await rate_limit_check(user_id, cost=rate_limit_cost("csv_to_json"))
+    
+    if Path(file.filename).suffix.lower() != ".csv":
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a CSV file.")
+    
+    options = DataProcessingOptions(ndjson=ndjson, infer_types=infer_types, delimiter=delimiter)
+    job_id = await create_conversion_job(user_id, file.filename, "csv_to_json")
+    upload = await save_job_input(job_id, file, f"{job_id}.csv")
+    await job_queue.enqueue(job_id, upload, {"options": options.model_dump(exclude_none=True)})
+    
+    return ConversionResponse(
+        job_id=job_id,
         status=ConversionStatus.PENDING,
-        created_at=datetime.now(),
-        expires_at=expires_at
+        message="Conversion job started"
     )
+
+@app.post("/convert/json-to-csv", response_model=ConversionResponse)
+async def convert_json_to_csv(
+    file: JobInput = Depends(job_input),
+    ndjson: Optional[bool] = Query(None, description="Input is newline-delimited JSON (auto-detected when omitted)"),
+    delimiter: str = Query(",", min_length=1, max_length=1),
+    user_id: str = Depends(get_current_user)
+):
+    await job_scheduler.admit("json_to_csv")
+    await rate_limit_check(user_id, cost=rate_limit_cost("json_to_csv"))
     
-    db.add(job)
-    db.commit()
+    if Path(file.filename).suffix.lower() not in [".json", ".ndjson", ".jsonl"]:
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a JSON or NDJSON file.")
     
-    return job_id
+    options = DataProcessingOptions(ndjson=ndjson, delimiter=delimiter)
+    job_id = await create_conversion_job(user_id, file.filename, "json_to_csv")
+    upload = await save_job_input(job_id, file, f"{job_id}.json")
+    await job_queue.enqueue(job_id, upload, {"options": options.model_dump(exclude_none=True)})
+    
+    return ConversionResponse(
+        job_id=job_id,
+        status=ConversionStatus.PENDING,
+        message="Conversion job started"
+    )
 
-async def update_job_status(job_id: str, status: ConversionStatus, db: Session, **kwargs):
-    job = db.query(ConversionRecord).filter(ConversionRecord.id == job_id).first()
-    if job:
-        job.status = status
-        for key, value in kwargs.items():
-            setattr(job, key, value)
-        db.commit()
+async def process_csv_to_json_conversion(job_id: str, upload: SavedUpload, payload: Dict[str, Any]):
+    options = DataProcessingOptions(**payload.get("options", {}))
+    output_suffix = ".ndjson" if options.ndjson else ".json"
+    await process_data_conversion(job_id, upload, options, "csv_to_json", output_suffix, conversion_engine.convert_csv_to_json)
 
-# Routes
-@app.get("/")
-async def root():
-    return {
-        "message": "Advanced File Conversion API",
-        "version": "2.0.0",
-        "features": [
-            "Asynchronous processing",
-            "Job tracking",
-            "Rate limiting",
-            "File caching",
-            "Batch processing",
-            "Advanced image/video/audio processing"
-        ]
-    }
+async def process_json_to_csv_conversion(job_id: str, upload: SavedUpload, payload: Dict[str, Any]):
+    options = DataProcessingOptions(**payload.get("options", {}))
+    await process_data_conversion(job_id, upload, options, "json_to_csv", ".csv", conversion_engine.convert_json_to_csv)
 
-@app.get("/health")
-async def health_check():
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "redis_available": REDIS_AVAILABLE
-    }
+async def process_data_conversion(
+    job_id: str,
+    upload: SavedUpload,
+    options: DataProcessingOptions,
+    conversion_type: str,
+    output_suffix: str,
+    convert_fn: Callable[[Path, Path, DataProcessingOptions], Awaitable[int]]
+):
+    start_time = datetime.now()
+    
+    try:
+        await update_job_status(job_id, ConversionStatus.PROCESSING)
+        
+        output_filename = f"{job_id}{output_suffix}"
+        
+        input_path = upload.path
+        output_path = await file_manager.prepare_path(output_filename)
+        
+        # Convert (or reuse a cached result for identical input)
+        await convert_with_cache(
+            upload, conversion_type, output_path,
+            lambda: convert_fn(input_path, output_path, options),
+            options
+        )
+        
+        # Update job
+        processing_time = (datetime.now() - start_time).total_seconds()
+        file_size = output_path.stat().st_size
+        
+        await update_job_status(
+            job_id,
+            ConversionStatus.COMPLETED,
+            output_filename=output_filename,
+            processing_time=processing_time,
+            file_size=file_size,
+            throughput=upload.size / processing_time if processing_time > 0 else None
+        )
+        
+        # Cleanup input file
+        await aiofiles.os.remove(input_path)
+        
+    except Exception as e:
+        logger.error(f"Data conversion failed for job {job_id}: {str(e)}")
+        await job_queue.fail(job_id, e)
 
-@app.post("/convert/pdf-to-docx", response_model=ConversionResponse)
-async def convert_pdf_to_docx(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@app.post("/convert/video-to-audio", response_model=ConversionResponse)
+async def convert_video_to_audio(
+    file: JobInput = Depends(job_input),
+    output_format: str = Query("mp3", pattern=f"^({'|'.join(AUDIO_OUTPUT_FORMATS)})$", description="Audio format to extract to"),
+    start_time: Optional[float] = Query(None, ge=0, description="Trim start in seconds"),
+    end_time: Optional[float] = Query(None, gt=0, description="Trim end in seconds"),
+    bitrate: Optional[str] = Query(None, pattern=r"^\d+k$", description="Re-encode at this bitrate (e.g. 192k) instead of copying"),
+    user_id: str = Depends(get_current_user)
 ):
-    if not await rate_limit_check(user_id):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+    await job_scheduler.admit("video_to_audio")
+    await rate_limit_check(user_id, cost=rate_limit_cost("video_to_audio"))
     
-    if file.content_type != "application/pdf":
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF file.")
+    suffix = Path(file.filename).suffix.lower()
+    if suffix not in file_manager.allowed_extensions['video']:
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a video file.")
     
-    job_id = await create_conversion_job(user_id, file.filename, "pdf_to_docx", db)
+    if start_time is not None and end_time is not None and end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
     
-    background_tasks.add_task(
-        process_pdf_to_docx_conversion,
-        job_id, file, db
-    )
+    options = VideoProcessingOptions(start_time=start_time, end_time=end_time, bitrate=bitrate)
+    job_id = await create_conversion_job(user_id, file.filename, "video_to_audio")
+    upload = await save_job_input(job_id, file, f"{job_id}_input{suffix}")
+    await job_queue.enqueue(job_id, upload, {
+        "options": options.model_dump(exclude_none=True),
+        "output_format": output_format
+    })
     
     return ConversionResponse(
         job_id=job_id,
@@ -407,30 +2052,34 @@ async def convert_pdf_to_docx(
         message="Conversion job started"
     )
 
-async def process_pdf_to_docx_conversion(job_id: str, file: UploadFile, db: Session):
+async def process_video_to_audio_conversion(job_id: str, upload: SavedUpload, payload: Dict[str, Any]):
     start_time = datetime.now()
     
     try:
-        await update_job_status(job_id, ConversionStatus.PROCESSING, db)
+        await update_job_status(job_id, ConversionStatus.PROCESSING)
         
-        # Save input file
-        input_filename = f"{job_id}.pdf"
-        output_filename = f"{job_id}.docx"
+        options = VideoProcessingOptions(**payload.get("options", {}))
+        output_filename = f"{job_id}.{payload.get('output_format', 'mp3')}"
         
-        input_path = await file_manager.save_file(file, input_filename)
-        output_path = file_manager.base_path / output_filename
+        input_path = upload.path
+        output_path = await file_manager.prepare_path(output_filename)
         
-        # Convert
-        await conversion_engine.convert_pdf_to_docx(input_path, output_path)
+        # Extract (or reuse a cached result for identical input)
+        await convert_with_cache(
+            upload, "video_to_audio", output_path,
+            lambda: conversion_engine.convert_video_to_audio(
+                input_path, output_path, options, progress=job_progress_reporter(job_id)
+            ),
+            options
+        )
         
         # Update job
         processing_time = (datetime.now() - start_time).total_seconds()
         file_size = output_path.stat().st_size
         
         await update_job_status(
-            job_id, 
-            ConversionStatus.COMPLETED, 
-            db,
+            job_id,
+            ConversionStatus.COMPLETED,
             output_filename=output_filename,
             processing_time=processing_time,
             file_size=file_size
@@ -440,78 +2089,121 @@ async def process_pdf_to_docx_conversion(job_id: str, file: UploadFile, db: Sess
         await aiofiles.os.remove(input_path)
         
     except Exception as e:
-        logger.error(f"Conversion failed for job {job_id}: {str(e)}")
-        await update_job_status(job_id, ConversionStatus.FAILED, db)
+        logger.error(f"Audio extraction failed for job {job_id}: {str(e)}")
+        await job_queue.fail(job_id, e)
 
 @app.post("/convert/batch", response_model=List[ConversionResponse])
 async def batch_convert(
-    background_tasks: BackgroundTasks,
-    files: List[UploadFile] = File(...),
+    files: List[JobInput] = Depends(job_inputs),
     conversion_type: str = Query(..., description="Type of conversion (e.g., 'pdf_to_docx')"),
-    user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_current_user)
 ):
-    if not await rate_limit_check(user_id, limit=50):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
-    
+    """Queue one job per file.
+
+    Besides the dedicated conversions, any pair listed by
+    ``/convert/formats`` can be requested as ``<source>_to_<target>``.
+    A PDF converted to an image format (``pdf_to_png``, or ``docx_to_png``
+    through PDF) yields its first page only.
+    """
+    # Validate before admitting and charging, so a rejected batch costs nothing
     if len(files) > 10:
         raise HTTPException(status_code=400, detail="Maximum 10 files per batch")
     
-    responses = []
+    if resolve_job_handler(conversion_type) is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported conversion type: {conversion_type}")
+    
+    source_format = conversion_type.rpartition("_to_")[0]
     for file in files:
-        job_id = await create_conversion_job(user_id, file.filename, conversion_type, db)
-        
-        # Add appropriate background task based on conversion type
-        if conversion_type == "pdf_to_docx":
-            background_tasks.add_task(process_pdf_to_docx_conversion, job_id, file, db)
-        elif conversion_type == "docx_to_pdf":
-            background_tasks.add_task(process_docx_to_pdf_conversion, job_id, file, db)
-        elif conversion_type == "mp4_to_mp3":
-            background_tasks.add_task(process_mp4_to_mp3_conversion, job_id, file, db)
-        elif conversion_type == "png_to_jpg":
-            background_tasks.add_task(process_png_to_jpg_conversion, job_id, file, db)
-        elif conversion_type == "wav_to_mp3":
-            background_tasks.add_task(process_wav_to_mp3_conversion, job_id, file, db)
-        elif conversion_type == "csv_to_json":
-            background_tasks.add_task(process_csv_to_json_conversion, job_id, file, db)
-        elif conversion_type == "jpg_to_png":
-            background_tasks.add_task(process_jpg_to_png_conversion, job_id, file, db)
-        elif conversion_type == "json_to_csv":
-            background_tasks.add_task(process_json_to_csv_conversion, job_id, file, db)
-        elif conversion_type == "mp3_to_wav":
-            background_tasks.add_task(process_mp3_to_wav_conversion, job_id, file, db)
+        suffix = Path(file.filename).suffix.lower()
+        if source_format == "video":
+            accepted = suffix in file_manager.allowed_extensions['video']
         else:
-            raise HTTPException(status_code=400, detail=f"Unsupported conversion type: {conversion_type}")
-        
-        responses.append(ConversionResponse(
-            job_id=job_id,
-            status=ConversionStatus.PENDING,
-            message=f"Batch conversion job started for {file.filename}"
-        ))
+            accepted = normalize_format(suffix) == normalize_format(source_format)
+        if not accepted:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type for {conversion_type}: {file.filename}"
+            )
+    
+    await job_scheduler.admit(conversion_type)
+    await rate_limit_check(user_id, cost=rate_limit_cost(conversion_type) * len(files))
+    
+    source_format, _, output_format = conversion_type.rpartition("_to_")
+    payload = {"source_format": source_format, "output_format": output_format}
+    current_conversion.set(conversion_type)
+    
+    # Save every input first, then create the whole batch already enqueued
+    # in a single insert
+    jobs, saved_paths = [], []
+    try:
+        for file in files:
+            job_id = str(uuid.uuid4())
+            input_suffix = Path(file.filename).suffix.lower()
+            upload = await store_input(file, f"{job_id}_input{input_suffix}")
+            saved_paths.append(upload.path)
+            jobs.append(new_job_record(
+                user_id, file.filename, conversion_type,
+                id=job_id, **job_queue.queue_fields(upload, payload)
+            ))
+        await job_store.insert(jobs)
+    except Exception:
+        for path in saved_paths:
+            if path.exists():
+                path.unlink()
+        raise
     
-    return responses
+    return [
+        ConversionResponse(
+            job_id=job.id,
+            status=ConversionStatus.PENDING,
+            message=f"Batch conversion job started for {job.input_filename}"
+        )
+        for job in jobs
+    ]
+
+async def image_options_form(request: Request) -> ImageProcessingOptions:
+    # Options arrive as individual multipart fields next to the file
+    form = await request.form()
+    fields = {name: form[name] for name in ImageProcessingOptions.model_fields if form.get(name) not in (None, "")}
+    try:
+        return ImageProcessingOptions(**fields)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
 
 @app.post("/image/process", response_model=ConversionResponse)
 async def process_image_advanced(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    options: ImageProcessingOptions = ImageProcessingOptions(),
-    output_format: str = Query("png", description="Output format (jpg, png, webp)"),
-    user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    file: JobInput = Depends(job_input),
+    options: ImageProcessingOptions = Depends(image_options_form),
+    variants: Optional[str] = Form(None, description='JSON list of renditions, e.g. [{"name": "thumb", "width": 256, "format": "webp"}]'),
+    output_format: str = Query("png", pattern=f"^({'|'.join(IMAGE_OUTPUT_FORMATS)})$", description="Output format (jpg, png, webp)"),
+    user_id: str = Depends(get_current_user)
 ):
-    if not await rate_limit_check(user_id):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+    await job_scheduler.admit("image_process")
+    await rate_limit_check(user_id, cost=rate_limit_cost("image_process"))
     
     if file.content_type not in ["image/jpeg", "image/png", "image/gif", "image/bmp", "image/webp"]:
         raise HTTPException(status_code=400, detail="Invalid file type")
     
-    job_id = await create_conversion_job(user_id, file.filename, f"image_process_{output_format}", db)
+    payload = {
+        "options": options.model_dump(exclude_none=True),
+        "output_format": output_format
+    }
+    
+    if variants:
+        try:
+            parsed_variants = TypeAdapter(List[ImageVariant]).validate_json(variants)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid variants: {e.errors(include_url=False)}")
+        if not 1 <= len(parsed_variants) <= 10:
+            raise HTTPException(status_code=400, detail="Between 1 and 10 variants per job")
+        if len({variant.name for variant in parsed_variants}) != len(parsed_variants):
+            raise HTTPException(status_code=400, detail="Variant names must be unique")
+        payload["variants"] = [variant.model_dump(exclude_none=True) for variant in parsed_variants]
     
-    background_tasks.add_task(
-        process_image_job,
-        job_id, file, options, output_format, db
-    )
+    job_id = await create_conversion_job(user_id, file.filename, f"image_process_{output_format}")
+    upload = await save_job_input(job_id, file, f"{job_id}_input{Path(file.filename).suffix}")
+    
+    await job_queue.enqueue(job_id, upload, payload)
     
     return ConversionResponse(
         job_id=job_id,
@@ -521,35 +2213,51 @@ async def process_image_advanced(
 
 async def process_image_job(
     job_id: str, 
-    file: UploadFile, 
-    options: ImageProcessingOptions,
-    output_format: str,
-    db: Session
+    upload: SavedUpload, 
+    payload: Dict[str, Any]
 ):
     start_time = datetime.now()
     
     try:
-        await update_job_status(job_id, ConversionStatus.PROCESSING, db)
-        
-        # Save input file
-        input_filename = f"{job_id}_input{Path(file.filename).suffix}"
-        output_filename = f"{job_id}.{output_format}"
+        await update_job_status(job_id, ConversionStatus.PROCESSING)
         
-        input_path = await file_manager.save_file(file, input_filename)
-        output_path = file_manager.base_path / output_filename
+        options = ImageProcessingOptions(**payload.get("options", {}))
+        output_format = payload.get("output_format", "png")
+        input_path = upload.path
         
-        # Process image
-        await conversion_engine.process_image(input_path, output_path, options)
+        if payload.get("variants"):
+            # All renditions come out of a single decode
+            variants = [ImageVariant(**variant) for variant in payload["variants"]]
+            outputs = [
+                (variant, await file_manager.prepare_path(f"{job_id}_{variant.name}.{variant.format or output_format}"))
+                for variant in variants
+            ]
+            await conversion_engine.process_image_variants(input_path, outputs, options)
+            
+            output_filename = outputs[0][1].name
+            file_size = sum(path.stat().st_size for _, path in outputs)
+            variant_outputs = json.dumps({variant.name: path.name for variant, path in outputs})
+        else:
+            output_filename = f"{job_id}.{output_format}"
+            output_path = await file_manager.prepare_path(output_filename)
+            
+            # Process image (or reuse a cached result for identical input)
+            await convert_with_cache(
+                upload, "image_process", output_path,
+                lambda: conversion_engine.process_image(input_path, output_path, options),
+                options
+            )
+            file_size = output_path.stat().st_size
+            variant_outputs = None
         
         # Update job
         processing_time = (datetime.now() - start_time).total_seconds()
-        file_size = output_path.stat().st_size
         
         await update_job_status(
             job_id, 
             ConversionStatus.COMPLETED, 
-            db,
             output_filename=output_filename,
+            outputs=variant_outputs,
             processing_time=processing_time,
             file_size=file_size
         )
@@ -559,23 +2267,301 @@ async def process_image_job(
         
     except Exception as e:
         logger.error(f"Image processing failed for job {job_id}: {str(e)}")
-        await update_job_status(job_id, ConversionStatus.FAILED, db)
+        await job_queue.fail(job_id, e)
+
+async def process_planned_conversion(job_id: str, upload: SavedUpload, payload: Dict[str, Any]):
+    start_time = datetime.now()
+    
+    try:
+        await update_job_status(job_id, ConversionStatus.PROCESSING, progress=0.0)
+        
+        source_format = normalize_format(payload["source_format"])
+        output_format = normalize_format(payload["output_format"])
+        plan = converter_registry.plan(source_format, output_format)
+        if plan is None:
+            raise ValueError(f"No conversion from {source_format} to {output_format}")
+        
+        output_filename = f"{job_id}.{output_format}"
+        
+        input_path = upload.path
+        output_path = await file_manager.prepare_path(output_filename)
+        
+        # Convert (or reuse a cached result for identical input)
+        await convert_with_cache(
+            upload, f"{source_format}_to_{output_format}", output_path,
+            lambda: conversion_engine.convert_planned(
+                input_path, output_path, plan, progress=job_progress_reporter(job_id)
+            )
+        )
+        
+        # Update job
+        processing_time = (datetime.now() - start_time).total_seconds()
+        file_size = output_path.stat().st_size
+        
+        await update_job_status(
+            job_id,
+            ConversionStatus.COMPLETED,
+            output_filename=output_filename,
+            processing_time=processing_time,
+            file_size=file_size
+        )
+        
+        # Cleanup input file
+        await aiofiles.os.remove(input_path)
+        
+    except Exception as e:
+        logger.error(f"Conversion failed for job {job_id}: {str(e)}")
+        await job_queue.fail(job_id, e)
+
+# Bulk image processing
+BULK_MAX_ITEMS = 10000
+BULK_MAX_ARCHIVE_SIZE = 2 * 1024 * 1024 * 1024  # 2GB
+# Archive entries handed to a pool worker at a time
+BULK_BATCH_ITEMS = 8
+
+def _list_bulk_archive(archive_path: Path, options: ImageProcessingOptions) -> tuple:
+    """Split an uploaded ZIP into processable (entry, memory estimate) pairs and upfront failures."""
+    entries, failures = [], []
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            basename = PurePosixPath(name).name
+            if info.is_dir() or name.startswith("__MACOSX/") or basename.startswith("."):
+                continue
+            if info.file_size > file_manager.max_file_size:
+                failures.append((name, "Entry too large"))
+                continue
+            try:
+                estimate = memory_governor.check_bulk_image(partial(archive.open, info), info.file_size, options)
+            except MemoryBudgetExceeded as e:
+                failures.append((name, str(e)))
+                continue
+            entries.append((name, estimate))
+    return entries, failures
+
+def _bulk_output_name(input_name: str, output_format: str, used_names: set) -> str:
+    # Keep the archive's folder layout, minus anything that could escape it
+    parts = [part for part in PurePosixPath(input_name).parts if part not in ("", ".", "..", "/")]
+    stem = PurePosixPath(*parts).with_suffix("") if parts else PurePosixPath("image")
+    candidate = f"{stem}.{output_format}"
+    counter = 1
+    while candidate in used_names:
+        candidate = f"{stem}_{counter}.{output_format}"
+        counter += 1
+    used_names.add(candidate)
+    return candidate
+
+def _bulk_batches(items: List[tuple], batch_size: int = BULK_BATCH_ITEMS):
+    """Group consecutive entries of the same archive; uploaded images go alone."""
+    batch = []
+    for item in items:
+        if batch and (item[1] is None or item[0] != batch[0][0] or len(batch) == batch_size):
+            yield batch
+            batch = []
+        batch.append(item)
+        if item[1] is None:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def _run_bulk_batch(batch: List[tuple], options: ImageProcessingOptions, output_format: str) -> List[tuple]:
+    source_path = batch[0][0]
+    try:
+        # Items of a batch are processed one after another
+        async with memory_governor.reserve(max(item[3] for item in batch)):
+            results = await execution_engine.run(
+                "image", ConversionEngine._process_bulk_batch_sync,
+                source_path, [item[1] for item in batch], options, output_format
+            )
+    except Exception as e:
+        results = [(None, str(e) or type(e).__name__)] * len(batch)
+    return [(item[2], data, error) for item, (data, error) in zip(batch, results)]
 
-async def process_mp3_to_wav_conversion(job_id: str, file: UploadFile, db: Session):
+async def _stream_bulk_results(
+    job_id: str,
+    items: List[tuple],
+    failures: List[tuple],
+    options: ImageProcessingOptions,
+    output_format: str,
+    saved_paths: List[Path]
+):
+    """Process bulk items in parallel and stream the outputs as one ZIP.
+
+    Each output is appended to the archive as soon as it is ready, so the
+    archive is never held in memory or staged on disk. Failed items are
+    listed in ``manifest.json`` at the end instead of failing the batch.
+    """
+    start_time = datetime.now()
+    buffer = _ZipStreamBuffer()
+    manifest = [{"input": name, "status": "failed", "error": error} for name, error in failures]
+    used_names = set()
+    total = len(items) + len(failures)
+    completed = len(failures)
+    bytes_out = 0
+    last_report = time.monotonic()
+    finished = False
+    
+    # Bound the batches in flight, and with them the encoded results waiting to be written
+    window = 2 * execution_engine.concurrency_limits.get("image", 1)
+    pending = set()
+    remaining = _bulk_batches(items)
+    
+    try:
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            while True:
+                while len(pending) < window:
+                    batch = next(remaining, None)
+                    if batch is None:
+                        break
+                    pending.add(asyncio.create_task(_run_bulk_batch(batch, options, output_format)))
+                if not pending:
+                    break
+                
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for input_name, data, error in task.result():
+                        if error is not None:
+                            manifest.append({"input": input_name, "status": "failed", "error": error})
+                        else:
+                            output_name = _bulk_output_name(input_name, output_format, used_names)
+                            archive.writestr(output_name, data)
+                            manifest.append({"input": input_name, "status": "completed", "output": output_name})
+                        completed += 1
+                
+                chunk = buffer.drain()
+                bytes_out += len(chunk)
+                yield chunk
+                
+                if time.monotonic() - last_report >= 1:
+                    last_report = time.monotonic()
+                    await update_job_status(job_id, ConversionStatus.PROCESSING, progress=completed / total * 100)
+            
+            failed = sum(1 for item in manifest if item["status"] == "failed")
+            archive.writestr("manifest.json", json.dumps({
+                "job_id": job_id,
+                "total": total,
+                "completed": total - failed,
+                "failed": failed,
+                "items": manifest
+            }, indent=2))
+        
+        chunk = buffer.drain()
+        bytes_out += len(chunk)
+        yield chunk
+        finished = True
+        
+        await update_job_status(
+            job_id,
+            ConversionStatus.COMPLETED,
+            progress=100.0,
+            processing_time=(datetime.now() - start_time).total_seconds(),
+            file_size=bytes_out,
+            error=f"{failed} of {total} items failed" if failed else None
+        )
+    finally:
+        for task in pending:
+            task.cancel()
+        for path in saved_paths:
+            if path.exists():
+                path.unlink()
+        if not finished:
+            logger.warning(f"Bulk image job {job_id} aborted after {completed} of {total} items")
+            job_store.submit(job_id, status=ConversionStatus.FAILED, error="Result stream aborted")
+
+@app.post("/image/bulk")
+async def process_images_bulk(
+    # A ZIP archive of images, or the images themselves
+    files: List[JobInput] = Depends(job_inputs),
+    options: ImageProcessingOptions = Depends(image_options_form),
+    output_format: str = Query("jpg", pattern=f"^({'|'.join(IMAGE_OUTPUT_FORMATS)})$", description="Output format for every image"),
+    user_id: str = Depends(get_current_user)
+):
+    """Convert many images and stream the outputs back as one ZIP.
+
+    Bulk requests are exempt from the job queue: the response streams
+    while the images convert, so they run in this API process (even with
+    ``RUN_EMBEDDED_WORKER=0``) rather than on a worker, and are not ordered
+    by the queue's fair share. They are still admitted by the scheduler,
+    rate limited, held to the memory budget and run on this process's
+    image worker pool.
+    """
+    await job_scheduler.admit(f"image_bulk_{output_format}")
+    await rate_limit_check(user_id, cost=rate_limit_cost("image_bulk"))
+    
+    input_name = files[0].filename if len(files) == 1 else f"{len(files)} files"
+    job_id = await create_conversion_job(user_id, input_name, f"image_bulk_{output_format}")
+    
+    # Persist inputs first: pool workers read them by path
+    items, failures, saved_paths = [], [], []
+    try:
+        loop = asyncio.get_running_loop()
+        for index, file in enumerate(files):
+            suffix = Path(file.filename).suffix.lower()
+            if suffix == ".zip":
+                upload = await store_input(file, f"{job_id}_bulk_{index}.zip", max_size=BULK_MAX_ARCHIVE_SIZE)
+                saved_paths.append(upload.path)
+                try:
+                    entries, entry_failures = await loop.run_in_executor(None, _list_bulk_archive, upload.path, options)
+                except zipfile.BadZipFile:
+                    raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {file.filename}")
+                items.extend((upload.path, entry, entry, estimate) for entry, estimate in entries)
+                failures.extend(entry_failures)
+            elif suffix in file_manager.allowed_extensions['image']:
+                upload = await store_input(file, f"{job_id}_bulk_{index}{suffix}")
+                saved_paths.append(upload.path)
+                try:
+                    estimate = await loop.run_in_executor(
+                        None, memory_governor.check_bulk_image, partial(open, upload.path, "rb"), upload.size, options
+                    )
+                except MemoryBudgetExceeded as e:
+                    failures.append((file.filename, str(e)))
+                else:
+                    items.append((upload.path, None, file.filename, estimate))
+            else:
+                failures.append((file.filename, "Unsupported file type"))
+            
+            if len(items) + len(failures) > BULK_MAX_ITEMS:
+                raise HTTPException(status_code=400, detail=f"Maximum {BULK_MAX_ITEMS} images per bulk job")
+    except Exception as e:
+        for path in saved_paths:
+            if path.exists():
+                path.unlink()
+        await update_job_status(job_id, ConversionStatus.FAILED, error=getattr(e, "detail", str(e)))
+        raise
+    
+    await update_job_status(job_id, ConversionStatus.PROCESSING, progress=0.0)
+    
+    return StreamingResponse(
+        _stream_bulk_results(job_id, items, failures, options, output_format, saved_paths),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{job_id}.zip"',
+            "X-Job-Id": job_id
+        }
+    )
+
+async def process_audio_conversion(job_id: str, upload: SavedUpload, payload: Dict[str, Any]):
     start_time = datetime.now()
 
     try:
-        await update_job_status(job_id, ConversionStatus.PROCESSING, db)
+        await update_job_status(job_id, ConversionStatus.PROCESSING)
 
-        # Save input file
-        input_filename = f"{job_id}.mp3"
-        output_filename = f"{job_id}.wav"
+        source_format = payload.get("source_format", "mp3")
+        output_format = payload.get("output_format", "wav")
+        output_filename = f"{job_id}.{output_format}"
 
-        input_path = await file_manager.save_file(file, input_filename)
-        output_path = file_manager.base_path / output_filename
+        input_path = upload.path
+        output_path = await file_manager.prepare_path(output_filename)
 
-        # Convert
-        await conversion_engine.process_audio(input_path, output_path, AudioProcessingOptions(format="wav"))
+        # Convert (or reuse a cached result for identical input)
+        await convert_with_cache(
+            upload, f"{source_format}_to_{output_format}", output_path,
+            lambda: conversion_engine.process_audio(
+                input_path, output_path, AudioProcessingOptions(),
+                progress=job_progress_reporter(job_id)
+            )
+        )
 
         # Update job
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -584,7 +2570,6 @@ async def process_mp3_to_wav_conversion(job_id: str, file: UploadFile, db: Sessi
         await update_job_status(
             job_id,
             ConversionStatus.COMPLETED,
-            db,
             output_filename=output_filename,
             processing_time=processing_time,
             file_size=file_size
@@ -595,103 +2580,516 @@ async def process_mp3_to_wav_conversion(job_id: str, file: UploadFile, db: Sessi
 
     except Exception as e:
         logger.error(f"Conversion failed for job {job_id}: {str(e)}")
-        await update_job_status(job_id, ConversionStatus.FAILED, db)
+        await job_queue.fail(job_id, e)
+
+def _load_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    record = job_status_cache.get(job_id)
+    cache_requests.inc(cache="status", result="miss" if record is None else "hit")
+    if record is None:
+        with SessionLocal() as db:
+            job = get_job_record(job_id, db)
+            if job is None:
+                return None
+            record = job_status_record(job)
+        job_status_cache.put(job_id, record)
+    return record
+
+async def get_job_status_record(job_id: str) -> Optional[Dict[str, Any]]:
+    """A job's status fields, from the status cache when possible."""
+    record = job_status_cache.get_local(job_id)
+    if record is None:
+        record = await job_store.call(_load_job_status, job_id)
+    else:
+        cache_requests.inc(cache="status", result="hit")
+    return record
 
 @app.get("/job/{job_id}", response_model=ConversionResponse)
-async def get_job_status(job_id: str, db: Session = Depends(get_db)):
-    job = db.query(ConversionRecord).filter(ConversionRecord.id == job_id).first()
+async def get_job_status(job_id: str, request: Request):
+    record = await get_job_status_record(job_id)
     
-    if not job:
+    if not record:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    response = ConversionResponse(
-        job_id=job.id,
-        status=job.status,
-        processing_time=job.processing_time,
-        file_size=job.file_size
+    etag = job_status_cache.etag(record)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    return JSONResponse(job_response(job_id, record).model_dump(mode="json"), headers=headers)
+
+SSE_KEEPALIVE_SECONDS = 15
+# Without Redis, events from standalone workers never reach this process,
+# so streams re-read their jobs from the database this often
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", 2))
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+def _event_timeout() -> float:
+    return SSE_KEEPALIVE_SECONDS if services.REDIS_AVAILABLE else SSE_POLL_SECONDS
+
+def _read_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    # Straight from the database: the status cache only sees this process's writes
+    with SessionLocal() as db:
+        job = get_job_record(job_id, db)
+        return job_status_record(job) if job is not None else None
+
+async def _job_events(job_id: str):
+    """Yield a job's current state, then each update until it finishes.
+
+    Yields None when nothing changed for a while, so callers can keep the
+    connection alive. The job is then re-read from the database, which
+    catches updates whose events never reached this process.
+    """
+    with progress_broker.subscribe(f"job:{job_id}") as queue:
+        # Subscribe before reading the snapshot so no update falls in between
+        record = await get_job_status_record(job_id)
+        if not record:
+            raise HTTPException(status_code=404, detail="Job not found")
+        state = job_event(job_id, record)
+        yield state
+        while state["status"] not in TERMINAL_STATUSES:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=_event_timeout())
+            except asyncio.TimeoutError:
+                record = await job_store.call(_read_job_status, job_id)
+                event = job_event(job_id, record) if record else None
+                if event is None or event == state:
+                    yield None
+                    continue
+            state = {**state, **event}
+            yield event
+
+def _read_user_jobs(user_id: str, job_ids: List[str], since: datetime) -> List[ConversionRecord]:
+    """The user's unfinished jobs, jobs created since ``since`` and the jobs in ``job_ids``."""
+    with SessionLocal(expire_on_commit=False) as db:
+        return db.query(ConversionRecord).filter(
+            ConversionRecord.user_id == user_id,
+            or_(
+                ConversionRecord.status.notin_(TERMINAL_STATUSES),
+                ConversionRecord.created_at >= since,
+                ConversionRecord.id.in_(job_ids)
+            )
+        ).all()
+
+@app.get("/job/{job_id}/events")
+async def stream_job_status(job_id: str):
+    """Server-Sent Events stream of a job's status and progress; ends when the job does."""
+    events = _job_events(job_id)
+    first = await anext(events)  # 404s before the stream starts
+    
+    async def stream():
+        yield _sse(first)
+        async for event in events:
+            yield ": keep-alive\n\n" if event is None else _sse(event)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
+
+@app.websocket("/job/{job_id}/ws")
+async def job_status_websocket(websocket: WebSocket, job_id: str):
+    await websocket.accept()
+    try:
+        async for event in _job_events(job_id):
+            if event is not None:
+                await websocket.send_json(event)
+    except HTTPException as e:
+        await websocket.close(code=4404, reason=e.detail)
+        return
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+@app.get("/jobs/events")
+async def stream_user_jobs(user_id: str = Depends(get_current_user)):
+    """Server-Sent Events stream of updates to any of the current user's jobs.
+
+    When no event arrives for a while, the user's active jobs are re-read
+    from the database and any change is sent, so updates whose events never
+    reached this process still arrive.
+    """
+    async def poll(active: Dict[str, Dict[str, Any]], since: datetime) -> List[Dict[str, Any]]:
+        jobs = await job_store.call(_read_user_jobs, user_id, list(active), since)
+        changes = []
+        for job in jobs:
+            event = job_event(job.id, job_status_record(job))
+            if active.get(job.id) != event:
+                changes.append(event)
+            if event["status"] in TERMINAL_STATUSES:
+                active.pop(job.id, None)
+            else:
+                active[job.id] = event
+        return changes
     
-    if job.status == ConversionStatus.COMPLETED and job.output_filename:
-        response.download_url = f"/download/{job.output_filename}"
+    async def stream():
+        with progress_broker.subscribe(f"user:{user_id}") as queue:
+            # Jobs still running, with the state the client last saw
+            active: Dict[str, Dict[str, Any]] = {}
+            polled_at = datetime.now()
+            await poll(active, polled_at)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=_event_timeout())
+                except asyncio.TimeoutError:
+                    since, polled_at = polled_at, datetime.now()
+                    changes = await poll(active, since)
+                    for change in changes:
+                        yield _sse(change)
+                    if not changes:
+                        yield ": keep-alive\n\n"
+                    continue
+                if event.get("job_id") in active:
+                    active[event["job_id"]] = {**active[event["job_id"]], **event}
+                yield _sse(event)
     
-    return response
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics of this API process in the Prometheus text format."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/convert/formats")
+async def get_supported_formats():
+    """Targets each source format can be converted to through ``/convert/batch``.
+
+    Conversions from PDF (or from an office document, through PDF) to an
+    image format render the first page only.
+    """
+    return converter_registry.formats()
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return await asyncio.to_thread(result_cache.stats)
 
 @app.get("/jobs", response_model=List[ConversionResponse])
 async def get_user_jobs(
+    request: Request,
     user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db),
     limit: int = Query(10, le=100),
     offset: int = Query(0, ge=0)
 ):
-    jobs = db.query(ConversionRecord).filter(
-        ConversionRecord.user_id == user_id
-    ).offset(offset).limit(limit).all()
+    headers = {"Cache-Control": "no-cache"}
+    if services.REDIS_AVAILABLE:
+        # The list only changes when one of the user's jobs does, and every
+        # process that writes jobs bumps the shared version
+        version = await job_store.call(job_status_cache.list_version, user_id)
+        user_tag = hashlib.sha1(user_id.encode()).hexdigest()[:8]
+        headers["ETag"] = f'"{user_tag}.{version}.{offset}.{limit}"'
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
     
-    return [
-        ConversionResponse(
-            job_id=job.id,
-            status=job.status,
-            processing_time=job.processing_time,
-            file_size=job.file_size,
-            download_url=f"/download/{job.output_filename}" if job.output_filename else None
-        )
-        for job in jobs
-    ]
+    def query_jobs(db: Session) -> List[ConversionRecord]:
+        # Newest first, served by the (user_id, created_at) index
+        return db.query(ConversionRecord).filter(
+            ConversionRecord.user_id == user_id
+        ).order_by(ConversionRecord.created_at.desc()).offset(offset).limit(limit).all()
+    
+    jobs = await job_store.run(query_jobs)
+    body = [job_response(job.id, job_status_record(job)).model_dump(mode="json") for job in jobs]
+    
+    if not services.REDIS_AVAILABLE:
+        # Standalone workers can't bump this process's list versions, so
+        # the tag is taken from the page as the database returned it
+        digest = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16]
+        headers["ETag"] = f'"{digest}"'
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+    
+    return JSONResponse(body, headers=headers)
 
 @app.get("/download/{filename}")
-async def download_file(filename: str):
-    file_path = file_manager.base_path / filename
-    if not file_path.exists():
+async def download_file(filename: str, request: Request):
+    """Serve a conversion output.
+
+    Responses carry a strong ETag from the file's content hash, so clients
+    can revalidate with ``If-None-Match`` and resume or seek with ``Range``
+    plus ``If-Range``. With ``DOWNLOAD_OFFLOAD`` set the transfer itself is
+    left to the reverse proxy.
+    """
+    file_path = await file_manager.locate(filename) if Path(filename).name == filename else None
+    if file_path is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(
-        file_path, 
-        filename=filename,
-        headers={"Cache-Control": "public, max-age=3600"}
+    etag = await file_manager.content_etag(file_path)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=3600",
+        "Accept-Ranges": "bytes",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    if DOWNLOAD_OFFLOAD in ("x-accel-redirect", "x-sendfile"):
+        if DOWNLOAD_OFFLOAD == "x-accel-redirect":
+            headers["X-Accel-Redirect"] = DOWNLOAD_OFFLOAD_PREFIX + file_path.relative_to(file_manager.base_path).as_posix()
+        else:
+            headers["X-Sendfile"] = str(file_path.resolve())
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        return Response(media_type=media_type, headers=headers)
+    
+    # Starlette answers Range and If-Range against the ETag given here
+    return DownloadResponse(file_path, filename=filename, headers=headers)
+
+def _job_output_files(job: ConversionRecord) -> List[tuple]:
+    """(variant name or None, filename) for every output a job produced."""
+    if job.outputs:
+        return list(json.loads(job.outputs).items())
+    return [(None, job.output_filename)]
+
+def _remove_job_files(job: ConversionRecord):
+    """Delete a job's input and outputs; blocking, and safe to repeat."""
+    for _, filename in _job_output_files(job):
+        if filename:
+            file_manager.remove(filename)
+    if job.input_path:
+        try:
+            os.remove(job.input_path)
+        except FileNotFoundError:
+            pass
+
+async def _stream_jobs_archive(entries: List[tuple]):
+    """Yield a ZIP of ``(archive name, path)`` entries as it is written.
+
+    Entries are stored rather than deflated, since conversion outputs are
+    mostly compressed media already, and only one read chunk is held in
+    memory at a time.
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, path in entries:
+            stat = await aiofiles.os.stat(path)
+            info = zipfile.ZipInfo(name, date_time=time.localtime(stat.st_mtime)[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = stat.st_size
+            async with aiofiles.open(path, "rb") as source:
+                with archive.open(info, "w") as target:
+                    while chunk := await source.read(file_manager.chunk_size):
+                        target.write(chunk)
+                        yield buffer.drain()
+    yield buffer.drain()
+
+@app.get("/jobs/archive")
+async def download_jobs_archive(
+    job_ids: List[str] = Query(..., min_length=1, max_length=ARCHIVE_MAX_JOBS),
+    user_id: str = Depends(get_current_user)
+):
+    """Stream one ZIP holding the outputs of several completed jobs.
+
+    Pass ``job_ids`` once per job. The archive is built while it is sent, so
+    nothing is staged on disk or in memory.
+    """
+    job_ids = list(dict.fromkeys(job_ids))
+    
+    def query_jobs(db: Session) -> List[ConversionRecord]:
+        return db.query(ConversionRecord).filter(
+            ConversionRecord.id.in_(job_ids),
+            ConversionRecord.user_id == user_id
+        ).all()
+    
+    jobs = {job.id: job for job in await job_store.run(query_jobs)}
+    missing = [job_id for job_id in job_ids if job_id not in jobs]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Jobs not found: {', '.join(missing)}")
+    unfinished = [job_id for job_id in job_ids if jobs[job_id].status != ConversionStatus.COMPLETED]
+    if unfinished:
+        raise HTTPException(status_code=409, detail=f"Jobs not completed: {', '.join(unfinished)}")
+    
+    entries = []
+    used_names = set()
+    for job_id in job_ids:
+        job = jobs[job_id]
+        for variant, filename in _job_output_files(job):
+            path = await file_manager.locate(filename)
+            if path is None:
+                raise HTTPException(status_code=410, detail=f"Output of job {job_id} has expired")
+            input_name = job.input_filename or filename
+            if variant:
+                source = PurePosixPath(input_name)
+                input_name = f"{source.with_suffix('')}_{variant}{source.suffix}"
+            name = _bulk_output_name(input_name, Path(filename).suffix.lstrip("."), used_names)
+            entries.append((name, path))
+    
+    return StreamingResponse(
+        _stream_jobs_archive(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="conversions.zip"'}
     )
 
 @app.delete("/job/{job_id}")
 async def delete_job(
     job_id: str,
-    user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_current_user)
 ):
-    job = db.query(ConversionRecord).filter(
-        ConversionRecord.id == job_id,
-        ConversionRecord.user_id == user_id
-    ).first()
+    def query_job(db: Session) -> Optional[ConversionRecord]:
+        return db.query(ConversionRecord).filter(
+            ConversionRecord.id == job_id,
+            ConversionRecord.user_id == user_id
+        ).first()
     
+    job = await job_store.run(query_job)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
     # Delete associated files
-    if job.output_filename:
-        output_path = file_manager.base_path / job.output_filename
-        if output_path.exists():
-            await aiofiles.os.remove(output_path)
+    await job_store.call(_remove_job_files, job)
     
     # Delete job record
-    db.delete(job)
-    db.commit()
+    def delete_record(db: Session):
+        db.query(ConversionRecord).filter(ConversionRecord.id == job_id).delete(synchronize_session=False)
+        db.commit()
+        job_status_cache.invalidate(job_id, user_id)
+    
+    await job_store.run(delete_record)
     
     return {"message": "Job deleted successfully"}
 
 @app.get("/stats")
 async def get_conversion_stats(
-    user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_current_user)
 ):
-    total_jobs = db.query(ConversionRecord).filter(ConversionRecord.user_id == user_id).count()
-    completed_jobs = db.query(ConversionRecord).filter(
-        ConversionRecord.user_id == user_id,
-        ConversionRecord.status == ConversionStatus.COMPLETED
-    ).count()
+    """Job counts since the rollups began, and per-type breakdowns for the last hour and day."""
+    return await job_store.run(stats_rollups.summary, user_id)
+
+# Job workers
+JOB_HANDLERS: Dict[str, Callable[..., Awaitable[None]]] = {
+    "pdf_to_docx": process_pdf_to_docx_conversion,
+    "video_to_audio": process_video_to_audio_conversion,
+    "mp4_to_mp3": process_video_to_audio_conversion,
+    "png_to_jpg": process_image_job,
+    "jpg_to_png": process_image_job,
+    "mp3_to_wav": process_audio_conversion,
+    "wav_to_mp3": process_audio_conversion,
+    "csv_to_json": process_csv_to_json_conversion,
+    "json_to_csv": process_json_to_csv_conversion,
+}
+
+def resolve_job_handler(conversion_type: str) -> Optional[Callable[..., Awaitable[None]]]:
+    if conversion_type.startswith("image_process_"):
+        return process_image_job
+    if conversion_type in JOB_HANDLERS:
+        return JOB_HANDLERS[conversion_type]
+    # Anything else runs as a chain of registered converters, if one exists
+    source_format, _, output_format = conversion_type.rpartition("_to_")
+    if source_format and converter_registry.plan(source_format, output_format):
+        return process_planned_conversion
+    return None
+
+class JobWorker:
+    """Claims jobs from ``job_queue`` and runs them until stopped.
+
+    Jobs are claimed and tracked through ``job_store``, so the worker owns
+    its database sessions rather than borrowing a request's. Each job has a
+    heartbeat that keeps its lease alive, so a crashed worker's jobs become
+    claimable again once the lease runs out.
+    """
     
-    return {
-        "total_jobs": total_jobs,
-        "completed_jobs": completed_jobs,
-        "success_rate": (completed_jobs / total_jobs * 100) if total_jobs > 0 else 0
-    }
+    def __init__(self, worker_id: Optional[str] = None, concurrency: Optional[int] = None, poll_interval: float = 1.0):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency or execution_engine.process_workers
+        self.poll_interval = poll_interval
+        self._active: set = set()
+        self._stopping = asyncio.Event()
+    
+    def stop(self):
+        self._stopping.set()
+    
+    async def run(self):
+        logger.info(f"Job worker {self.worker_id} started (concurrency={self.concurrency})")
+        while not self._stopping.is_set():
+            if len(self._active) >= self.concurrency:
+                await asyncio.wait(self._active, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            
+            job = await self._claim()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            task = asyncio.create_task(self._execute(job))
+            self._active.add(task)
+            task.add_done_callback(self._active.discard)
+        
+        # Hand unfinished jobs back to the queue instead of waiting them out
+        for task in list(self._active):
+            task.cancel()
+        if self._active:
+            await asyncio.wait(self._active)
+        logger.info(f"Job worker {self.worker_id} stopped")
+    
+    async def _claim(self) -> Optional[ConversionRecord]:
+        try:
+            return await job_store.run(job_queue.claim, self.worker_id)
+        except Exception as e:
+            logger.error(f"Job worker {self.worker_id} failed to claim a job: {str(e)}")
+            return None
+    
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(job_queue.lease_seconds / 3)
+            if not await job_store.run(job_queue.renew_lease, job_id, self.worker_id):
+                logger.warning(f"Job worker {self.worker_id} lost the lease on job {job_id}")
+                return
+    
+    async def _execute(self, job: ConversionRecord):
+        # Each job runs in its own task, so this labels only this job's metrics
+        current_conversion.set(job.conversion_type)
+        queued_since = job.available_at or job.created_at
+        if queued_since:
+            wait = max(0.0, (datetime.now() - queued_since).total_seconds())
+            conversion_stage_seconds.observe(wait, conversion_type=job.conversion_type, stage="queue_wait")
+        
+        progress_broker.track(job.id, job.user_id)
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        payload = json.loads(job.payload or "{}")
+        try:
+            handler = resolve_job_handler(job.conversion_type)
+            if handler is None:
+                await update_job_status(
+                    job.id, ConversionStatus.FAILED,
+                    error=f"Unsupported conversion type: {job.conversion_type}"
+                )
+                return
+            
+            upload = SavedUpload(path=Path(job.input_path), size=job.input_size, sha256=job.input_sha256)
+            payload = await memory_governor.check(job.conversion_type, upload, payload)
+            memory_estimate = payload.pop("memory_estimate")
+            # The span continues the trace of the request that queued the job
+            async with memory_governor.reserve(memory_estimate):
+                with trace_span(
+                    f"convert {job.conversion_type}",
+                    carrier=payload.pop("trace", None),
+                    attributes={"job.id": job.id, "job.attempt": job.attempts or 1}
+                ), conversion_stage_seconds.timer(conversion_type=job.conversion_type, stage="total"):
+                    await handler(job.id, upload, payload)
+        except asyncio.CancelledError:
+            # Release the lease so another worker can pick the job up right away
+            await update_job_status(
+                job.id, ConversionStatus.PENDING,
+                attempts=job.attempts - 1,
+                lease_owner=None,
+                lease_expires_at=None,
+                available_at=datetime.now()
+            )
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} crashed in worker {self.worker_id}: {str(e)}")
+            await job_queue.fail(job.id, e)
+        finally:
+            heartbeat.cancel()
+
+report_startup("import")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,142 @@
+"""Prometheus metrics for this process, served at ``/metrics``.
+
+Metrics are kept in memory per process; the API and every standalone
+worker expose their own.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(getattr(value, "value", value)).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+class Metric:
+    """One Prometheus metric family, with a sample per set of label values."""
+    
+    def __init__(self, name: str, kind: str, help: str, buckets: Optional[tuple] = None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.buckets = buckets
+        self._values: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+    
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # One count per bucket plus +Inf, then the sum
+            counts = self._values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+    
+    @contextmanager
+    def timer(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = [(key, list(value) if self.kind == "histogram" else value) for key, value in self._values.items()]
+        for key, value in samples:
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), value[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {value[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """This process's metrics, rendered in the Prometheus text format.
+
+    Collectors run on every scrape to refresh values that are cheaper to read
+    when asked for than to track, such as queue depths.
+    """
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+    
+    def _register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help: str) -> Metric:
+        return self._register(Metric(name, "counter", help))
+    
+    def gauge(self, name: str, help: str) -> Metric:
+        return self._register(Metric(name, "gauge", help))
+    
+    def histogram(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS) -> Metric:
+        return self._register(Metric(name, "histogram", help, buckets))
+    
+    def collector(self, fn: Callable[[], None]) -> Callable[[], None]:
+        self._collectors.append(fn)
+        return fn
+    
+    def render(self) -> str:
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.error(f"Metrics collector {collect.__qualname__} failed: {str(e)}")
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+metrics = MetricsRegistry()
+conversion_stage_seconds = metrics.histogram(
+    "conversion_stage_seconds",
+    "Time spent in each stage of a conversion (queue_wait, upload_save, decode, transform, encode, db_update, ...)"
+)
+conversion_jobs = metrics.counter("conversion_jobs_total", "Conversion jobs that reached a final status")
+conversion_bytes = metrics.counter("conversion_bytes_total", "Bytes uploaded for and produced by conversions")
+executor_wait_seconds = metrics.histogram("executor_wait_seconds", "Time conversions waited for a free worker slot")
+executor_queued = metrics.gauge("executor_queued", "Conversions waiting for a worker slot")
+executor_running = metrics.gauge("executor_running", "Conversions running on the worker pools")
+executor_saturation = metrics.gauge("executor_saturation", "Share of a conversion kind's worker slots in use")
+cache_requests = metrics.counter("cache_requests_total", "Cache lookups by cache and result")
+db_operation_seconds = metrics.histogram("db_operation_seconds", "Time spent in job store database work")
+http_request_seconds = metrics.histogram("http_request_duration_seconds", "Time until the response starts, per route")
+scheduler_predicted_wait = metrics.gauge("scheduler_predicted_wait_seconds", "Predicted queue wait for a newly submitted job")
+jobs_shed = metrics.counter("jobs_shed_total", "Conversion requests refused because the queue was over its wait SLO")
+memory_budget_bytes = metrics.gauge("memory_budget_bytes", "Memory budget for conversions in this process tree")
+memory_reserved_bytes = metrics.gauge("memory_reserved_bytes", "Estimated peak memory of the running conversions")
+memory_rss_bytes = metrics.gauge("memory_rss_bytes", "Resident memory of this process and its conversion workers")
+memory_rejections = metrics.counter("memory_rejections_total", "Jobs refused because their input could not fit the memory budget")
+startup_seconds = metrics.gauge(
+    "startup_seconds",
+    "Seconds from the start of importing the service to each start-up phase (import, ready, first_request)"
+)
+backend_import_seconds = metrics.gauge("backend_import_seconds", "Time spent importing each conversion backend")
+
+# Conversion type that metrics recorded in this context are labelled with
+current_conversion: ContextVar[str] = ContextVar("current_conversion", default="unknown")
@@ -0,0 +1,233 @@
+"""Database tables, and the request and response models of the API."""
+import os
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import (
+    create_engine, event, Column, String, DateTime, Integer, BigInteger, Float, Text, Index, inspect, text
+)
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import func
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./conversions.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 10))
+if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    connect_args = {"check_same_thread": False}
+else:
+    connect_args = {"connect_timeout": DB_CONNECT_TIMEOUT}
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=connect_args,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 4)),
+    pool_pre_ping=True
+)
+
+if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        # WAL lets readers run alongside the writer instead of failing with
+        # "database is locked"; NORMAL sync is durable in WAL mode
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
+
+# Models
+class ConversionRecord(Base):
+    __tablename__ = "conversions"
+    __table_args__ = (
+        Index("ix_conversions_user_id_created_at", "user_id", "created_at"),
+    )
+    
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, index=True)
+    input_filename = Column(String)
+    output_filename = Column(String)
+    conversion_type = Column(String)
+    file_size = Column(Integer)
+    processing_time = Column(Float)
+    throughput = Column(Float)  # input bytes per second
+    outputs = Column(Text)  # JSON {variant name: filename} for multi-output jobs
+    progress = Column(Float)  # percent complete
+    status = Column(String, index=True)
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, index=True)
+    
+    # Durable queue state
+    input_path = Column(String)
+    input_size = Column(Integer)
+    input_sha256 = Column(String)
+    payload = Column(Text)
+    attempts = Column(Integer, default=0)
+    available_at = Column(DateTime)
+    lease_owner = Column(String)
+    lease_expires_at = Column(DateTime)
+    error = Column(Text)
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, index=True)
+    filename = Column(String)
+    content_type = Column(String)
+    size = Column(BigInteger)
+    status = Column(String)  # uploading, assembling, complete, claimed
+    sha256 = Column(String)
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, index=True)
+
+class UploadChunk(Base):
+    """A byte range of a resumable upload that was written and verified."""
+    __tablename__ = "upload_chunks"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    upload_id = Column(String, index=True)
+    offset = Column(BigInteger)
+    length = Column(BigInteger)
+
+class ConversionStats(Base):
+    """Counters for one user's jobs of one conversion type within an hour."""
+    __tablename__ = "conversion_stats"
+    __table_args__ = (
+        Index("ix_conversion_stats_user_id_bucket", "user_id", "bucket"),
+    )
+    
+    user_id = Column(String, primary_key=True)
+    conversion_type = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True, index=True)  # start of the hour
+    submitted = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    bytes_in = Column(BigInteger, default=0)  # input bytes of finished jobs
+    bytes_out = Column(BigInteger, default=0)
+    processing_seconds = Column(Float, default=0)
+    timed_bytes_in = Column(BigInteger, default=0)  # input bytes of jobs counted in processing_seconds
+
+class LatencySketchBin(Base):
+    """Completed jobs whose processing time fell in one ``LatencySketch`` bin."""
+    __tablename__ = "conversion_latency"
+    __table_args__ = (
+        Index("ix_conversion_latency_user_id_bucket", "user_id", "bucket"),
+    )
+    
+    user_id = Column(String, primary_key=True)
+    conversion_type = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True, index=True)
+    bin = Column(Integer, primary_key=True)
+    count = Column(Integer, default=0)
+
+def migrate_schema():
+    # create_all() only creates missing tables, so columns and indexes added
+    # to existing tables are applied here
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+# Pydantic models
+class ConversionStatus(str, Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ConversionResponse(BaseModel):
+    job_id: str
+    status: ConversionStatus
+    download_url: Optional[str] = None
+    message: Optional[str] = None
+    processing_time: Optional[float] = None
+    file_size: Optional[int] = None
+    throughput: Optional[float] = None
+    outputs: Optional[Dict[str, str]] = None
+    progress: Optional[float] = None
+
+class ConversionJob(BaseModel):
+    id: str
+    status: ConversionStatus
+    input_filename: str
+    output_filename: Optional[str] = None
+    conversion_type: str
+    created_at: datetime
+    expires_at: datetime
+    progress: Optional[float] = None
+
+IMAGE_OUTPUT_FORMATS = ["jpg", "jpeg", "png", "webp", "gif", "bmp", "tiff"]
+AUDIO_OUTPUT_FORMATS = ["mp3", "m4a", "aac", "wav", "ogg", "flac", "opus"]
+
+class ImageProcessingOptions(BaseModel):
+    width: Optional[int] = None
+    height: Optional[int] = None
+    quality: Optional[int] = 85
+    brightness: Optional[float] = None
+    contrast: Optional[float] = None
+    blur: Optional[float] = None
+    sharpen: Optional[bool] = False
+    grayscale: Optional[bool] = False
+
+class ImageVariant(BaseModel):
+    """One rendition of a multi-variant image job, fitted inside width x height."""
+    name: str = Field(..., pattern=r"^[A-Za-z0-9_-]{1,32}$")
+    width: Optional[int] = Field(None, gt=0)
+    height: Optional[int] = Field(None, gt=0)
+    format: Optional[str] = Field(None, pattern=f"^({'|'.join(IMAGE_OUTPUT_FORMATS)})$")
+    quality: Optional[int] = Field(None, ge=1, le=100)
+
+class VideoProcessingOptions(BaseModel):
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    fps: Optional[int] = None
+    bitrate: Optional[str] = None
+    resolution: Optional[str] = None
+
+class AudioProcessingOptions(BaseModel):
+    bitrate: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    normalize: Optional[bool] = False
+
+class DataProcessingOptions(BaseModel):
+    ndjson: Optional[bool] = None  # JSON side is newline-delimited; None auto-detects on input
+    infer_types: Optional[bool] = True
+    sample_rows: Optional[int] = Field(1000, ge=1, le=100000)
+    delimiter: Optional[str] = Field(",", min_length=1, max_length=1)
+
+class DocumentProcessingOptions(BaseModel):
+    pages: Optional[List[int]] = None  # 1-based page numbers; None converts every page
+    parallel: Optional[bool] = None  # None enables parallel mode for long documents
+
+    def page_indexes(self, page_count: int) -> List[int]:
+        if not self.pages:
+            return list(range(page_count))
+        out_of_range = [page for page in self.pages if page < 1 or page > page_count]
+        if out_of_range:
+            raise ValueError(f"Page {out_of_range[0]} is out of range (document has {page_count} pages)")
+        return sorted({page - 1 for page in self.pages})
+
+def parse_page_ranges(value: str) -> List[int]:
+    """Expand a page selection such as ``1-5,8`` into page numbers."""
+    pages = []
+    for part in value.split(","):
+        first, _, last = part.strip().partition("-")
+        first = int(first)
+        last = int(last) if last else first
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range: {part}")
+        pages.extend(range(first, last + 1))
+    return pages
@@ -0,0 +1,248 @@
+"""Warm LibreOffice instances that convert office documents to PDF.
+
+Only used when ``unoserver`` is on the PATH; ``OfficePool.available`` tells
+callers whether office conversions can run in this process.
+"""
+import asyncio
+import logging
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+    
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+@dataclass
+class OfficeInstance:
+    slot: int
+    process: subprocess.Popen
+    port: int
+    profile: Path
+    conversions: int = 0
+    
+    def proxy(self, timeout: float) -> xmlrpc.client.ServerProxy:
+        return xmlrpc.client.ServerProxy(
+            f"http://127.0.0.1:{self.port}", allow_none=True, transport=_TimeoutTransport(timeout)
+        )
+
+@dataclass
+class OfficePool:
+    """Long-lived headless LibreOffice processes for office document conversions.
+
+    Each slot runs an unoserver (which owns one soffice process with its own
+    profile) so a conversion is a local XML-RPC call with the document bytes
+    instead of a multi-second office start-up. Instances listen on ports the
+    OS hands out, so any number of API and worker processes can each run a
+    pool on one host. Conversions take whichever instance is idle; instances
+    are health-checked while idle and replaced when they die, fail a call or
+    reach ``max_conversions`` (LibreOffice leaks memory over long runs).
+    Slots that failed to start are retried at every health check.
+    """
+    size: int = int(os.getenv("OFFICE_POOL_SIZE", 2))
+    max_conversions: int = int(os.getenv("OFFICE_MAX_CONVERSIONS", 200))
+    convert_timeout: float = float(os.getenv("OFFICE_CONVERT_TIMEOUT", 120))
+    start_timeout: float = float(os.getenv("OFFICE_START_TIMEOUT", 30))
+    health_interval: float = float(os.getenv("OFFICE_HEALTH_INTERVAL", 30))
+    binary: str = os.getenv("UNOSERVER_BIN", "unoserver")
+    
+    def __post_init__(self):
+        self._idle: "queue.Queue[OfficeInstance]" = queue.Queue()
+        self._instances: Dict[int, OfficeInstance] = {}
+        self._starting: set = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+    
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.binary) is not None
+    
+    @property
+    def live(self) -> bool:
+        """Whether an instance is running or on its way up."""
+        with self._lock:
+            return bool(self._instances or self._starting)
+    
+    def start(self):
+        """Start every slot; blocks until each instance answers or fails to."""
+        self._stopped.clear()
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            list(pool.map(self._replace, range(self.size)))
+        logger.info(f"Office pool ready (instances={len(self._instances)}/{self.size})")
+    
+    async def run(self):
+        await asyncio.to_thread(self.start)
+        while not self._stopped.is_set():
+            await asyncio.sleep(self.health_interval)
+            try:
+                await asyncio.to_thread(self.check_health)
+            except Exception as e:
+                logger.error(f"Office pool health check failed: {e}")
+    
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+        for instance in instances:
+            self._terminate(instance)
+    
+    def convert(self, data: bytes, convert_to: str = "pdf") -> bytes:
+        instance = self._take()
+        try:
+            # inpath, indata, outpath, convert_to, filtername, filter_options, update_index, infiltername
+            result = instance.proxy(self.convert_timeout).convert(
+                None, xmlrpc.client.Binary(data), None, convert_to, None, [], True, None
+            )
+        except Exception:
+            # A failed call can leave the document open in soffice; start over
+            self._recycle(instance)
+            raise
+        instance.conversions += 1
+        if instance.conversions >= self.max_conversions:
+            self._recycle(instance)
+        else:
+            self._idle.put(instance)
+        return result.data if isinstance(result, xmlrpc.client.Binary) else result
+    
+    def _take(self) -> OfficeInstance:
+        # Busy instances come back within convert_timeout, or are replaced
+        # within start_timeout, so waiting longer than both means the pool
+        # is stuck (e.g. instances that keep failing their health checks)
+        deadline = time.monotonic() + self.convert_timeout + self.start_timeout
+        while True:
+            if not self.live:
+                raise ConnectionError("No LibreOffice instance is running")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Timed out waiting for an idle LibreOffice instance")
+            try:
+                return self._idle.get(timeout=min(1, remaining))
+            except queue.Empty:
+                continue
+    
+    def check_health(self):
+        """Probe the idle instances and replace the ones that do not answer.
+
+        Slots without an instance, e.g. one that failed to start, are
+        started again.
+        """
+        with self._lock:
+            missing = [
+                slot for slot in range(self.size)
+                if slot not in self._instances and slot not in self._starting
+            ]
+        for slot in missing:
+            threading.Thread(target=self._replace, args=(slot,), daemon=True).start()
+        for _ in range(self._idle.qsize()):
+            try:
+                instance = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if self._healthy(instance, timeout=5):
+                self._idle.put(instance)
+            else:
+                logger.warning(f"Office instance {instance.slot} is unresponsive, restarting it")
+                self._recycle(instance)
+    
+    def _healthy(self, instance: OfficeInstance, timeout: float) -> bool:
+        if instance.process.poll() is not None:
+            return False
+        try:
+            instance.proxy(timeout).info()
+            return True
+        except Exception:
+            return False
+    
+    def _recycle(self, instance: OfficeInstance):
+        self._terminate(instance)
+        if not self._stopped.is_set():
+            # Respawning takes seconds, so it happens off the converting thread
+            threading.Thread(target=self._replace, args=(instance.slot,), daemon=True).start()
+    
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+            probe.bind(("127.0.0.1", 0))
+            return probe.getsockname()[1]
+    
+    def _replace(self, slot: int):
+        with self._lock:
+            if slot in self._starting or self._stopped.is_set():
+                return
+            self._starting.add(slot)
+        try:
+            self._start_instance(slot)
+        finally:
+            with self._lock:
+                self._starting.discard(slot)
+    
+    def _start_instance(self, slot: int):
+        port, uno_port = self._free_port(), self._free_port()
+        profile = Path(tempfile.gettempdir()) / f"office-pool-{os.getpid()}-{slot}"
+        shutil.rmtree(profile, ignore_errors=True)
+        process = subprocess.Popen(
+            [
+                self.binary, "--interface", "127.0.0.1", "--port", str(port),
+                "--uno-port", str(uno_port), "--user-installation", profile.as_uri()
+            ],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        instance = OfficeInstance(slot=slot, process=process, port=port, profile=profile)
+        deadline = time.monotonic() + self.start_timeout
+        # The ports come from the OS rather than a fixed range, so no other
+        # pool's instance is expected to answer on them
+        while not self._healthy(instance, timeout=2):
+            if process.poll() is not None or time.monotonic() > deadline or self._stopped.is_set():
+                logger.error(f"Office instance {slot} failed to start; retrying at the next health check")
+                self._terminate(instance)
+                return
+            time.sleep(0.5)
+        with self._lock:
+            if self._stopped.is_set():
+                self._terminate(instance)
+                return
+            self._instances[slot] = instance
+        self._idle.put(instance)
+    
+    def _terminate(self, instance: OfficeInstance):
+        with self._lock:
+            if self._instances.get(instance.slot) is instance:
+                del self._instances[instance.slot]
+        if instance.process.poll() is None:
+            # unoserver's soffice child shares its session
+            try:
+                os.killpg(instance.process.pid, signal.SIGTERM)
+                instance.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(instance.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        shutil.rmtree(instance.profile, ignore_errors=True)
+
+office_pool = OfficePool()
+# Formats the office pool converts to PDF (docx2pdf only reads DOCX)
+OFFICE_FORMATS = ("docx", "doc", "rtf", "odt")
+# docx2pdf drives Microsoft Word, which only runs on Windows and macOS
+WORD_AVAILABLE = sys.platform in ("win32", "darwin")
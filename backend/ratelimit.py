@@ -0,0 +1,128 @@
+"""Per-user conversion quotas, shared through Redis when it is available."""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict
+
+import redis
+import redis.asyncio
+from fastapi import HTTPException
+
+import services
+
+logger = logging.getLogger(__name__)
+
+# Quota used by one conversion of each type; heavier conversions cost more
+RATE_LIMIT_COSTS: Dict[str, float] = {
+    "image_process": 1,
+    "png_to_jpg": 1,
+    "jpg_to_png": 1,
+    "csv_to_json": 2,
+    "json_to_csv": 2,
+    "pdf_to_docx": 5,
+    "docx_to_pdf": 5,
+    "mp3_to_wav": 5,
+    "wav_to_mp3": 5,
+    "video_to_audio": 10,
+    "mp4_to_mp3": 10,
+    "image_bulk": 25,
+}
+
+def rate_limit_cost(conversion_type: str) -> float:
+    for prefix in ("image_process", "image_bulk"):
+        if conversion_type.startswith(prefix):
+            return RATE_LIMIT_COSTS[prefix]
+    return RATE_LIMIT_COSTS.get(conversion_type, 1)
+
+@dataclass
+class RateLimiter:
+    """Token-bucket rate limiter.
+
+    With Redis, each check is a single atomic script call on the async
+    client, so concurrent requests can't race past the limit and the event
+    loop never blocks. Without Redis (or while it is unreachable) every
+    process keeps its own buckets instead of switching limiting off.
+    """
+    redis_prefix: str = "rate_limit"
+    max_local_buckets: int = 10000
+    
+    # Refill by elapsed time on Redis' clock, then take ``cost`` tokens if
+    # there are enough. Returns {allowed, seconds until enough tokens}.
+    _BUCKET_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local last = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(math.max(0, cost - tokens) / rate)}
+    """
+    
+    def __post_init__(self):
+        self._buckets: OrderedDict = OrderedDict()
+        self._redis = None
+        self._redis_loop = None
+        self._script = None
+    
+    def _redis_script(self):
+        # redis.asyncio connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._redis_loop is not loop:
+            self._redis = redis.asyncio.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+            self._script = self._redis.register_script(self._BUCKET_SCRIPT)
+            self._redis_loop = loop
+        return self._script
+    
+    async def acquire(self, key: str, capacity: float, rate: float, cost: float = 1) -> tuple:
+        """Take ``cost`` tokens from a bucket refilling at ``rate`` tokens per second.
+
+        Returns ``(allowed, retry_after_seconds)``.
+        """
+        if services.REDIS_AVAILABLE:
+            try:
+                allowed, retry_after = await self._redis_script()(
+                    keys=[f"{self.redis_prefix}:{key}"], args=[capacity, rate, cost]
+                )
+                return bool(allowed), float(retry_after)
+            except (redis.RedisError, OSError) as e:
+                logger.warning(f"Rate limiting locally, Redis check failed: {str(e)}")
+        return self._acquire_local(key, capacity, rate, cost)
+    
+    def _acquire_local(self, key: str, capacity: float, rate: float, cost: float) -> tuple:
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_local_buckets:
+            self._buckets.popitem(last=False)
+        return allowed, max(0.0, cost - tokens) / rate
+
+rate_limiter = RateLimiter()
+
+async def rate_limit_check(user_id: str, limit: int = 100, window: int = 3600, cost: float = 1):
+    """Spend ``cost`` of the user's quota of ``limit`` units per ``window`` seconds.
+
+    Raises 429 with a ``Retry-After`` header once the quota is used up.
+    """
+    allowed, retry_after = await rate_limiter.acquire(user_id, limit, limit / window, cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+        )
@@ -0,0 +1,64 @@
+"""Connections to the services the API and the workers share.
+
+Redis is optional: ``REDIS_AVAILABLE`` is set by ``connect_redis()`` once a
+process starts serving, so read it as ``services.REDIS_AVAILABLE`` rather
+than importing the flag. Tracing spans are recorded when OpenTelemetry is
+installed.
+"""
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Redis setup for caching and rate limiting. Nothing connects at import;
+# connect_services() checks for Redis once the process starts serving
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 2))
+redis_client = redis.Redis(
+    host='localhost', port=6379, db=0, decode_responses=True,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT
+)
+REDIS_AVAILABLE = False
+
+def connect_redis() -> bool:
+    global REDIS_AVAILABLE
+    try:
+        redis_client.ping()
+        REDIS_AVAILABLE = True
+    except (redis.RedisError, OSError):
+        REDIS_AVAILABLE = False
+        logger.warning("Redis not available. Caching and rate limiting are per process.")
+    return REDIS_AVAILABLE
+
+# Tracing is optional: spans are recorded when OpenTelemetry is installed
+# and configured (e.g. with opentelemetry-instrument)
+try:
+    from opentelemetry import trace, propagate
+    tracer = trace.get_tracer("convertor")
+    TRACING_AVAILABLE = True
+except ImportError:
+    TRACING_AVAILABLE = False
+
+@contextmanager
+def trace_span(name: str, carrier: Optional[Dict[str, str]] = None, attributes: Optional[Dict[str, Any]] = None):
+    """Open a tracing span, or do nothing without OpenTelemetry.
+
+    With a ``carrier`` the span continues the trace propagated in it, such as
+    the one a job's request left in its payload.
+    """
+    if not TRACING_AVAILABLE:
+        yield None
+        return
+    context = propagate.extract(carrier) if carrier else None
+    with tracer.start_as_current_span(name, context=context, attributes=attributes) as span:
+        yield span
+
+def trace_carrier() -> Dict[str, str]:
+    """The current trace context, for handing to a background job."""
+    carrier: Dict[str, str] = {}
+    if TRACING_AVAILABLE:
+        propagate.inject(carrier)
+    return carrier
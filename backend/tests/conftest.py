@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The backend modules create ``converted/`` and open the database relative to
+# the working directory when they are imported, so both go to a scratch
+# directory before any test module imports them
+_workdir = tempfile.mkdtemp(prefix="converter-tests-")
+os.chdir(_workdir)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/conversions.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import migrate_schema  # noqa: E402
+
+migrate_schema()
+
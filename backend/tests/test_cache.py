@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from cache import ResultCache
+from models import ImageProcessingOptions
+
+@pytest.fixture
+def cache(tmp_path):
+    # Without Redis the LRU index lives in process memory
+    return ResultCache(base_path=tmp_path / "cache", max_bytes=10)
+
+def store(cache: ResultCache, key: str, path, content: bytes):
+    path.write_bytes(content)
+    asyncio.run(cache.store(key, path))
+
+def test_make_key_covers_input_type_and_options():
+    key = ResultCache.make_key("abc", "image", ImageProcessingOptions(quality=80))
+    assert key == ResultCache.make_key("abc", "image", ImageProcessingOptions(quality=80))
+    assert key != ResultCache.make_key("abd", "image", ImageProcessingOptions(quality=80))
+    assert key != ResultCache.make_key("abc", "video", ImageProcessingOptions(quality=80))
+    assert key != ResultCache.make_key("abc", "image", ImageProcessingOptions(quality=70))
+
+def test_hit_links_cached_output(cache, tmp_path):
+    store(cache, "a", tmp_path / "first.txt", b"abcd")
+    
+    output = tmp_path / "second.txt"
+    assert asyncio.run(cache.fetch("a", output))
+    assert output.read_bytes() == b"abcd"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+def test_miss(cache, tmp_path):
+    assert not asyncio.run(cache.fetch("missing", tmp_path / "out.txt"))
+    assert not (tmp_path / "out.txt").exists()
+    assert (cache.hits, cache.misses) == (0, 1)
+
+def test_entry_removed_from_disk_is_a_miss(cache, tmp_path):
+    store(cache, "a", tmp_path / "first.txt", b"abcd")
+    (cache.base_path / "a.txt").unlink()
+    
+    assert not asyncio.run(cache.fetch("a", tmp_path / "out.txt"))
+    assert cache.total_bytes == 0
+
+def test_evicts_least_recently_used(cache, tmp_path):
+    store(cache, "a", tmp_path / "a.txt", b"aaaa")
+    store(cache, "b", tmp_path / "b.txt", b"bbbb")
+    # Reading "a" makes "b" the oldest entry
+    assert asyncio.run(cache.fetch("a", tmp_path / "read.txt"))
+    store(cache, "c", tmp_path / "c.txt", b"cccc")
+    
+    assert cache.evictions == 1
+    assert cache.total_bytes == 8
+    assert not (cache.base_path / "b.txt").exists()
+    assert not asyncio.run(cache.fetch("b", tmp_path / "b-out.txt"))
+    assert asyncio.run(cache.fetch("a", tmp_path / "a-out.txt"))
+    assert asyncio.run(cache.fetch("c", tmp_path / "c-out.txt"))
+
+def test_index_survives_restart(cache, tmp_path):
+    store(cache, "a", tmp_path / "a.txt", b"aaaa")
+    
+    restarted = ResultCache(base_path=cache.base_path, max_bytes=10)
+    restarted.start()
+    
+    assert restarted.total_bytes == 4
+    assert asyncio.run(restarted.fetch("a", tmp_path / "out.txt"))
@@ -0,0 +1,122 @@
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from jobqueue import JobQueue
+from jobs import get_job_record, job_store, new_job_record
+from models import ConversionRecord, ConversionStatus, SessionLocal
+from uploads import SavedUpload
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        # Every test starts from an empty queue
+        session.query(ConversionRecord).delete()
+        session.commit()
+        yield session
+
+@pytest.fixture
+def queue():
+    return JobQueue(lease_seconds=60, max_attempts=2, retry_backoff=10)
+
+def enqueue(queue: JobQueue, db) -> str:
+    upload = SavedUpload(path=Path("input.csv"), size=10, sha256="0" * 64)
+    job = new_job_record("user", "input.csv", "csv_to_json", **queue.queue_fields(upload))
+    db.add(job)
+    db.commit()
+    return job.id
+
+def expire_lease(job_id: str, db):
+    db.query(ConversionRecord).filter(ConversionRecord.id == job_id).update(
+        {ConversionRecord.lease_expires_at: datetime.now() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+def load(job_id: str, db) -> ConversionRecord:
+    db.expire_all()
+    return get_job_record(job_id, db)
+
+def fail(queue: JobQueue, job_id: str, error: Exception):
+    async def run():
+        await queue.fail(job_id, error)
+        await job_store.close()
+    asyncio.run(run())
+
+def test_claim_takes_a_lease(queue, db):
+    job_id = enqueue(queue, db)
+    
+    job = queue.claim("worker-a", db)
+    
+    assert job.id == job_id
+    assert job.status == ConversionStatus.PROCESSING
+    assert job.lease_owner == "worker-a"
+    assert job.attempts == 1
+    assert queue.claim("worker-b", db) is None
+
+def test_expired_lease_is_claimed_again(queue, db):
+    job_id = enqueue(queue, db)
+    queue.claim("worker-a", db)
+    expire_lease(job_id, db)
+    
+    job = queue.claim("worker-b", db)
+    
+    assert job.id == job_id
+    assert job.lease_owner == "worker-b"
+    assert job.attempts == 2
+    # The first worker has lost the job and can no longer renew it
+    assert not queue.renew_lease(job_id, "worker-a", db)
+    assert queue.renew_lease(job_id, "worker-b", db)
+
+def test_expired_last_attempt_fails_the_job(queue, db):
+    job_id = enqueue(queue, db)
+    for worker_id in ("worker-a", "worker-b"):
+        queue.claim(worker_id, db)
+        expire_lease(job_id, db)
+    
+    assert queue.claim("worker-c", db) is None
+    job = load(job_id, db)
+    assert job.status == ConversionStatus.FAILED
+    assert job.error == "Worker lease expired"
+
+@pytest.mark.parametrize("error", [OSError("disk full"), BrokenProcessPool("worker died")])
+def test_infrastructure_error_is_retried_after_backoff(queue, db, error):
+    job_id = enqueue(queue, db)
+    queue.claim("worker-a", db)
+    
+    fail(queue, job_id, error)
+    
+    job = load(job_id, db)
+    assert job.status == ConversionStatus.PENDING
+    assert job.error == str(error)
+    assert job.lease_owner is None
+    assert job.available_at > datetime.now() + timedelta(seconds=5)
+    # Not claimable until the backoff has passed
+    assert queue.claim("worker-b", db) is None
+
+def test_retry_stops_at_max_attempts(queue, db):
+    job_id = enqueue(queue, db)
+    queue.claim("worker-a", db)
+    fail(queue, job_id, OSError("disk full"))
+    db.query(ConversionRecord).filter(ConversionRecord.id == job_id).update(
+        {ConversionRecord.available_at: datetime.now()}
+    )
+    db.commit()
+    assert queue.claim("worker-b", db).attempts == 2
+    
+    fail(queue, job_id, OSError("disk full"))
+    
+    assert load(job_id, db).status == ConversionStatus.FAILED
+
+def test_input_error_fails_at_once(queue, db):
+    job_id = enqueue(queue, db)
+    queue.claim("worker-a", db)
+    
+    fail(queue, job_id, ValueError("Not a recognized image file"))
+    
+    job = load(job_id, db)
+    assert job.status == ConversionStatus.FAILED
+    assert job.error == "Not a recognized image file"
+    assert job.attempts == 1
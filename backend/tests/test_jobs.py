@@ -0,0 +1,41 @@
+import random
+from collections import Counter
+
+import pytest
+
+from jobs import LatencySketch
+
+def sketch(values) -> Counter:
+    return Counter(LatencySketch.bin(value) for value in values)
+
+def exact_quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.95, 0.99])
+def test_quantile_within_relative_accuracy(q):
+    rng = random.Random(25)
+    values = [rng.lognormvariate(0, 1.5) + 0.1 for _ in range(5000)]
+    
+    estimate = LatencySketch.quantile(sketch(values), q)
+    exact = exact_quantile(values, q)
+    
+    # Estimates are rounded to milliseconds on top of the sketch's error
+    assert abs(estimate - exact) <= exact * LatencySketch.relative_accuracy + 0.0005
+
+def test_merged_sketches_match_one_sketch():
+    rng = random.Random(7)
+    first = [rng.uniform(0.05, 2) for _ in range(1000)]
+    second = [rng.uniform(1, 30) for _ in range(1000)]
+    
+    merged = sketch(first) + sketch(second)
+    
+    for q in (0.5, 0.95):
+        assert LatencySketch.quantile(merged, q) == LatencySketch.quantile(sketch(first + second), q)
+
+def test_tiny_values_share_the_lowest_bin():
+    assert LatencySketch.bin(0) == LatencySketch.bin(LatencySketch.min_seconds)
+    assert LatencySketch.quantile(sketch([0, 0.0001]), 0.5) == pytest.approx(LatencySketch.min_seconds, abs=0.0005)
+
+def test_empty_sketch_has_no_quantile():
+    assert LatencySketch.quantile({}, 0.5) is None
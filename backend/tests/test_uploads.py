@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from uploads import FileManager, ResumableUploads
+
+def upload_file(data: bytes, size=None) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=size, filename="input.bin")
+
+def test_save_upload_streams_and_hashes(tmp_path):
+    manager = FileManager(base_path=tmp_path, chunk_size=4)
+    data = b"0123456789"
+    
+    upload = asyncio.run(manager.save_upload(upload_file(data), "job.bin"))
+    
+    assert upload.size == len(data)
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert upload.path == manager.path_for("job.bin")
+    assert upload.path.read_bytes() == data
+
+def test_save_upload_rejects_declared_size_over_limit(tmp_path):
+    manager = FileManager(base_path=tmp_path)
+    
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(manager.save_upload(upload_file(b"x" * 11, size=11), "job.bin", max_size=10))
+    
+    assert raised.value.status_code == 413
+    assert not manager.path_for("job.bin").exists()
+
+def test_save_upload_stops_once_stream_passes_limit(tmp_path):
+    # No declared size, so the limit is only found while streaming
+    manager = FileManager(base_path=tmp_path, chunk_size=4)
+    
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(manager.save_upload(upload_file(b"x" * 11), "job.bin", max_size=10))
+    
+    assert raised.value.status_code == 413
+    assert not manager.path_for("job.bin").exists()
+
+def test_save_upload_accepts_exactly_the_limit(tmp_path):
+    manager = FileManager(base_path=tmp_path, chunk_size=4)
+    
+    upload = asyncio.run(manager.save_upload(upload_file(b"x" * 10), "job.bin", max_size=10))
+    
+    assert upload.size == 10
+
+def checksum(data: bytes) -> str:
+    return "sha256 " + base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+async def body(data: bytes, piece: int = 3):
+    for start in range(0, len(data), piece):
+        yield data[start:start + piece]
+
+@pytest.fixture
+def resumable(tmp_path):
+    return ResumableUploads(base_path=tmp_path)
+
+def write(uploads: ResumableUploads, session, offset: int, data: bytes, checksum: str = None):
+    return asyncio.run(uploads.write_chunk(session, offset, body(data), checksum))
+
+def create(uploads: ResumableUploads, size: int):
+    return asyncio.run(uploads.create("user", "input.bin", None, size))
+
+def test_chunks_in_any_order_merge_into_ranges(resumable):
+    data = bytes(range(12))
+    session = create(resumable, len(data))
+    
+    assert write(resumable, session, 8, data[8:]) == [[8, 12]]
+    assert ResumableUploads.offset([[8, 12]]) == 0
+    assert write(resumable, session, 0, data[:4]) == [[0, 4], [8, 12]]
+    assert ResumableUploads.offset([[0, 4], [8, 12]]) == 4
+    # Overlapping and adjacent chunks merge
+    assert write(resumable, session, 2, data[2:8]) == [[0, 12]]
+    
+    upload = asyncio.run(resumable.finished(session.id, "user"))
+    assert upload.size == len(data)
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert resumable.part_path(session.id).read_bytes() == data
+
+def test_chunk_with_bad_checksum_is_rejected(resumable):
+    data = b"0123456789"
+    session = create(resumable, len(data))
+    
+    with pytest.raises(HTTPException) as raised:
+        write(resumable, session, 0, data[:5], checksum(b"other"))
+    
+    assert raised.value.status_code == 460
+    assert asyncio.run(resumable.received(session.id)) == []
+    assert write(resumable, session, 0, data[:5], checksum(data[:5])) == [[0, 5]]
+
+def test_bad_chunk_over_received_range_keeps_its_bytes(resumable):
+    data = b"0123456789ab"
+    session = create(resumable, len(data))
+    write(resumable, session, 0, data[:8])
+    
+    # A retry of bytes 4-12 that got corrupted on the way
+    with pytest.raises(HTTPException):
+        write(resumable, session, 4, b"XXXXXXXX", checksum(data[4:]))
+    assert asyncio.run(resumable.received(session.id)) == [[0, 8]]
+    
+    assert write(resumable, session, 8, data[8:], checksum(data[8:])) == [[0, 12]]
+    upload = asyncio.run(resumable.finished(session.id, "user"))
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+
+def test_unsupported_checksum_algorithm(resumable):
+    session = create(resumable, 4)
+    
+    with pytest.raises(HTTPException) as raised:
+        write(resumable, session, 0, b"abcd", "crc32 AAAA")
+    
+    assert raised.value.status_code == 400
+
+def test_chunk_past_the_end_is_rejected(resumable):
+    session = create(resumable, 4)
+    
+    with pytest.raises(HTTPException) as raised:
+        write(resumable, session, 2, b"abcd")
+    
+    assert raised.value.status_code == 413
+    assert asyncio.run(resumable.received(session.id)) == []
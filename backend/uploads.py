@@ -0,0 +1,417 @@
+"""Storage for uploaded files and conversion outputs, and resumable uploads."""
+import asyncio
+import base64
+import hashlib
+import mimetypes
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import aiofiles
+import aiofiles.os
+import aiofiles.ospath
+from fastapi import HTTPException, UploadFile
+
+from sqlalchemy.orm import Session
+
+from jobs import job_store
+from metrics import conversion_bytes, conversion_stage_seconds, current_conversion
+from models import UploadChunk, UploadSession
+
+@dataclass
+class SavedUpload:
+    path: Path
+    size: int
+    sha256: str
+
+@dataclass
+class FileManager:
+    """Stores uploads and outputs under ``base_path``.
+
+    Files are spread over two levels of shard directories named after a hash
+    of the filename, so no single directory grows with the number of jobs.
+    Callers keep using bare filenames; ``path_for`` maps them to disk.
+    """
+    base_path: Path = Path("converted")
+    max_file_size: int = 100 * 1024 * 1024  # 100MB
+    chunk_size: int = 1024 * 1024  # 1MB per read/write
+    allowed_extensions: Dict[str, List[str]] = None
+    
+    def __post_init__(self):
+        self.base_path.mkdir(exist_ok=True)
+        if self.allowed_extensions is None:
+            self.allowed_extensions = {
+                'document': ['.pdf', '.docx', '.doc', '.txt', '.rtf'],
+                'image': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff'],
+                'video': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm'],
+                'audio': ['.mp3', '.wav', '.flac', '.aac', '.ogg'],
+                'data': ['.csv', '.json', '.xml', '.xlsx']
+            }
+    
+    async def save_upload(self, file: UploadFile, filename: str, max_size: Optional[int] = None) -> SavedUpload:
+        """Stream an upload to disk chunk by chunk, hashing it on the way.
+
+        Peak memory stays at roughly one chunk per upload, and the upload is
+        rejected with 413 as soon as it grows past ``max_size`` (by default
+        ``max_file_size``).
+        """
+        max_size = max_size or self.max_file_size
+        if file.size is not None and file.size > max_size:
+            raise HTTPException(status_code=413, detail="File too large")
+        
+        file_path = await self.prepare_path(filename)
+        digest = hashlib.sha256()
+        size = 0
+        started = time.perf_counter()
+        
+        try:
+            async with aiofiles.open(file_path, 'wb') as f:
+                while chunk := await file.read(self.chunk_size):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise HTTPException(status_code=413, detail="File too large")
+                    digest.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            # Never leave a partial upload behind
+            if file_path.exists():
+                await aiofiles.os.remove(file_path)
+            raise
+        
+        conversion_type = current_conversion.get()
+        conversion_stage_seconds.observe(time.perf_counter() - started, conversion_type=conversion_type, stage="upload_save")
+        conversion_bytes.inc(size, conversion_type=conversion_type, direction="in")
+        return SavedUpload(path=file_path, size=size, sha256=digest.hexdigest())
+    
+    async def content_etag(self, file_path: Path) -> str:
+        """Strong ETag for a stored file, taken from the SHA-256 of its content.
+
+        Digests are memoized per path, size and mtime, so each output is hashed
+        once, off the event loop, however often it is downloaded.
+        """
+        stat = await aiofiles.os.stat(file_path)
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(None, _file_sha256, str(file_path), stat.st_size, stat.st_mtime_ns)
+        return f'"{digest}"'
+    
+    async def save_file(self, file: UploadFile, filename: str) -> Path:
+        upload = await self.save_upload(file, filename)
+        return upload.path
+    
+    def path_for(self, filename: str) -> Path:
+        shard = hashlib.sha256(filename.encode()).hexdigest()
+        return self.base_path / shard[:2] / shard[2:4] / filename
+    
+    async def prepare_path(self, filename: str) -> Path:
+        """Path to write ``filename`` to, with its shard directory created."""
+        file_path = self.path_for(filename)
+        await aiofiles.os.makedirs(file_path.parent, exist_ok=True)
+        return file_path
+    
+    async def locate(self, filename: str) -> Optional[Path]:
+        """Find a stored file, including ones written flat before sharding."""
+        for file_path in (self.path_for(filename), self.base_path / filename):
+            if await aiofiles.ospath.isfile(file_path):
+                return file_path
+        return None
+    
+    def remove(self, filename: str):
+        """Delete a stored file wherever it lives; blocking, and a no-op if it is gone."""
+        for file_path in (self.path_for(filename), self.base_path / filename):
+            try:
+                file_path.unlink()
+            except FileNotFoundError:
+                pass
+
+@lru_cache(maxsize=4096)
+def _file_sha256(path: str, size: int, mtime_ns: int) -> str:
+    # size and mtime_ns only key the cache, so a rewritten file is hashed again
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(FileManager.chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+file_manager = FileManager()
+
+# Resumable uploads
+RESUMABLE_UPLOAD_TTL = timedelta(hours=int(os.getenv("RESUMABLE_UPLOAD_TTL_HOURS", 24)))
+# Algorithms accepted in Upload-Checksum headers
+CHECKSUM_ALGORITHMS = ("sha1", "sha256", "md5")
+
+@dataclass
+class ResumableUpload:
+    """A finished resumable upload, passed to an endpoint instead of a file."""
+    id: str
+    filename: str
+    content_type: Optional[str]
+    size: int
+    sha256: str
+
+JobInput = Union[UploadFile, ResumableUpload]
+
+@dataclass
+class ResumableUploads:
+    """Resumable (tus-style) upload sessions.
+
+    A session's file is allocated at full length when the session is created.
+    Each chunk is staged in a file of its own while it arrives and is only
+    copied into the session's file at its offset (with ``pwrite``) once it
+    is whole and matches its checksum, so chunks can arrive in any order,
+    in parallel or as retries, and a bad or cut-off chunk never overwrites
+    bytes that were already received. Every chunk copied in is recorded as
+    an ``UploadChunk``, and the upload is complete once those ranges cover it.
+    The finished file is the upload itself: a conversion claims it by
+    renaming it into place, without copying.
+    """
+    base_path: Path = file_manager.base_path / "uploads"
+    max_size: int = int(os.getenv("RESUMABLE_MAX_SIZE", 5 * 1024 * 1024 * 1024))  # 5GB
+    
+    def __post_init__(self):
+        self.base_path.mkdir(exist_ok=True)
+    
+    def part_path(self, upload_id: str) -> Path:
+        return self.base_path / f"{upload_id}.part"
+    
+    def _remove_files(self, upload_id: str):
+        self.part_path(upload_id).unlink(missing_ok=True)
+        # Chunks staged by a process that died mid-request
+        for staging_path in self.base_path.glob(f"{upload_id}.*.chunk"):
+            staging_path.unlink(missing_ok=True)
+    
+    async def create(self, user_id: str, filename: str, content_type: Optional[str], size: int) -> UploadSession:
+        if size > self.max_size:
+            raise HTTPException(status_code=413, detail="File too large")
+        session = UploadSession(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            filename=filename,
+            content_type=content_type or mimetypes.guess_type(filename)[0],
+            size=size,
+            status="uploading",
+            expires_at=datetime.now() + RESUMABLE_UPLOAD_TTL
+        )
+        await asyncio.to_thread(self._allocate, self.part_path(session.id), size)
+        
+        def add(db: Session):
+            db.add(session)
+            db.commit()
+        await job_store.run(add)
+        return session
+    
+    @staticmethod
+    def _allocate(path: Path, size: int):
+        # Sparse on most filesystems: blocks are only used as chunks arrive
+        with open(path, "wb") as f:
+            f.truncate(size)
+    
+    async def get(self, upload_id: str, user_id: str) -> UploadSession:
+        def load(db: Session) -> Optional[UploadSession]:
+            return db.get(UploadSession, upload_id)
+        session = await job_store.run(load)
+        if session is None or session.user_id != user_id or session.status == "claimed":
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return session
+    
+    async def received(self, upload_id: str) -> List[List[int]]:
+        return await job_store.run(self._received, upload_id)
+    
+    @staticmethod
+    def _received(upload_id: str, db: Session) -> List[List[int]]:
+        """The byte ranges written so far, merged, as ``[start, end)`` pairs."""
+        chunks = db.query(UploadChunk.offset, UploadChunk.length).filter(
+            UploadChunk.upload_id == upload_id
+        ).order_by(UploadChunk.offset).all()
+        ranges: List[List[int]] = []
+        for offset, length in chunks:
+            if ranges and offset <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], offset + length)
+            else:
+                ranges.append([offset, offset + length])
+        return ranges
+    
+    @staticmethod
+    def offset(ranges: List[List[int]]) -> int:
+        """How much of the upload has been received without gaps."""
+        return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+    
+    async def write_chunk(
+        self,
+        session: UploadSession,
+        offset: int,
+        stream,
+        checksum: Optional[str] = None
+    ) -> List[List[int]]:
+        """Write a request body into the upload at ``offset``; returns the received ranges."""
+        if session.status != "uploading":
+            raise HTTPException(status_code=409, detail="Upload is already complete")
+        if offset > session.size:
+            raise HTTPException(status_code=409, detail="Upload-Offset is past the end of the upload")
+        
+        digest, expected = None, None
+        if checksum:
+            algorithm, _, encoded = checksum.partition(" ")
+            if algorithm not in CHECKSUM_ALGORITHMS:
+                raise HTTPException(status_code=400, detail=f"Unsupported checksum algorithm: {algorithm}")
+            try:
+                expected = base64.b64decode(encoded, validate=True)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Upload-Checksum is not valid base64")
+            digest = hashlib.new(algorithm)
+        
+        written = 0
+        buffer = bytearray()
+        started = time.perf_counter()
+        staging_path = self.base_path / f"{session.id}.{uuid.uuid4().hex}.chunk"
+        try:
+            fd = await asyncio.to_thread(os.open, staging_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                async for data in stream:
+                    if offset + written + len(buffer) + len(data) > session.size:
+                        raise HTTPException(status_code=413, detail="Chunk runs past the end of the upload")
+                    if digest is not None:
+                        digest.update(data)
+                    buffer += data
+                    if len(buffer) >= file_manager.chunk_size:
+                        await asyncio.to_thread(_pwrite_all, fd, bytes(buffer), written)
+                        written += len(buffer)
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(_pwrite_all, fd, bytes(buffer), written)
+                    written += len(buffer)
+            finally:
+                os.close(fd)
+            
+            # A mismatched or cut-off chunk never reaches the upload's file,
+            # so the bytes it covers keep whatever was received before
+            if digest is not None and digest.digest() != expected:
+                raise HTTPException(status_code=460, detail="Checksum mismatch")
+            if written:
+                await asyncio.to_thread(self._copy_in, staging_path, self.part_path(session.id), offset)
+        finally:
+            staging_path.unlink(missing_ok=True)
+        conversion_stage_seconds.observe(time.perf_counter() - started, conversion_type="upload", stage="upload_chunk")
+        
+        def record(db: Session) -> List[List[int]]:
+            if written:
+                db.add(UploadChunk(upload_id=session.id, offset=offset, length=written))
+                db.query(UploadSession).filter(UploadSession.id == session.id).update(
+                    {UploadSession.expires_at: datetime.now() + RESUMABLE_UPLOAD_TTL}
+                )
+                db.commit()
+            return self._received(session.id, db)
+        ranges = await job_store.run(record)
+        
+        if ranges == [[0, session.size]]:
+            await self._assemble(session)
+        return ranges
+    
+    @staticmethod
+    def _copy_in(staging_path: Path, part_path: Path, offset: int):
+        fd = os.open(part_path, os.O_WRONLY)
+        try:
+            with open(staging_path, "rb") as source:
+                while data := source.read(file_manager.chunk_size):
+                    _pwrite_all(fd, data, offset)
+                    offset += len(data)
+        finally:
+            os.close(fd)
+    
+    async def _assemble(self, session: UploadSession):
+        # Parallel chunks can finish together; only one of them hashes the file
+        def begin(db: Session) -> bool:
+            started = db.query(UploadSession).filter(
+                UploadSession.id == session.id, UploadSession.status == "uploading"
+            ).update({UploadSession.status: "assembling"})
+            db.commit()
+            return started == 1
+        if not await job_store.run(begin):
+            return
+        
+        status, sha256 = "uploading", None
+        try:
+            path = self.part_path(session.id)
+            stat = path.stat()
+            sha256 = await asyncio.to_thread(_file_sha256, str(path), stat.st_size, stat.st_mtime_ns)
+            status = "complete"
+        finally:
+            def finish(db: Session):
+                db.query(UploadSession).filter(UploadSession.id == session.id).update(
+                    {UploadSession.status: status, UploadSession.sha256: sha256}
+                )
+                db.commit()
+            await job_store.run(finish)
+        session.status, session.sha256 = status, sha256
+    
+    async def finished(self, upload_id: str, user_id: str) -> ResumableUpload:
+        session = await self.get(upload_id, user_id)
+        if session.status != "complete":
+            raise HTTPException(status_code=409, detail="Upload is not complete")
+        return ResumableUpload(
+            id=session.id,
+            filename=session.filename,
+            content_type=session.content_type,
+            size=session.size,
+            sha256=session.sha256
+        )
+    
+    async def claim(self, upload: ResumableUpload, filename: str) -> SavedUpload:
+        """Move a finished upload into place as a job's input."""
+        def take(db: Session) -> bool:
+            taken = db.query(UploadSession).filter(
+                UploadSession.id == upload.id, UploadSession.status == "complete"
+            ).update({UploadSession.status: "claimed"})
+            db.commit()
+            return taken == 1
+        if not await job_store.run(take):
+            raise HTTPException(status_code=409, detail="Upload was already used")
+        
+        file_path = await file_manager.prepare_path(filename)
+        await aiofiles.os.rename(self.part_path(upload.id), file_path)
+        await job_store.run(self._delete_records, [upload.id])
+        
+        conversion_bytes.inc(upload.size, conversion_type=current_conversion.get(), direction="in")
+        return SavedUpload(path=file_path, size=upload.size, sha256=upload.sha256)
+    
+    async def delete(self, upload_id: str):
+        await job_store.run(self._delete_records, [upload_id])
+        await asyncio.to_thread(self._remove_files, upload_id)
+    
+    @staticmethod
+    def _delete_records(upload_ids: List[str], db: Session):
+        db.query(UploadChunk).filter(UploadChunk.upload_id.in_(upload_ids)).delete(synchronize_session=False)
+        db.query(UploadSession).filter(UploadSession.id.in_(upload_ids)).delete(synchronize_session=False)
+        db.commit()
+    
+    def reap_batch(self, now: datetime, limit: int, db: Session) -> int:
+        """Remove up to ``limit`` expired sessions with their files."""
+        upload_ids = [row.id for row in db.query(UploadSession.id).filter(
+            UploadSession.expires_at < now
+        ).order_by(UploadSession.expires_at).limit(limit).all()]
+        for upload_id in upload_ids:
+            self._remove_files(upload_id)
+        if upload_ids:
+            self._delete_records(upload_ids, db)
+        return len(upload_ids)
+
+def _pwrite_all(fd: int, data: bytes, position: int):
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, position)
+        view = view[written:]
+        position += written
+
+resumable_uploads = ResumableUploads()
+
+async def store_input(source: JobInput, filename: str, max_size: Optional[int] = None) -> SavedUpload:
+    """Persist an uploaded file, or claim a finished resumable upload, as ``filename``."""
+    if isinstance(source, ResumableUpload):
+        if max_size is not None and source.size > max_size:
+            raise HTTPException(status_code=413, detail="File too large")
+        return await resumable_uploads.claim(source, filename)
+    return await file_manager.save_upload(source, filename, max_size)
@@ -0,0 +1,84 @@
+"""Standalone conversion worker.
+
+Runs queued conversion jobs outside the API process, so API nodes and
+conversion workers can be scaled independently. Start it from the backend
+directory, next to the API's ``converted/`` directory and database (or with
+``DATABASE_URL`` pointing at the shared database):
+
+    python -m worker --concurrency 4
+
+Set ``RUN_EMBEDDED_WORKER=0`` on the API nodes so they only enqueue jobs.
+When ``unoserver`` (from LibreOffice) is on the PATH, the worker keeps a
+warm pool of office instances for DOCX/DOC/RTF/ODT to PDF conversions.
+With ``--metrics-port`` the worker serves its metrics for Prometheus at
+``/metrics`` on that port.
+"""
+import argparse
+import asyncio
+import signal
+
+from main import (
+    JobWorker, connect_services, execution_engine, job_store, metrics, office_pool, progress_broker,
+    report_startup
+)
+
+
+async def serve_metrics(port: int) -> asyncio.AbstractServer:
+    # Any request gets the metrics; the worker has no other HTTP surface
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = metrics.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host="0.0.0.0", port=port)
+
+
+async def run_worker(concurrency: int = None, poll_interval: float = 1.0, metrics_port: int = None):
+    await connect_services()
+    await execution_engine.warm_up()
+    await progress_broker.start()
+    metrics_server = await serve_metrics(metrics_port) if metrics_port else None
+    office_task = asyncio.create_task(office_pool.run()) if office_pool.available else None
+    worker = JobWorker(concurrency=concurrency, poll_interval=poll_interval)
+    report_startup("ready")
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        if office_task is not None:
+            office_task.cancel()
+            office_pool.stop()
+        execution_engine.shutdown()
+        await job_store.close()
+        await progress_broker.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued file conversion jobs")
+    parser.add_argument("--concurrency", type=int, default=None, help="Jobs to run at once (default: one per CPU)")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between queue polls when idle")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    asyncio.run(run_worker(args.concurrency, args.poll_interval, args.metrics_port))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Table,
   TableBody,
@@ -26,6 +26,7 @@ interface Job {
   processing_time?: number;
   file_size?: number;
   download_url?: string;
+  progress?: number;
 }
 
 export default function JobStatusTable() {
@@ -35,6 +36,8 @@ export default function JobStatusTable() {
   const [openNotification, setOpenNotification] = useState(false);
   const [notificationMessage, setNotificationMessage] = useState('');
   const [notificationSeverity, setNotificationSeverity] = useState<'success' | 'info' | 'warning' | 'error'>('info');
+  const jobsRef = useRef<Job[]>([]);
+  jobsRef.current = jobs;
 
   const fetchJobs = async () => {
     setLoading(true);
@@ -64,8 +67,17 @@ export default function JobStatusTable() {
 
   useEffect(() => {
     fetchJobs();
-    const interval = setInterval(fetchJobs, 5000); // Refresh every 5 seconds
-    return () => clearInterval(interval);
+    // The API pushes status and progress updates instead of being polled
+    const events = new EventSource('http://localhost:8000/jobs/events');
+    events.onmessage = (message) => {
+      const update: Partial<Job> & { job_id: string } = JSON.parse(message.data);
+      if (!jobsRef.current.some((job) => job.job_id === update.job_id)) {
+        fetchJobs(); // A new job; reload to get its details
+        return;
+      }
+      setJobs((current) => current.map((job) => (job.job_id === update.job_id ? { ...job, ...update } : job)));
+    };
+    return () => events.close();
   }, []);
 
   if (loading) {
@@ -120,7 +132,10 @@ export default function JobStatusTable() {
               </TableCell>
               <TableCell>{job.input_filename}</TableCell>
               <TableCell>{job.conversion_type}</TableCell>
-              <TableCell>{job.status}</TableCell>
+              <TableCell>
+                {job.status}
+                {job.status === 'processing' && job.progress != null ? ` (${job.progress.toFixed(0)}%)` : ''}
+              </TableCell>
               <TableCell>{job.output_filename || 'N/A'}</TableCell>
               <TableCell align="right">{job.processing_time?.toFixed(2) || 'N/A'}</TableCell>
               <TableCell align="right">{job.file_size || 'N/A'}</TableCell>